@@ -0,0 +1,348 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+logger = logging.getLogger("prompt_optimizer")
+
+# Why a request was shed instead of reaching the LLM
+QUEUE_FULL = "queue_full"
+DEADLINE = "deadline"
+TIMEOUT = "timeout"
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed and the caller should answer 429"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def spend(tokens, updated, now: float, cost: float, rate: float, burst: float):
+    """Refill a token bucket to now and try to take cost from it
+
+    Returns (tokens left, seconds until cost would be available); the wait
+    is 0 when the tokens were taken. A missing bucket (tokens None) is full.
+    A cost above burst never fits, so callers reject such requests first.
+    """
+    if tokens is None:
+        tokens = burst
+    else:
+        tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    return tokens, (cost - tokens) / rate
+
+
+class MemoryBuckets:
+    """Token buckets for this process, least recently used clients evicted past max_keys"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (None, now))
+            tokens, wait = spend(tokens, updated, now, cost, rate, burst)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBuckets:
+    """Token buckets in a SQLite file, shared by every worker on the host
+
+    A write lock held longer than busy_timeout seconds fails the take, and
+    RateLimiter admits the request, rather than stall it behind the limiter.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 0.005):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._takes = 0
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            # Setup above may wait for other workers; takes must not
+            conn.execute(f"PRAGMA busy_timeout = {max(1, int(self.busy_timeout * 1000))}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key: str, cost: float, rate: float, burst: float) -> float:
+        # Wall clock, since the buckets outlive and are shared between processes
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, wait = spend(row[0] if row else None, row[1] if row else now, now, cost, rate, burst)
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        # A bucket idle long enough to refill is the same as no bucket, so prune those now and then
+        self._takes += 1
+        if self._takes % 1000 == 0:
+            conn.execute("DELETE FROM buckets WHERE updated < ?", (now - burst / rate,))
+        return wait
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+
+class RateLimiter:
+    """Per-client token bucket: rate requests per second, bursts of up to burst"""
+
+    def __init__(self, rate: float, burst: float, buckets=None):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = buckets if buckets is not None else MemoryBuckets()
+        self.allowed = 0
+        self.limited = 0
+        self._lock = threading.Lock()
+
+    def check(self, key: str, cost: float = 1) -> float:
+        """Take cost tokens for key; returns 0 when allowed, else the seconds to wait before retrying"""
+        try:
+            wait = self.buckets.take(key, cost, self.rate, self.burst)
+        except Exception as e:
+            # An unreadable limiter must not take the API down with it
+            logger.error(f"Rate limiter unavailable, admitting request: {e}")
+            wait = 0.0
+        with self._lock:
+            if wait:
+                self.limited += 1
+            else:
+                self.allowed += 1
+        return wait
+
+    async def acheck(self, key: str, cost: float = 1) -> float:
+        """Async variant of check; file-backed buckets are read off the event loop"""
+        if isinstance(self.buckets, MemoryBuckets):
+            return self.check(key, cost)
+        return await asyncio.to_thread(self.check, key, cost)
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "backend": type(self.buckets).__name__,
+            "allowed": self.allowed,
+            "limited": self.limited,
+        }
+
+    def metrics_lines(self) -> list:
+        return [
+            "# HELP prompt_optimizer_rate_limited_total Requests checked against the per-client rate limit",
+            "# TYPE prompt_optimizer_rate_limited_total counter",
+            f'prompt_optimizer_rate_limited_total{{result="allowed"}} {self.allowed}',
+            f'prompt_optimizer_rate_limited_total{{result="limited"}} {self.limited}',
+        ]
+
+
+def client_key(headers, remote_addr: str = None, trust_proxy: bool = False) -> str:
+    """Rate limit key for a request: its API key when it sent one, else its IP address
+
+    headers needs a get() taking lower-case names. X-Forwarded-For is only
+    believed with trust_proxy, when a proxy in front overwrites it.
+    """
+    api_key = headers.get("x-api-key") or ""
+    authorization = headers.get("authorization") or ""
+    if not api_key and authorization[:7].lower() == "bearer ":
+        api_key = authorization[7:].strip()
+    if api_key:
+        # Keys are hashed so they never sit in the limiter's memory or file
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    forwarded_for = headers.get("x-forwarded-for")
+    if trust_proxy and forwarded_for:
+        return "ip:" + forwarded_for.split(",")[0].strip()
+    return "ip:" + (remote_addr or "unknown")
+
+
+class _Waiter:
+    __slots__ = ("wake", "granted")
+
+    def __init__(self, wake):
+        self.wake = wake
+        self.granted = False
+
+
+class ConcurrencyGate:
+    """Caps in-flight LLM calls, queueing at most max_queue callers in FIFO order
+
+    A caller that cannot start at once waits up to its budget (capped at
+    max_wait) for a slot. When the queue is full, or the wait expected from
+    the queue length and recent call durations already exceeds the budget,
+    it is shed immediately instead of timing out later. Released slots are
+    handed straight to the longest waiter, so threads and coroutines can
+    share one gate.
+    """
+
+    def __init__(self, limit: int = 64, max_queue: int = 256, max_wait: float = 5.0):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.admitted = 0
+        self.queued = 0
+        self.shed = dict.fromkeys((QUEUE_FULL, DEADLINE, TIMEOUT), 0)
+        # Moving average of how long a call holds its slot
+        self.service_time = None
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def expected_wait(self, position: int) -> float:
+        """Seconds until the caller at queue position (1 = next) should get a slot"""
+        if self.service_time is None:
+            return 0.0
+        return position * self.service_time / self.limit
+
+    def _enter(self, budget: float, wake):
+        """Admit, shed or queue a caller; returns (admitted, waiter, seconds to wait)"""
+        wait = self.max_wait if budget is None else min(self.max_wait, budget)
+        with self._lock:
+            if self.in_flight < self.limit and not self._waiters:
+                self.in_flight += 1
+                self.admitted += 1
+                return True, None, 0.0
+            if len(self._waiters) >= self.max_queue:
+                self.shed[QUEUE_FULL] += 1
+                return False, None, 0.0
+            if self.expected_wait(len(self._waiters) + 1) > wait:
+                self.shed[DEADLINE] += 1
+                return False, None, 0.0
+            waiter = _Waiter(wake)
+            self._waiters.append(waiter)
+            self.queued += 1
+            return False, waiter, wait
+
+    def _settle(self, waiter: _Waiter) -> bool:
+        with self._lock:
+            if waiter.granted:
+                self.admitted += 1
+                return True
+            self._waiters.remove(waiter)
+            self.shed[TIMEOUT] += 1
+            return False
+
+    def acquire(self, budget: float = None) -> bool:
+        """Take a slot, waiting up to budget seconds; False means the call was shed"""
+        event = threading.Event()
+        admitted, waiter, wait = self._enter(budget, event.set)
+        if waiter is None:
+            return admitted
+        event.wait(wait)
+        return self._settle(waiter)
+
+    async def aacquire(self, budget: float = None) -> bool:
+        """Async variant of acquire"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def grant():
+            if not future.done():
+                future.set_result(True)
+
+        admitted, waiter, wait = self._enter(budget, lambda: loop.call_soon_threadsafe(grant))
+        if waiter is None:
+            return admitted
+        try:
+            await asyncio.wait({future}, timeout=wait)
+        except asyncio.CancelledError:
+            # A cancelled waiter that was already handed a slot passes it on
+            if self._settle(waiter):
+                self.release()
+            raise
+        return self._settle(waiter)
+
+    def release(self, seconds: float = None):
+        """Free a slot taken by acquire, recording how long the call held it"""
+        with self._lock:
+            if seconds is not None:
+                self.service_time = seconds if self.service_time is None else 0.8 * self.service_time + 0.2 * seconds
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+            else:
+                self.in_flight -= 1
+                return
+        waiter.wake()
+
+    def retry_after(self) -> float:
+        """Seconds a shed caller should wait before retrying"""
+        return max(1.0, self.expected_wait(len(self._waiters) + 1))
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": dict(self.shed),
+            "service_time_ms": round(self.service_time * 1000, 1) if self.service_time is not None else None,
+        }
+
+    def metrics_lines(self) -> list:
+        lines = [
+            "# HELP prompt_optimizer_llm_in_flight LLM calls holding an admission slot",
+            "# TYPE prompt_optimizer_llm_in_flight gauge",
+            f"prompt_optimizer_llm_in_flight {self.in_flight}",
+            "# HELP prompt_optimizer_admission_queue_depth Requests waiting for an LLM admission slot",
+            "# TYPE prompt_optimizer_admission_queue_depth gauge",
+            f"prompt_optimizer_admission_queue_depth {len(self._waiters)}",
+            "# HELP prompt_optimizer_admission_shed_total Requests shed before reaching the LLM, by reason",
+            "# TYPE prompt_optimizer_admission_shed_total counter",
+        ]
+        lines += [f'prompt_optimizer_admission_shed_total{{reason="{reason}"}} {count}'
+                  for reason, count in self.shed.items()]
+        return lines
+
+
+def create_rate_limiter():
+    """Build the per-client rate limiter from RATE_LIMIT_* environment variables, or None when unset"""
+    rate = float(os.getenv("RATE_LIMIT_RPS", "0"))
+    if rate <= 0:
+        return None
+    burst = float(os.getenv("RATE_LIMIT_BURST", str(max(1.0, rate * 10))))
+    buckets = None
+    db_path = os.getenv("RATE_LIMIT_DB")
+    if db_path:
+        try:
+            buckets = SQLiteBuckets(db_path)
+        except Exception as e:
+            logger.error(f"Failed to open rate limit database {db_path}, limiting per process: {e}")
+    return RateLimiter(rate, burst, buckets)
+
+
+def create_concurrency_gate() -> ConcurrencyGate:
+    """Build the LLM admission gate from ADMISSION_* environment variables"""
+    return ConcurrencyGate(
+        limit=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", os.getenv("LLM_MAX_CONCURRENCY", "64"))),
+        max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "256")),
+        max_wait=float(os.getenv("ADMISSION_MAX_WAIT", "5")),
+    )
@@ -0,0 +1,205 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("prompt_optimizer")
+
+
+def make_cache_key(model: str, template: str) -> str:
+    """Hash a rendered template together with the model that will answer it"""
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(template.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class MemoryCache:
+    """In-process LRU tier with TTL and entry-count eviction"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        expires_at = time.time() + self.ttl if self.ttl else 0
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """On-disk tier backed by SQLite, shared by every worker on the host"""
+
+    def __init__(self, path: str, max_entries: int = 100000, ttl: float = 86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        # SQLite connections must not cross a fork, so a preloaded worker opens its own
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str):
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at and expires_at < now:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else 0
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, value, expires_at, now),
+        )
+        # Size eviction is amortised over writes instead of running on every insert
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.evict()
+
+    def evict(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM responses WHERE expires_at > 0 AND expires_at < ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self):
+        self._connect().execute("DELETE FROM responses")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    """Tiered exact-match cache for LLM responses with hit/miss counters"""
+
+    def __init__(self, tiers):
+        self.tiers = list(tiers)
+        self.hits = 0
+        self.misses = 0
+        self.tier_hits = [0] * len(self.tiers)
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self) -> bool:
+        """Whether a tier is visible to every worker process on the host"""
+        return any(isinstance(tier, SQLiteCache) for tier in self.tiers)
+
+    def get(self, key: str):
+        for i, tier in enumerate(self.tiers):
+            try:
+                value = tier.get(key)
+            except Exception as e:
+                logger.error(f"Cache lookup failed in {type(tier).__name__}: {e}")
+                continue
+            if value is not None:
+                # Promote to the faster tiers so the next lookup stays in memory
+                for faster in self.tiers[:i]:
+                    faster.set(key, value)
+                with self._lock:
+                    self.hits += 1
+                    self.tier_hits[i] += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: str):
+        for tier in self.tiers:
+            try:
+                tier.set(key, value)
+            except Exception as e:
+                logger.error(f"Cache store failed in {type(tier).__name__}: {e}")
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "tiers": [
+                {"name": type(tier).__name__, "hits": hits, "entries": len(tier)}
+                for tier, hits in zip(self.tiers, self.tier_hits)
+            ],
+        }
+
+
+def create_response_cache():
+    """Build the response cache from PROMPT_CACHE_* environment variables"""
+    if os.getenv("PROMPT_CACHE_ENABLED", "1") == "0":
+        return None
+    tiers = [MemoryCache(
+        max_entries=int(os.getenv("PROMPT_CACHE_SIZE", "1024")),
+        ttl=float(os.getenv("PROMPT_CACHE_TTL", "3600")),
+    )]
+    db_path = os.getenv("PROMPT_CACHE_DB")
+    if db_path:
+        try:
+            tiers.append(SQLiteCache(
+                db_path,
+                max_entries=int(os.getenv("PROMPT_CACHE_DB_SIZE", "100000")),
+                ttl=float(os.getenv("PROMPT_CACHE_DB_TTL", "86400")),
+            ))
+        except Exception as e:
+            logger.error(f"Failed to open response cache database {db_path}: {e}")
+    return ResponseCache(tiers)
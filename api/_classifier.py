@@ -0,0 +1,162 @@
+import json
+import os
+import re
+import zlib
+
+import numpy as np
+
+# Bump when the feature hashing or file layout changes so old models are ignored
+MODEL_VERSION = 1
+
+# Predictions less confident than this should be left to embedding retrieval
+MIN_CONFIDENCE = 0.6
+
+# Only the start of a prompt is classified; intent is stated before any pasted code
+MAX_CHARS = 2000
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def hashed_features(text: str, n_features: int) -> np.ndarray:
+    """Bucket indices of the word unigrams, word bigrams and word prefixes in text"""
+    words = _TOKEN.findall(text[:MAX_CHARS].lower())
+    grams = set(words)
+    grams.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    # Five-letter prefixes let inflections and misspellings (debugging, portret) share a feature
+    grams.update(f">{word[:5]}" for word in words if len(word) > 5)
+    mask = n_features - 1
+    return np.fromiter({zlib.crc32(gram.encode()) & mask for gram in grams}, dtype=np.int64)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class HashedNgramClassifier:
+    """Linear classifier over hashed n-gram features
+
+    The model is a (labels x n_features) weight array and a bias vector;
+    predicting sums a handful of weight columns, so a short prompt is
+    classified in tens of microseconds. Confidences are temperature-scaled
+    on held-out examples at training time, so 0.8 means roughly 80% right.
+    """
+
+    def __init__(self, labels, weights, bias, temperature: float = 1.0):
+        self.labels = list(labels)
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.temperature = float(temperature)
+        self.n_features = self.weights.shape[1]
+
+    def vectorize(self, texts) -> np.ndarray:
+        """Dense L2-normalized feature rows, used for training"""
+        matrix = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        for row, text in zip(matrix, texts):
+            indices = hashed_features(text, self.n_features)
+            if len(indices):
+                row[indices] = 1.0 / np.sqrt(len(indices))
+        return matrix
+
+    def probabilities(self, text: str) -> np.ndarray:
+        indices = hashed_features(text, self.n_features)
+        logits = self.bias.copy()
+        if len(indices):
+            logits += self.weights[:, indices].sum(axis=1) / np.sqrt(len(indices))
+        return _softmax(logits / self.temperature)
+
+    def predict(self, text: str):
+        """Return (label, confidence)"""
+        probabilities = self.probabilities(text)
+        best = int(np.argmax(probabilities))
+        return self.labels[best], float(probabilities[best])
+
+    @classmethod
+    def train(cls, texts, labels, n_features: int = 4096, epochs: int = 300, learning_rate: float = 2.0,
+              l2: float = 1e-4, holdout: int = 5):
+        """Fit softmax regression, calibrating the temperature on every holdout-th example"""
+        names = sorted(set(labels))
+        targets = np.array([names.index(label) for label in labels])
+        model = cls(names, np.zeros((len(names), n_features)), np.zeros(len(names)))
+        features = model.vectorize(texts)
+
+        held_out = np.arange(len(texts)) % holdout == holdout - 1 if holdout and len(texts) >= 4 * holdout else None
+        if held_out is not None and held_out.any():
+            model._fit(features[~held_out], targets[~held_out], epochs, learning_rate, l2)
+            logits = features[held_out] @ model.weights.T + model.bias
+            model.temperature = _fit_temperature(logits, targets[held_out])
+        model._fit(features, targets, epochs, learning_rate, l2)
+        return model
+
+    def _fit(self, features: np.ndarray, targets: np.ndarray, epochs: int, learning_rate: float, l2: float):
+        weights = np.zeros_like(self.weights)
+        bias = np.zeros_like(self.bias)
+        onehot = np.eye(len(self.labels), dtype=np.float32)[targets]
+        for _ in range(epochs):
+            error = (_softmax(features @ weights.T + bias) - onehot) / len(features)
+            weights -= learning_rate * (error.T @ features + l2 * weights)
+            bias -= learning_rate * error.sum(axis=0)
+        self.weights, self.bias = weights, bias
+
+    def to_arrays(self, prefix: str) -> dict:
+        return {
+            f"{prefix}.labels": np.array(self.labels),
+            # Half precision halves the file; predictions are unaffected at this scale
+            f"{prefix}.weights": self.weights.astype(np.float16),
+            f"{prefix}.bias": self.bias,
+            f"{prefix}.temperature": np.array(self.temperature),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix: str):
+        return cls(
+            [str(label) for label in arrays[f"{prefix}.labels"]],
+            arrays[f"{prefix}.weights"],
+            arrays[f"{prefix}.bias"],
+            float(arrays[f"{prefix}.temperature"]),
+        )
+
+
+def _fit_temperature(logits: np.ndarray, targets: np.ndarray) -> float:
+    """Temperature minimizing the negative log-likelihood of held-out predictions"""
+    best, best_loss = 1.0, float("inf")
+    for temperature in np.geomspace(0.05, 10.0, 60):
+        probabilities = _softmax(logits / temperature)
+        loss = -np.log(probabilities[np.arange(len(targets)), targets] + 1e-12).mean()
+        if loss < best_loss:
+            best, best_loss = float(temperature), loss
+    return best
+
+
+def load_examples(path: str) -> dict:
+    """Read {"context", "text", "label"} JSON lines, grouped by context"""
+    examples = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not all(isinstance(item.get(key), str) for key in ("context", "text", "label")):
+                raise ValueError(f"{path}:{number} needs string context, text and label fields")
+            examples.setdefault(item["context"], []).append((item["text"], item["label"]))
+    return examples
+
+
+def save_classifiers(path: str, classifiers: dict):
+    """Write one classifier per context to a single .npz file"""
+    arrays = {"version": np.array(MODEL_VERSION), "contexts": np.array(sorted(classifiers))}
+    for context, classifier in classifiers.items():
+        arrays.update(classifier.to_arrays(context))
+    with open(path + ".tmp", "wb") as f:
+        np.savez_compressed(f, **arrays)
+    # Swap the file in so running servers never read a partial model
+    os.replace(path + ".tmp", path)
+
+
+def load_classifiers(path: str) -> dict:
+    """Return {context: HashedNgramClassifier} from save_classifiers output"""
+    with np.load(path, allow_pickle=False) as arrays:
+        if int(arrays["version"]) != MODEL_VERSION:
+            raise ValueError(f"{path} was written by an incompatible model version")
+        return {str(context): HashedNgramClassifier.from_arrays(arrays, str(context)) for context in arrays["contexts"]}
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process coalescing
+    fcntl = None
+
+logger = logging.getLogger("prompt_optimizer")
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """Single-flight deduplication of identical in-flight LLM calls
+
+    Concurrent callers with the same key share one upstream call: the first
+    becomes the leader and the rest wait for its result. With lock_dir set,
+    leaders in different worker processes on the same host also serialize
+    on a lock file and re-check the shared response cache once they get it,
+    so only one process calls the model. Keys hash onto a fixed set of
+    lock_slots files, so the directory never grows; the holder writes its
+    key into the file, and a caller whose key merely shares the slot goes
+    ahead without waiting.
+    """
+
+    def __init__(self, lock_dir: str = None, lock_slots: int = 256):
+        self.lock_dir = lock_dir if fcntl else None
+        self.lock_slots = lock_slots
+        if lock_dir and not fcntl:
+            logger.error("File-lock coalescing needs fcntl; coalescing within this process only")
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+        self.leaders = 0
+        self.coalesced = 0
+        self.cross_process = 0
+        self._flights = {}
+        self._async_flights = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: str, fn, recheck=None, timeout: float = None):
+        """Return fn() or the result of an identical call already in flight
+
+        recheck() is consulted after waiting on another process and should
+        return the now-cached result, or None to call fn() anyway. A
+        follower that waits longer than timeout gets None.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not flight.done.wait(timeout):
+                return None
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._run_locked(key, fn, recheck, timeout) if self.lock_dir else fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def lock_path(self, key: str) -> str:
+        slot = zlib.crc32(key.encode("utf-8")) % self.lock_slots
+        return os.path.join(self.lock_dir, f"slot-{slot:04d}.lock")
+
+    def _try_lock(self, fd: int, key: str):
+        """Take fd's slot lock for key: True once held, False while another
+        worker holds it for the same key, None when it holds it for another
+        key sharing the slot and there is nothing to wait for"""
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False if os.pread(fd, 1024, 0) == key.encode("utf-8") else None
+        # The holder records its key so that callers with other keys can tell it is not theirs
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, key.encode("utf-8"), 0)
+        return True
+
+    def _run_locked(self, key: str, fn, recheck, timeout: float):
+        fd = os.open(self.lock_path(key), os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            locked = self._try_lock(fd, key)
+            if locked is False:
+                # Another worker is making this call; wait for it, then read its cached result
+                with self._lock:
+                    self.cross_process += 1
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while locked is False:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        return None
+                    time.sleep(0.01)
+                    locked = self._try_lock(fd, key)
+                result = recheck() if recheck else None
+                if result is not None:
+                    return result
+            return fn()
+        finally:
+            os.close(fd)  # also releases the lock
+
+    async def arun(self, key: str, make_coroutine, recheck=None, timeout: float = None):
+        """Async variant of run for callers sharing one event loop
+
+        recheck is a plain function, as for run; it is called on a worker
+        thread since it usually reads the shared cache.
+        """
+        future = self._async_flights.get(key)
+        if future is not None:
+            with self._lock:
+                self.coalesced += 1
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+        future = self._async_flights[key] = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self.leaders += 1
+        try:
+            if self.lock_dir:
+                result = await self._arun_locked(key, make_coroutine, recheck, timeout)
+            else:
+                result = await make_coroutine()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Followers re-raise it; mark it retrieved in case there are none
+            future.exception()
+            raise
+        finally:
+            del self._async_flights[key]
+
+    async def _arun_locked(self, key: str, make_coroutine, recheck, timeout: float):
+        fd = os.open(self.lock_path(key), os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            locked = self._try_lock(fd, key)
+            if locked is False:
+                with self._lock:
+                    self.cross_process += 1
+                loop = asyncio.get_running_loop()
+                deadline = None if timeout is None else loop.time() + timeout
+                while locked is False:
+                    if deadline is not None and loop.time() >= deadline:
+                        return None
+                    await asyncio.sleep(0.01)
+                    locked = self._try_lock(fd, key)
+                result = await asyncio.to_thread(recheck) if recheck else None
+                if result is not None:
+                    return result
+            return await make_coroutine()
+        finally:
+            os.close(fd)
+
+    def stats(self) -> dict:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "cross_process": self.cross_process,
+            "in_flight": len(self._flights) + len(self._async_flights),
+        }
+
+    def metrics_lines(self) -> list:
+        return [
+            "# HELP prompt_optimizer_coalesced_requests_total Requests that shared an identical in-flight LLM call",
+            "# TYPE prompt_optimizer_coalesced_requests_total counter",
+            f'prompt_optimizer_coalesced_requests_total{{scope="process"}} {self.coalesced}',
+            f'prompt_optimizer_coalesced_requests_total{{scope="host"}} {self.cross_process}',
+        ]
+
+
+def create_request_coalescer(shared_cache: bool = False):
+    """Build the request coalescer from COALESCE_* environment variables
+
+    Cross-process locking only pays off when a waiting worker can read the
+    leader's answer, so COALESCE_LOCK_DIR is ignored without a shared cache
+    tier.
+    """
+    if os.getenv("COALESCE_ENABLED", "1") == "0":
+        return None
+    lock_dir = os.getenv("COALESCE_LOCK_DIR") or None
+    if lock_dir and not shared_cache:
+        logger.error("COALESCE_LOCK_DIR needs a shared response cache (PROMPT_CACHE_DB); coalescing within this process only")
+        lock_dir = None
+    return RequestCoalescer(lock_dir=lock_dir, lock_slots=int(os.getenv("COALESCE_LOCK_SLOTS", "256")))
@@ -0,0 +1,201 @@
+import re
+
+from _normalize import trie_pattern
+
+# Common misspellings and their corrections, all lower case
+DEFAULT_SPELLING = {
+    "recieve": "receive",
+    "messege": "message",
+    "definately": "definitely",
+    "occured": "occurred",
+    "begining": "beginning",
+    "accomodate": "accommodate",
+    "requirments": "requirements",
+    "maintanence": "maintenance",
+    "cruicial": "crucial",
+    "sucess": "success",
+    "importent": "important",
+    "calender": "calendar",
+    "cemetary": "cemetery",
+    "collegue": "colleague",
+    "concious": "conscious",
+    "embarass": "embarrass",
+    "enviroment": "environment",
+    "existance": "existence",
+    "foriegn": "foreign",
+    "fourty": "forty",
+    "freind": "friend",
+    "garentee": "guarantee",
+    "goverment": "government",
+    "harrass": "harass",
+    "idiosyncracy": "idiosyncrasy",
+    "immediatly": "immediately",
+    "independant": "independent",
+    "knowlege": "knowledge",
+    "liase": "liaise",
+    "liason": "liaison",
+    "neccessary": "necessary",
+    "occassion": "occasion",
+    "occassionally": "occasionally",
+    "occurence": "occurrence",
+    "pavillion": "pavilion",
+    "persistant": "persistent",
+    "posession": "possession",
+    "prefered": "preferred",
+    "priviledge": "privilege",
+    "probaly": "probably",
+    "proffesional": "professional",
+    "promiss": "promise",
+    "pronounciation": "pronunciation",
+    "prufe": "proof",
+    "pursuade": "persuade",
+    "quater": "quarter",
+    "questionaire": "questionnaire",
+    "reccomend": "recommend",
+    "rediculous": "ridiculous",
+    "refered": "referred",
+    "refering": "referring",
+    "religous": "religious",
+    "rember": "remember",
+    "resistence": "resistance",
+    "responce": "response",
+    "responcibility": "responsibility",
+    "rythm": "rhythm",
+    "sence": "sense",
+    "seperate": "separate",
+    "sieze": "seize",
+    "similiar": "similar",
+    "sincerly": "sincerely",
+    "speach": "speech",
+    "sucessful": "successful",
+    "suprise": "surprise",
+    "tatoo": "tattoo",
+    "tendancy": "tendency",
+    "therefor": "therefore",
+    "threshhold": "threshold",
+    "tommorow": "tomorrow",
+    "tounge": "tongue",
+    "truely": "truly",
+    "unfortunatly": "unfortunately",
+    "untill": "until",
+    "wierd": "weird",
+    "whereever": "wherever",
+    "wich": "which",
+    "womens": "women's",
+    "wonderfull": "wonderful",
+    "writeing": "writing",
+}
+
+# Chat shorthand, missing apostrophes and the lower-case pronoun. "its" is left
+# alone since the possessive is usually what was meant. These are only matched
+# in lower case: "U", "UR" and "I" written in capitals are letters, acronyms or
+# already correct.
+DEFAULT_INFORMAL = {
+    "i": "I",
+    "i'm": "I'm",
+    "i've": "I've",
+    "i'll": "I'll",
+    "i'd": "I'd",
+    "ur": "your",
+    "u": "you",
+    "cant": "can't",
+    "dont": "don't",
+    "wont": "won't",
+    "wouldnt": "wouldn't",
+    "couldnt": "couldn't",
+    "shouldnt": "shouldn't",
+    "havent": "haven't",
+    "hasnt": "hasn't",
+    "hadnt": "hadn't",
+    "isnt": "isn't",
+    "arent": "aren't",
+    "wasnt": "wasn't",
+    "werent": "weren't",
+}
+
+# Letters, digits, underscores, apostrophes, hyphens and slashes all continue a
+# word, as does a dot between letters, so "u-turn", "don't", "sandwich", "i/o"
+# and "i.e." are never matched in part
+_BEFORE = r"(?<![\w'\-/])(?<!\w\.)"
+_AFTER = r"(?![\w'\-/]|\.\w)"
+
+# Spaces left behind by removed words: before punctuation or at the end
+# (dropped), or doubled after a word (collapsed); indentation is kept. Every
+# branch starts with a literal space so the regex engine can skip ahead.
+_GAP = re.compile(r" (?:(?P<drop> *(?=[,.!?;:]|\Z))|(?<=\S ) +)")
+
+
+def _close_gap(match) -> str:
+    return "" if match.group("drop") is not None else " "
+
+
+def match_case(word: str, replacement: str) -> str:
+    """Give replacement the capitalization of the word it replaces"""
+    if not replacement:
+        return replacement
+    if len(word) > 1 and word.isupper():
+        return replacement.upper()
+    if word[0].isupper():
+        return replacement[0].upper() + replacement[1:]
+    return replacement
+
+
+class TextCorrector:
+    """Dictionary spelling and informal-language correction in one regex pass
+
+    Every entry is folded into a single trie-shaped alternation, so a text is
+    scanned once whatever the size of the dictionaries. Matches only cover
+    whole words. Spelling and filler entries match in lower, Title or UPPER
+    case and keep that case (receive, Receive, RECEIVE); informal entries
+    only match in lower case. Filler words map to an empty replacement and
+    are dropped.
+    """
+
+    def __init__(self, spelling=DEFAULT_SPELLING, informal=DEFAULT_INFORMAL, filler_words=()):
+        self.replacements = {}
+        self.replacements.update({word.lower(): "" for word in filler_words})
+        self.replacements.update({wrong.lower(): right for wrong, right in spelling.items()})
+        self.replacements.update({wrong.lower(): right for wrong, right in informal.items()})
+        # Words the spelling dictionary writes, which are correct wherever they appear
+        self.spelled_words = {right.lower() for right in spelling.values()}
+        # Each entry is matched as written in lower, Title or UPPER case, with its
+        # replacement resolved up front; a case-sensitive pattern scans about twice
+        # as fast as an IGNORECASE one
+        lower_only = {wrong.lower() for wrong in informal}
+        self.forms = {}
+        for word, replacement in self.replacements.items():
+            forms = (word,) if word in lower_only else (word, word.capitalize(), word.upper())
+            for form in forms:
+                self.forms[form] = match_case(form, replacement)
+        if self.forms:
+            self._pattern = re.compile(_BEFORE + trie_pattern(self.forms, fold_case=False) + _AFTER)
+        else:
+            self._pattern = None
+
+    def apply(self, text: str):
+        """Return (corrected text, number of words changed or removed)"""
+        if self._pattern is None:
+            return text, 0
+        changes = 0
+        removed = False
+        forms = self.forms
+
+        def replace(match):
+            nonlocal changes, removed
+            word = match.group()
+            replacement = forms[word]
+            if replacement != word:
+                changes += 1
+                if not replacement:
+                    removed = True
+            return replacement
+
+        corrected = self._pattern.sub(replace, text)
+        if removed:
+            corrected = _GAP.sub(_close_gap, corrected)
+            if not text.startswith(" "):
+                corrected = corrected.lstrip(" ")
+        return corrected, changes
+
+    def correct(self, text: str) -> str:
+        return self.apply(text)[0]
@@ -0,0 +1,264 @@
+import asyncio
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("prompt_optimizer")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+
+class JobQueueFull(Exception):
+    """Raised by submit() when max_pending jobs are already waiting or running"""
+
+
+class MemoryJobStore:
+    """Jobs kept in this process; each expires ttl seconds after its last update"""
+
+    def __init__(self, ttl: float = 3600):
+        self.ttl = ttl
+        self._jobs = {}
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def put(self, job: dict):
+        now = time.time()
+        with self._lock:
+            self._jobs[job["id"]] = (dict(job), now + self.ttl)
+            self._writes += 1
+            if self._writes % 100 == 0:
+                for job_id in [job_id for job_id, (_, expires_at) in self._jobs.items() if expires_at < now]:
+                    del self._jobs[job_id]
+
+    def get(self, job_id: str):
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None:
+                return None
+            job, expires_at = entry
+            if expires_at < time.time():
+                del self._jobs[job_id]
+                return None
+            return dict(job)
+
+    def __len__(self):
+        return len(self._jobs)
+
+
+class SQLiteJobStore:
+    """Jobs in a SQLite file, so any worker on the host can answer a poll"""
+
+    def __init__(self, path: str, ttl: float = 3600):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connect()
+        conn.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, job TEXT NOT NULL, expires_at REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def put(self, job: dict):
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO jobs (id, job, expires_at) VALUES (?, ?, ?)",
+            (job["id"], json.dumps(job, ensure_ascii=False), now + self.ttl),
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            conn.execute("DELETE FROM jobs WHERE expires_at < ?", (now,))
+
+    def get(self, job_id: str):
+        row = self._connect().execute(
+            "SELECT job FROM jobs WHERE id = ? AND expires_at >= ?", (job_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM jobs WHERE expires_at >= ?", (time.time(),)).fetchone()[0]
+
+
+class JobQueue:
+    """Runs optimizations on a local worker pool and keeps their results for polling
+
+    submit() stores a queued job and returns at once; run(prompt, context)
+    executes on one of workers threads, so LLM concurrency is bounded by the
+    pool rather than by how many HTTP requests are open. Prompts are only
+    held in memory until their job runs, and the "original" echo of the
+    prompt is dropped from the stored result. wait() and await_job() long-poll:
+    jobs finishing in this process wake their waiters immediately, and jobs
+    run by another worker sharing a SQLite store are seen on the next
+    poll_interval.
+    """
+
+    def __init__(self, store, run, workers: int = 8, max_pending: int = 1000, poll_interval: float = 0.25):
+        self.store = store
+        self.run = run
+        self.workers = workers
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+        self.pending = 0
+        self.counts = dict.fromkeys(("submitted", SUCCEEDED, FAILED, "rejected"), 0)
+        self._listeners = {}
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get_executor(self):
+        # A forked worker cannot use the parent's threads, so it starts its own pool
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+                    self._pid = os.getpid()
+                    self.pending = 0
+        return self._executor
+
+    def submit(self, prompt: str, context: str) -> dict:
+        executor = self.get_executor()
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.counts["rejected"] += 1
+                raise JobQueueFull(f"{self.pending} jobs already pending")
+            self.pending += 1
+            self.counts["submitted"] += 1
+        job = {"id": secrets.token_urlsafe(16), "status": QUEUED, "context": context, "created_at": round(time.time(), 3)}
+        try:
+            self.store.put(job)
+            executor.submit(self._execute, dict(job), prompt)
+        except BaseException:
+            with self._lock:
+                self.pending -= 1
+            raise
+        return job
+
+    def _execute(self, job: dict, prompt: str):
+        try:
+            job.update(status=RUNNING, started_at=round(time.time(), 3))
+            self.store.put(job)
+            try:
+                result = self.run(prompt, job["context"])
+                if isinstance(result, dict):
+                    result = {key: value for key, value in result.items() if key != "original"}
+                job.update(status=SUCCEEDED, result=result)
+            except Exception as e:
+                logger.error(f"Job {job['id']} failed: {e}")
+                job.update(status=FAILED, error=str(e) or type(e).__name__)
+            job["finished_at"] = round(time.time(), 3)
+            self.store.put(job)
+        except Exception as e:
+            logger.error(f"Job {job['id']} could not be stored: {e}")
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.counts[SUCCEEDED if job["status"] == SUCCEEDED else FAILED] += 1
+                listeners = self._listeners.pop(job["id"], ())
+            for wake in listeners:
+                wake()
+
+    def get(self, job_id: str):
+        return self.store.get(job_id)
+
+    def _listen(self, job_id: str, wake):
+        with self._lock:
+            self._listeners.setdefault(job_id, []).append(wake)
+
+    def _unlisten(self, job_id: str, wake):
+        with self._lock:
+            listeners = self._listeners.get(job_id)
+            if listeners and wake in listeners:
+                listeners.remove(wake)
+                if not listeners:
+                    del self._listeners[job_id]
+
+    def wait(self, job_id: str, timeout: float = 0):
+        """The job once it has finished or timeout seconds have passed; None when unknown or expired"""
+        deadline = time.monotonic() + timeout
+        event = threading.Event()
+        self._listen(job_id, event.set)
+        try:
+            while True:
+                job = self.store.get(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job["status"] in FINISHED or remaining <= 0:
+                    return job
+                event.wait(min(remaining, self.poll_interval))
+        finally:
+            self._unlisten(job_id, event.set)
+
+    async def await_job(self, job_id: str, timeout: float = 0):
+        """Async variant of wait"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        event = asyncio.Event()
+
+        def wake():
+            loop.call_soon_threadsafe(event.set)
+
+        self._listen(job_id, wake)
+        try:
+            while True:
+                job = await asyncio.to_thread(self.store.get, job_id)
+                remaining = deadline - loop.time()
+                if job is None or job["status"] in FINISHED or remaining <= 0:
+                    return job
+                try:
+                    await asyncio.wait_for(event.wait(), min(remaining, self.poll_interval))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._unlisten(job_id, wake)
+
+    def stats(self) -> dict:
+        return dict(self.counts, pending=self.pending, workers=self.workers, store=type(self.store).__name__,
+                    stored=len(self.store))
+
+    def metrics_lines(self) -> list:
+        lines = [
+            "# HELP prompt_optimizer_jobs_pending Optimization jobs queued or running in this process",
+            "# TYPE prompt_optimizer_jobs_pending gauge",
+            f"prompt_optimizer_jobs_pending {self.pending}",
+            "# HELP prompt_optimizer_jobs_total Optimization jobs by outcome",
+            "# TYPE prompt_optimizer_jobs_total counter",
+        ]
+        lines += [f'prompt_optimizer_jobs_total{{outcome="{outcome}"}} {count}' for outcome, count in self.counts.items()]
+        return lines
+
+
+def create_job_queue(run):
+    """Build the job queue from JOBS_* environment variables, or None unless enabled"""
+    if os.getenv("JOBS_ENABLED", "0") != "1":
+        return None
+    ttl = float(os.getenv("JOBS_RESULT_TTL", "3600"))
+    store = MemoryJobStore(ttl=ttl)
+    db_path = os.getenv("JOBS_DB")
+    if db_path:
+        try:
+            store = SQLiteJobStore(db_path, ttl=ttl)
+        except Exception as e:
+            logger.error(f"Failed to open job database {db_path}, keeping jobs in memory: {e}")
+    return JobQueue(
+        store,
+        run,
+        workers=int(os.getenv("JOBS_CONCURRENCY", "8")),
+        max_pending=int(os.getenv("JOBS_MAX_PENDING", "1000")),
+    )
@@ -0,0 +1,178 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger("prompt_optimizer")
+
+_STOP = object()
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class RequestJournal:
+    """Appends one JSON line per finished optimization to rotating files
+
+    record() only puts the trace's fields on a bounded queue, so the request
+    thread never touches the disk; a background thread hashes the prompts,
+    writes the lines in batches and flushes at most every flush_interval
+    seconds. When the queue is full entries are dropped and counted rather
+    than slowing requests down. Each process writes its own
+    journal-<pid>.jsonl, rotated to .1, .2, ... past max_bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, backups: int = 5,
+                 store_prompts: bool = False, flush_interval: float = 1.0, batch_size: int = 512,
+                 max_pending: int = 10000):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.store_prompts = store_prompts
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._file = None
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"journal-{os.getpid()}.jsonl")
+
+    def record(self, trace):
+        """Tracer sink: queue a finished trace for writing"""
+        if trace.prompt is None:
+            return
+        self._ensure_writer()
+        entry = (time.time() - trace.total, trace.context, trace.prompt, dict(trace.stages), trace.total, trace.path)
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_writer(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            # A forked worker inherits the queue but not the thread, so it starts its own
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._file = None
+            self._thread = threading.Thread(target=self._run, name="request-journal", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        while True:
+            entries = [self._queue.get()]
+            # Gather a batch until it is full or flush_interval has passed since its first entry
+            deadline = time.monotonic() + self.flush_interval
+            while len(entries) < self.batch_size and entries[-1] is not _STOP:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entries.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            stop = _STOP in entries
+            try:
+                self._write([entry for entry in entries if entry is not _STOP])
+            except OSError as e:
+                logger.error(f"Request journal write failed: {e}")
+            if stop:
+                if self._file:
+                    self._file.close()
+                    self._file = None
+                return
+
+    def _write(self, entries: list):
+        if not entries:
+            return
+        lines = []
+        for started, context, prompt, stages, total, path in entries:
+            line = {
+                "ts": round(started, 3),
+                "context": context,
+                "prompt_hash": prompt_hash(prompt),
+                "prompt_len": len(prompt),
+                "stages": {name: round(seconds * 1000, 2) for name, seconds in stages.items()},
+                "total_ms": round(total * 1000, 2),
+                "path": path,
+            }
+            if self.store_prompts:
+                line["prompt"] = prompt
+            lines.append(json.dumps(line, ensure_ascii=False) + "\n")
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8", buffering=1024 * 1024)
+        self._file.write("".join(lines))
+        self._file.flush()
+        self.written += len(lines)
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        path = self.path
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{n}"):
+                os.replace(f"{path}.{n}", f"{path}.{n + 1}")
+        if self.backups:
+            os.replace(path, f"{path}.1")
+        else:
+            os.remove(path)
+
+    def close(self, timeout: float = 5.0):
+        """Write out everything queued so far and stop the writer thread"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "written": self.written,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize(),
+        }
+
+
+def read_journal(directory: str) -> list:
+    """Every entry under directory, oldest first, across workers and rotated files"""
+    def rotation(path):
+        suffix = path.rsplit(".jsonl", 1)[1]
+        return -int(suffix[1:]) if suffix else 0
+
+    # Oldest file first, so entries sharing a millisecond keep their written order through the stable sort
+    entries = []
+    for path in sorted(glob.glob(os.path.join(directory, "journal-*.jsonl*")), key=rotation):
+        with open(path, "r", encoding="utf-8") as f:
+            entries.extend(json.loads(line) for line in f if line.strip())
+    entries.sort(key=lambda entry: entry["ts"])
+    return entries
+
+
+def create_request_journal():
+    """Build the journal from REQUEST_JOURNAL_* environment variables, or None when unset"""
+    directory = os.getenv("REQUEST_JOURNAL_DIR")
+    if not directory:
+        return None
+    return RequestJournal(
+        directory,
+        max_bytes=int(float(os.getenv("REQUEST_JOURNAL_MAX_MB", "64")) * 1024 * 1024),
+        backups=int(os.getenv("REQUEST_JOURNAL_BACKUPS", "5")),
+        store_prompts=os.getenv("REQUEST_JOURNAL_PROMPTS", "0") == "1",
+    )
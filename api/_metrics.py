@@ -0,0 +1,200 @@
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# The trace of the optimization running in this thread or task, if any
+_current_trace = contextvars.ContextVar("prompt_optimizer_trace", default=None)
+_NULL_STAGE = nullcontext()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+class Histogram:
+    """Prometheus-style histogram with one series per label tuple"""
+
+    def __init__(self, name: str, help_text: str, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(snapshot):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{_format_bound(bound)}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+
+class _Stage:
+    __slots__ = ("trace", "name", "started")
+
+    def __init__(self, trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.add(self.name, time.perf_counter() - self.started)
+
+
+class Trace:
+    """Per-stage timings of one optimization
+
+    Entering the trace makes it current so stage() calls anywhere below
+    record into it; finish() feeds the histograms once the serving path
+    (llm, cache or fallback) is known.
+    """
+
+    def __init__(self, tracer, context: str, prompt: str = None):
+        self.tracer = tracer
+        self.context = context
+        self.prompt = prompt
+        self.path = "fallback"
+        self.stages = {}
+        self.started = time.perf_counter()
+        self.total = None
+        self._tokens = []
+
+    def __enter__(self):
+        self._tokens.append(_current_trace.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_trace.reset(self._tokens.pop())
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def finish(self):
+        if self.total is None:
+            self.total = time.perf_counter() - self.started
+            self.tracer.record(self)
+
+    def timings(self) -> dict:
+        timings = {f"{name}_ms": round(seconds * 1000, 2) for name, seconds in self.stages.items()}
+        if self.total is not None:
+            timings["total_ms"] = round(self.total * 1000, 2)
+        timings["path"] = self.path
+        return timings
+
+
+class _NullTrace:
+    """Stand-in used when neither metrics nor debug timings are wanted"""
+
+    # Shared by every caller, so the serving path is accepted and dropped
+    path = property(lambda self: None, lambda self, value: None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def add(self, name: str, seconds: float):
+        pass
+
+    def finish(self):
+        pass
+
+    def timings(self) -> dict:
+        return {}
+
+
+NULL_TRACE = _NullTrace()
+
+
+def stage(name: str):
+    """Time a pipeline stage into the current trace; a shared no-op when there is none"""
+    trace = _current_trace.get()
+    return _NULL_STAGE if trace is None else _Stage(trace, name)
+
+
+def set_path(path: str):
+    """Record how the current optimization was served: llm, cache or fallback"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.path = path
+
+
+class Tracer:
+    """Creates traces and aggregates finished ones into latency histograms"""
+
+    def __init__(self, enabled: bool = True, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.stage_seconds = Histogram(
+            "prompt_optimizer_stage_duration_seconds",
+            "Time spent in each stage of the optimize pipeline",
+            ("stage", "context", "path"),
+            buckets
+        )
+        self.request_seconds = Histogram(
+            "prompt_optimizer_request_duration_seconds",
+            "End-to-end optimization time",
+            ("context", "path"),
+            buckets
+        )
+        # Callables returning extra exposition lines, e.g. breaker state
+        self.collectors = []
+        # Callables receiving every finished trace, e.g. the request journal
+        self.sinks = []
+
+    def trace(self, context: str, debug: bool = False, prompt: str = None):
+        """Start a trace, or return NULL_TRACE when nothing would consume it"""
+        if not (self.enabled or debug or self.sinks):
+            return NULL_TRACE
+        return Trace(self, context, prompt)
+
+    def record(self, trace: Trace):
+        if self.enabled:
+            for name, seconds in trace.stages.items():
+                self.stage_seconds.observe((name, trace.context, trace.path), seconds)
+            self.request_seconds.observe((trace.context, trace.path), trace.total)
+        for sink in self.sinks:
+            sink(trace)
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = self.stage_seconds.render() + self.request_seconds.render()
+        for collector in self.collectors:
+            lines += collector()
+        return "\n".join(lines) + "\n"
+
+
+def create_tracer() -> Tracer:
+    """Build the tracer from environment settings"""
+    return Tracer(enabled=os.getenv("METRICS_ENABLED", "1") != "0")
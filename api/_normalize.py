@@ -0,0 +1,61 @@
+import re
+from functools import lru_cache
+
+DEFAULT_FILLER_WORDS = ["actually", "basically", "just", "like", "I mean", "you know", "um", "uh", "well"]
+
+# Whitespace other than a lone space; lone spaces are already normalized
+_WHITESPACE = re.compile(r"[^\S ]\s*| \s+")
+# Once whitespace is collapsed, the comma/period rules only touch maximal runs of
+# spaces, commas and periods that contain punctuation, so each run is normalized on its own
+_PUNCTUATION_RUN = re.compile(r" ?[,.][ ,.]*")
+_COMMA = re.compile(r"\s*,\s*")
+_PERIOD = re.compile(r"\s*\.\s*")
+
+
+def trie_pattern(words, fold_case: bool = True) -> str:
+    """Build a regex alternation with shared prefixes factored out, case-folded unless fold_case is off"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in (word.lower() if fold_case else word):
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node):
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")" + ("?" if "" in node else "")
+
+    return emit(trie)
+
+
+@lru_cache(maxsize=1024)
+def _normalize_run(run: str) -> str:
+    """Space commas and periods within one punctuation run"""
+    run = _COMMA.sub(", ", run)
+    return _PERIOD.sub(". ", run)
+
+
+def _replace_run(match) -> str:
+    return _normalize_run(match.group(0))
+
+
+class PromptNormalizer:
+    """Removes filler words and normalizes spacing in three linear regex passes"""
+
+    def __init__(self, filler_words=DEFAULT_FILLER_WORDS):
+        self.filler_words = list(filler_words)
+        if self.filler_words:
+            self._filler = re.compile(r"\b" + trie_pattern(self.filler_words) + r"\b", re.IGNORECASE)
+        else:
+            self._filler = None
+
+    def normalize(self, prompt: str) -> str:
+        cleaned = self._filler.sub("", prompt) if self._filler else prompt
+        cleaned = _WHITESPACE.sub(" ", cleaned)
+        cleaned = _PUNCTUATION_RUN.sub(_replace_run, cleaned)
+        # Runs now only contain spaces, commas and periods
+        return cleaned.strip(" ,.")
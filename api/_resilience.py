@@ -0,0 +1,282 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Gauge values exported for each breaker state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the model while its breaker is open"""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when no LLM call finished within the context deadline"""
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then admits one probe call per reset_timeout"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+                self.probing = False
+            # Half-open: a single probe decides whether to close again
+            if self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.trips += 1
+
+
+class LatencyWindow:
+    """Recent successful call latencies, for deriving the hedge delay"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def quantile(self, q: float):
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilientCaller:
+    """Deadline, per-model circuit breaker and optional hedging around LLM calls
+
+    A call runs on a worker pool so the request thread stops waiting at the
+    deadline even when the HTTP client would keep retrying. With hedging on,
+    a second identical call starts once the first has run longer than the
+    recent latency quantile, and whichever finishes first wins.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, hedge: bool = False,
+                 hedge_quantile: float = 0.95, max_workers: int = 64):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.max_workers = max_workers
+        self.breakers = {}
+        self.latencies = {}
+        self.counters = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _model_state(self, key: str):
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                if key not in self.breakers:
+                    self.latencies[key] = LatencyWindow()
+                    self.counters[key] = dict.fromkeys(
+                        ("success", "failure", "timeout", "rejected", "hedged", "hedge_wins"), 0)
+                    self.breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                breaker = self.breakers[key]
+        return breaker
+
+    def _count(self, key: str, name: str):
+        with self._lock:
+            self.counters[key][name] += 1
+
+    def reset_after_fork(self):
+        """Forget the parent's thread pool; its threads do not exist in a forked child"""
+        self._executor = None
+
+    def get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm")
+        return self._executor
+
+    def admit(self, key: str) -> bool:
+        """Whether a call to key may go ahead; callers must then report it with record()"""
+        if self._model_state(key).allow():
+            return True
+        self._count(key, "rejected")
+        return False
+
+    def record(self, key: str, ok: bool, seconds: float = None, timed_out: bool = False):
+        breaker = self._model_state(key)
+        if ok:
+            breaker.record_success()
+            if seconds is not None:
+                self.latencies[key].add(seconds)
+            self._count(key, "success")
+        else:
+            breaker.record_failure()
+            self._count(key, "timeout" if timed_out else "failure")
+
+    def hedge_delay(self, key: str):
+        return self.latencies[key].quantile(self.hedge_quantile) if self.hedge else None
+
+    def call(self, key: str, fn, deadline: float):
+        """Run fn() for model key within deadline seconds"""
+        if not self.admit(key):
+            raise CircuitOpenError(f"Circuit open for {key}")
+        started = time.perf_counter()
+        hedge_delay = self.hedge_delay(key)
+        executor = self.get_executor()
+        primary = executor.submit(fn)
+        pending = {primary}
+        hedged = False
+        error = None
+        while pending:
+            elapsed = time.perf_counter() - started
+            if elapsed >= deadline:
+                break
+            timeout = deadline - elapsed
+            if hedge_delay is not None and not hedged:
+                timeout = min(timeout, max(hedge_delay - elapsed, 0.0))
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self._finish_success(key, started, hedged and future is not primary)
+                    return future.result()
+                error = future.exception()
+            if not done and hedge_delay is not None and not hedged:
+                hedged = True
+                self._count(key, "hedged")
+                pending.add(executor.submit(fn))
+
+        for future in pending:
+            future.cancel()
+        timed_out = bool(pending)
+        self.record(key, False, timed_out=timed_out)
+        if timed_out:
+            raise DeadlineExceeded(f"LLM call exceeded {deadline:g}s deadline")
+        raise error
+
+    async def acall(self, key: str, make_coroutine, deadline: float):
+        """Async variant of call; make_coroutine() starts one LLM request"""
+        if not self.admit(key):
+            raise CircuitOpenError(f"Circuit open for {key}")
+        started = time.perf_counter()
+        hedge_delay = self.hedge_delay(key)
+        primary = asyncio.ensure_future(make_coroutine())
+        pending = {primary}
+        hedged = False
+        error = None
+        try:
+            while pending:
+                elapsed = time.perf_counter() - started
+                if elapsed >= deadline:
+                    break
+                timeout = deadline - elapsed
+                if hedge_delay is not None and not hedged:
+                    timeout = min(timeout, max(hedge_delay - elapsed, 0.0))
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._finish_success(key, started, hedged and task is not primary)
+                        return task.result()
+                    error = task.exception()
+                if not done and hedge_delay is not None and not hedged:
+                    hedged = True
+                    self._count(key, "hedged")
+                    pending.add(asyncio.ensure_future(make_coroutine()))
+        finally:
+            for task in pending:
+                task.cancel()
+
+        timed_out = bool(pending)
+        self.record(key, False, timed_out=timed_out)
+        if timed_out:
+            raise DeadlineExceeded(f"LLM call exceeded {deadline:g}s deadline")
+        raise error
+
+    def _finish_success(self, key: str, started: float, hedge_won: bool):
+        if hedge_won:
+            self._count(key, "hedge_wins")
+        self.record(key, True, time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = {key: dict(values) for key, values in self.counters.items()}
+        stats = {}
+        for key, values in counters.items():
+            breaker = self.breakers[key]
+            stats[key] = dict(
+                values,
+                state=breaker.state,
+                trips=breaker.trips,
+                hedge_win_rate=round(values["hedge_wins"] / values["hedged"], 3) if values["hedged"] else None,
+            )
+        return stats
+
+    def metrics_lines(self) -> list:
+        """Breaker state and call outcome series in Prometheus text format"""
+        stats = self.stats()
+        lines = [
+            "# HELP prompt_optimizer_llm_breaker_state LLM circuit breaker state (0 closed, 1 half-open, 2 open)",
+            "# TYPE prompt_optimizer_llm_breaker_state gauge",
+        ]
+        lines += [f'prompt_optimizer_llm_breaker_state{{model="{key}"}} {STATE_VALUES[s["state"]]}' for key, s in stats.items()]
+        lines += [
+            "# HELP prompt_optimizer_llm_calls_total LLM calls by outcome",
+            "# TYPE prompt_optimizer_llm_calls_total counter",
+        ]
+        for key, s in stats.items():
+            for outcome in ("success", "failure", "timeout", "rejected"):
+                lines.append(f'prompt_optimizer_llm_calls_total{{model="{key}",outcome="{outcome}"}} {s[outcome]}')
+        lines += [
+            "# HELP prompt_optimizer_llm_hedges_total Hedged second calls sent, and how many finished first",
+            "# TYPE prompt_optimizer_llm_hedges_total counter",
+        ]
+        for key, s in stats.items():
+            lines.append(f'prompt_optimizer_llm_hedges_total{{model="{key}",result="sent"}} {s["hedged"]}')
+            lines.append(f'prompt_optimizer_llm_hedges_total{{model="{key}",result="won"}} {s["hedge_wins"]}')
+        return lines
+
+
+def create_resilient_caller() -> ResilientCaller:
+    """Build the LLM call guard from environment settings"""
+    return ResilientCaller(
+        failure_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30")),
+        hedge=os.getenv("LLM_HEDGE_ENABLED", "0") == "1",
+        hedge_quantile=float(os.getenv("LLM_HEDGE_QUANTILE", "0.95")),
+        max_workers=int(os.getenv("LLM_MAX_CONCURRENCY", "64")),
+    )
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger("prompt_optimizer")
+
+# Bump when the snapshot layout changes so old files are ignored
+SNAPSHOT_VERSION = 1
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Return a contiguous float32 matrix whose rows have unit length"""
+    matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+class LocalStrategyIndex:
+    """In-process cosine index over the strategy corpus"""
+
+    def __init__(self, texts, matrix, embeddings=None, normalized=False):
+        if len(texts) != len(matrix):
+            raise ValueError("texts and matrix must have the same number of rows")
+        self.texts = list(texts)
+        self.rows = {text: i for i, text in enumerate(self.texts)}
+        # Snapshot matrices are already unit-length float32, so keep the mapped view
+        self.matrix = matrix if normalized else normalize_rows(matrix)
+        self.embeddings = embeddings
+
+    @classmethod
+    def build(cls, texts, embeddings):
+        """Embed every text once and index the result"""
+        texts = list(texts)
+        return cls(texts, embeddings.embed_documents(texts), embeddings)
+
+    def search_vector(self, vector, k: int = 1, candidates=None):
+        """Return the k most similar (text, score) pairs for an embedding, optionally among candidates only"""
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        if candidates is not None:
+            rows = [self.rows[text] for text in candidates if text in self.rows]
+            scores = self.matrix[rows] @ query
+            texts = [self.texts[i] for i in rows]
+        else:
+            scores = self.matrix @ query
+            texts = self.texts
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        if k == 1:
+            top = [int(np.argmax(scores))]
+        else:
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+        return [(texts[i], float(scores[i])) for i in top]
+
+    def search_vectors(self, vectors, k: int = 1):
+        """Return the k most relevant strategy texts for each row of vectors"""
+        queries = normalize_rows(vectors)
+        scores = queries @ self.matrix.T
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            return [[] for _ in range(len(queries))]
+        top = np.argsort(-scores, axis=1)[:, :k]
+        return [[self.texts[i] for i in row] for row in top]
+
+    def search(self, query: str, k: int = 1, vector=None, candidates=None):
+        """Return the k most relevant strategy texts for a query"""
+        if vector is None:
+            if self.embeddings is None:
+                return []
+            vector = self.embeddings.embed_query(query)
+        return [text for text, _ in self.search_vector(vector, k, candidates)]
+
+    async def asearch(self, query: str, k: int = 1, vector=None, candidates=None):
+        """Async variant of search that embeds the query without blocking"""
+        if vector is None:
+            if self.embeddings is None:
+                return []
+            vector = await self.embeddings.aembed_query(query)
+        return [text for text, _ in self.search_vector(vector, k, candidates)]
+
+
+def text_hash(text: str) -> str:
+    """Stable content hash used to detect changed corpus entries"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def manifest_path(snapshot_path: str) -> str:
+    return os.path.splitext(snapshot_path)[0] + ".json"
+
+
+def save_snapshot(snapshot_path: str, texts, vectors, model: str):
+    """Write normalized corpus embeddings (.npy) and their manifest (.json)"""
+    texts = list(texts)
+    matrix = normalize_rows(vectors)
+    hashes = [text_hash(text) for text in texts]
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "model": model,
+        "dimension": int(matrix.shape[1]),
+        "count": len(texts),
+        "corpus_hash": text_hash("\n".join(hashes)),
+        "text_hashes": hashes,
+    }
+    # Write to temporary files and swap them in so running servers never map a partial file
+    with open(snapshot_path + ".tmp", "wb") as f:
+        np.save(f, matrix)
+    with open(manifest_path(snapshot_path) + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    os.replace(snapshot_path + ".tmp", snapshot_path)
+    os.replace(manifest_path(snapshot_path) + ".tmp", manifest_path(snapshot_path))
+    return manifest
+
+
+def load_snapshot(snapshot_path: str, model: str):
+    """Memory-map a snapshot, returning (text_hashes, matrix) or (None, None)"""
+    try:
+        with open(manifest_path(snapshot_path), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None, None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable strategy snapshot manifest: {e}")
+        return None, None
+
+    if manifest.get("version") != SNAPSHOT_VERSION or manifest.get("model") != model:
+        logger.info("Strategy snapshot was built for a different format or model; ignoring it")
+        return None, None
+    try:
+        matrix = np.load(snapshot_path, mmap_mode="r")
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable strategy snapshot: {e}")
+        return None, None
+    if matrix.dtype != np.float32 or matrix.shape != (manifest["count"], manifest["dimension"]):
+        logger.warning("Strategy snapshot does not match its manifest; ignoring it")
+        return None, None
+    return manifest["text_hashes"], matrix
+
+
+def load_strategy_index(snapshot_path: str, texts, embeddings, model: str):
+    """Build a LocalStrategyIndex from the snapshot, embedding only changed texts
+
+    Returns (index, embedded_count). When the snapshot matches the corpus the
+    matrix stays memory-mapped and no embedding calls are made.
+    """
+    texts = list(texts)
+    hashes = [text_hash(text) for text in texts]
+    snapshot_hashes, matrix = load_snapshot(snapshot_path, model) if snapshot_path else (None, None)
+
+    if snapshot_hashes == hashes:
+        return LocalStrategyIndex(texts, matrix, embeddings, normalized=True), 0
+
+    known = {h: i for i, h in enumerate(snapshot_hashes or [])}
+    missing = [text for text, h in zip(texts, hashes) if h not in known]
+    fresh = iter(embeddings.embed_documents(missing)) if missing else iter(())
+    rows = [matrix[known[h]] if h in known else next(fresh) for h in hashes]
+    return LocalStrategyIndex(texts, rows, embeddings), len(missing)
+
+
+class RetrieverStrategyIndex:
+    """Adapter exposing a LangChain retriever (e.g. Pinecone) as a strategy index"""
+
+    def __init__(self, retriever):
+        self.retriever = retriever
+
+    def search(self, query: str, k: int = 1, vector=None, candidates=None):
+        """Return the k most relevant strategy texts for a query"""
+        return self._top(self.retriever.get_relevant_documents(query), k, candidates)
+
+    async def asearch(self, query: str, k: int = 1, vector=None, candidates=None):
+        """Async variant of search using the retriever's native async query"""
+        return self._top(await self.retriever.ainvoke(query), k, candidates)
+
+    def _top(self, results, k: int, candidates):
+        texts = [doc.page_content for doc in results]
+        if candidates is not None:
+            # The remote index cannot be restricted, so filter what it returned
+            allowed = set(candidates)
+            texts = [text for text in texts if text in allowed]
+        return texts[:k]
@@ -0,0 +1,119 @@
+import os
+import re
+import threading
+
+LOCAL = "local"
+LLM = "llm"
+
+# Lower-case tokens no dictionary fixes: letters mixed with digits (gr8, b4)
+# or no vowels at all (thx, hlp). Capitalized acronyms are not counted.
+_NOISE = re.compile(r"\b(?:(?=[a-z]*\d)(?=\d*[a-z])[a-z\d]+|[b-df-hj-np-tv-xz]{2,})\b")
+
+# Words, with an optional contraction or possessive ("don't", "team's")
+_WORD = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+
+# Grammar the dictionary cannot fix: an object pronoun opening a sentence
+# ("me and him went") and common subject-verb disagreements ("she don't")
+_GRAMMAR = re.compile(
+    r"(?:^|[.!?]\s+)(?:me|him|her|them|us)\b"
+    r"|\b(?:he|she|it) (?:don't|are|were|have|do|go)\b"
+    r"|\bi (?:is|are|has|goes|does|doesn't)\b"
+    r"|\b(?:we|they|you) (?:is|was|has|goes|does|doesn't)\b",
+    re.IGNORECASE,
+)
+
+# Code the dictionary would mangle: assignments, operators, brackets and
+# backticks ("i = 0", "f(u)") or dotted names ("self.u")
+_CODE = re.compile(r"[=<>{}\[\]();`|&*/\\^%+]|\w\.\w")
+
+DEFAULT_VOCABULARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "router_vocabulary.txt")
+
+
+def load_vocabulary(path: str) -> frozenset:
+    """Whitespace-separated words from path, lower-cased; # starts a comment line"""
+    with open(path, "r", encoding="utf-8") as f:
+        return frozenset(word.lower() for line in f if not line.startswith("#") for word in line.split())
+
+
+class TierRouter:
+    """Chooses between the local rule-based engine and the LLM per request
+
+    The local engine only fixes dictionary misspellings and shorthand, so a
+    prompt goes local only on positive evidence that this is all it needs:
+    it is short, in a context with a local engine, the dictionary corrected
+    at least one word, and afterwards every word is a known correct word
+    (the vocabulary or a spelling-dictionary correction) with no noise the
+    dictionary cannot fix, no grammar it cannot fix and nothing that looks
+    like code, where "u" or "i" is a variable. Anything else,
+    including prompts with nothing to correct, goes to the LLM. Length is
+    checked first, so long prompts are never scanned.
+    """
+
+    def __init__(self, corrector, max_words: dict, vocabulary=frozenset(), max_typo_density: float = 0.5):
+        self.corrector = corrector
+        self.max_words = max_words
+        self.known_words = frozenset(vocabulary) | frozenset(corrector.spelled_words)
+        self.max_typo_density = max_typo_density
+        self.counts = {LOCAL: 0, LLM: 0}
+        self._lock = threading.Lock()
+
+    def features(self, prompt: str, context: str) -> dict:
+        words = len(prompt.split())
+        limit = self.max_words.get(context, 0)
+        scan = bool(words) and words <= limit
+        if not scan:
+            return {"context": context, "words": words, "typos": None, "typo_density": None, "noise": None,
+                    "unknown": None, "grammar": None, "code": None}
+        corrected, typos = self.corrector.apply(prompt)
+        unknown = [word for word in _WORD.findall(corrected) if self._unknown(word)]
+        return {
+            "context": context,
+            "words": words,
+            "typos": typos,
+            "typo_density": round(typos / words, 3),
+            "noise": len(_NOISE.findall(prompt)),
+            "unknown": len(unknown),
+            "grammar": len(_GRAMMAR.findall(corrected)),
+            "code": len(_CODE.findall(prompt)),
+        }
+
+    def _unknown(self, word: str) -> bool:
+        word = word.lower()
+        if word.endswith("'s"):
+            word = word[:-2]
+        return word not in self.known_words
+
+    def route(self, prompt: str, context: str) -> str:
+        features = self.features(prompt, context)
+        local = (
+            features["typos"] is not None
+            and features["typos"] >= 1
+            and features["typo_density"] <= self.max_typo_density
+            and features["noise"] == 0
+            and features["unknown"] == 0
+            and features["grammar"] == 0
+            and features["code"] == 0
+        )
+        tier = LOCAL if local else LLM
+        with self._lock:
+            self.counts[tier] += 1
+        return tier
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        total = counts[LOCAL] + counts[LLM]
+        return dict(counts, local_share=round(counts[LOCAL] / total, 3) if total else None)
+
+
+def create_tier_router(corrector, max_words: dict):
+    """Build the router from ROUTER_* environment variables, or None unless enabled"""
+    if os.getenv("ROUTER_ENABLED", "0") != "1":
+        return None
+    scale = float(os.getenv("ROUTER_MAX_WORDS_SCALE", "1"))
+    return TierRouter(
+        corrector,
+        {context: int(words * scale) for context, words in max_words.items()},
+        vocabulary=load_vocabulary(os.getenv("ROUTER_VOCABULARY_PATH", DEFAULT_VOCABULARY_PATH)),
+        max_typo_density=float(os.getenv("ROUTER_MAX_TYPO_DENSITY", "0.5")),
+    )
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class _ContextBucket:
+    """Unit vectors of one namespace in a matrix that doubles as it fills
+
+    Rows stay packed: removing an entry moves the last row into its place.
+    """
+
+    def __init__(self, dimension: int, initial_rows: int = 16):
+        self.vectors = np.zeros((initial_rows, dimension), dtype=np.float32)
+        self.values = []
+        self.ids = []
+        # entry id -> row
+        self.rows = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query):
+        if not self.ids:
+            return None, 0.0
+        scores = self.vectors[:len(self.ids)] @ query
+        row = int(np.argmax(scores))
+        return self.ids[row], float(scores[row])
+
+    def value(self, entry_id: int):
+        return self.values[self.rows[entry_id]]
+
+    def set_value(self, entry_id: int, value):
+        self.values[self.rows[entry_id]] = value
+
+    def add(self, entry_id: int, vector, value):
+        row = len(self.ids)
+        if row == len(self.vectors):
+            grown = np.zeros((2 * row, self.vectors.shape[1]), dtype=np.float32)
+            grown[:row] = self.vectors
+            self.vectors = grown
+        self.vectors[row] = vector
+        self.values.append(value)
+        self.ids.append(entry_id)
+        self.rows[entry_id] = row
+
+    def remove(self, entry_id: int):
+        row = self.rows.pop(entry_id)
+        last = len(self.ids) - 1
+        if row != last:
+            self.vectors[row] = self.vectors[last]
+            self.values[row] = self.values[last]
+            self.ids[row] = self.ids[last]
+            self.rows[self.ids[row]] = row
+        self.values.pop()
+        self.ids.pop()
+
+
+def semantic_namespace(context: str, model: str, strategy: str) -> str:
+    """Bucket for prompts whose answers are interchangeable: same context, model and strategy"""
+    return f"{context}/{model}/{hashlib.sha256(strategy.encode('utf-8')).hexdigest()[:12]}"
+
+
+class SemanticCache:
+    """Near-duplicate cache that matches prompts by embedding cosine similarity
+
+    Contexts in skip_contexts are never looked up or stored: a rephrase of
+    "the test passed" must not answer "the test never passed", however close
+    their embeddings are. capacity bounds the entries across all namespaces,
+    evicting the least recently used, and a namespace left empty is dropped.
+    """
+
+    def __init__(self, threshold: float = 0.97, capacity: int = 512, skip_contexts=frozenset({"rephrase"})):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.skip_contexts = frozenset(skip_contexts)
+        self.hits = 0
+        self.misses = 0
+        self._buckets = {}
+        # entry id -> namespace, ordered from least to most recently used
+        self._lru = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def covers(self, context: str) -> bool:
+        return context not in self.skip_contexts
+
+    def get(self, namespace, vector):
+        """Return the stored value closest to vector if it clears the threshold"""
+        query = self._normalize(vector)
+        with self._lock:
+            bucket = self._buckets.get(namespace)
+            if bucket is not None and bucket.vectors.shape[1] == query.shape[0]:
+                entry_id, score = bucket.search(query)
+                if entry_id is not None and score >= self.threshold:
+                    self._lru.move_to_end(entry_id)
+                    self.hits += 1
+                    return bucket.value(entry_id)
+            self.misses += 1
+            return None
+
+    def add(self, namespace, vector, value):
+        query = self._normalize(vector)
+        with self._lock:
+            bucket = self._buckets.get(namespace)
+            if bucket is not None and bucket.vectors.shape[1] != query.shape[0]:
+                # A new embeddings model: the old vectors can never match again
+                self._drop(namespace)
+                bucket = None
+            if bucket is None:
+                bucket = self._buckets[namespace] = _ContextBucket(query.shape[0])
+            entry_id, score = bucket.search(query)
+            if entry_id is not None and score >= 0.9999:
+                # Same prompt again: refresh the stored answer instead of duplicating it
+                bucket.set_value(entry_id, value)
+                self._lru.move_to_end(entry_id)
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            bucket.add(entry_id, query, value)
+            self._lru[entry_id] = namespace
+            while len(self._lru) > self.capacity:
+                evicted, evicted_namespace = self._lru.popitem(last=False)
+                evicted_bucket = self._buckets[evicted_namespace]
+                evicted_bucket.remove(evicted)
+                if not evicted_bucket:
+                    del self._buckets[evicted_namespace]
+
+    def _drop(self, namespace):
+        for entry_id in self._buckets.pop(namespace).ids:
+            del self._lru[entry_id]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._lru.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+            entries = {namespace: len(bucket) for namespace, bucket in self._buckets.items()}
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "threshold": self.threshold,
+            "capacity": self.capacity,
+            "skip_contexts": sorted(self.skip_contexts),
+            "entries": entries,
+        }
+
+
+def create_semantic_cache():
+    """Build the semantic cache from SEMANTIC_CACHE_* environment variables, or None unless enabled"""
+    if os.getenv("SEMANTIC_CACHE_ENABLED", "0") != "1":
+        return None
+    return SemanticCache(
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97")),
+        capacity=int(os.getenv("SEMANTIC_CACHE_SIZE", "512")),
+        skip_contexts={context for context in os.getenv("SEMANTIC_CACHE_SKIP_CONTEXTS", "rephrase").split(",") if context},
+    )
@@ -0,0 +1,179 @@
+import json
+import re
+import threading
+
+# Placeholders a template may use; {prompt} must appear exactly once
+PLACEHOLDER = re.compile(r"\{(strategy|instruction|context|prompt)\}")
+
+# Built-in templates by context; "default" serves every context without its own
+DEFAULT_TEMPLATES = {
+    "image_generation": """You are a World-Class Image Generation Prompt Engineer.
+
+Your mission is to transform the user's basic idea into a masterpiece-level prompt.
+
+OPTIMIZATION STRATEGY: {strategy}
+CONTEXT INSTRUCTIONS: {instruction}
+
+PROMPT STRUCTURE REQUIREMENTS:
+- Start with a clear, powerful subject description
+- Add specific visual attributes and characteristics
+- Include professional composition details
+- Specify lighting with professional terminology
+- Define artistic style and medium with specific references
+- Add emotional and atmospheric elements
+- Include technical quality specifications
+- Add environmental context and background details
+- Specify color palette and visual harmony
+- Include negative prompts to avoid common issues
+
+USER'S ORIGINAL REQUEST: {prompt}
+
+Return ONLY the optimized, professional-grade image generation prompt.""",
+
+    "video_generation": """You are a World-Class Video Generation Prompt Engineer.
+
+Your mission is to transform the user's basic idea into a masterpiece-level prompt.
+
+OPTIMIZATION STRATEGY: {strategy}
+CONTEXT INSTRUCTIONS: {instruction}
+
+PROMPT STRUCTURE REQUIREMENTS:
+- Start with a clear, powerful subject description
+- Add specific visual attributes and characteristics
+- Include professional composition details
+- Specify lighting with professional terminology
+- Define artistic style and medium with specific references
+- Add emotional and atmospheric elements
+- Include technical quality specifications
+- Add environmental context and background details
+- Specify color palette and visual harmony
+- Include negative prompts to avoid common issues
+
+USER'S ORIGINAL REQUEST: {prompt}
+
+Return ONLY the optimized, professional-grade video generation prompt.""",
+
+    "rephrase": """You are a Text Optimization AI specializing in grammar correction and text refinement.
+
+Your task:
+1. Apply the given prompting strategy: {strategy}
+2. {instruction}
+3. Correct all spelling mistakes and grammatical errors
+4. Improve sentence structure and flow
+5. Make the text more professional and clear
+
+Original User Text: {prompt}
+
+Return ONLY the corrected and optimized text with proper grammar, spelling, and clarity.""",
+
+    "cursor_code_optimizer": """You are a Senior Software Developer and Prompt Engineering Expert specializing in Cursor AI optimization.
+
+Your task is to transform the user's coding idea into a comprehensive, structured development prompt optimized specifically for Cursor AI that follows best practices for AI-assisted development.
+
+STRATEGY APPLIED: {strategy}
+
+CURSOR CODE OPTIMIZATION FRAMEWORK:
+1. **Product Specification**: Restate the feature as a clear product spec with user stories and acceptance criteria
+2. **Technology Stack**: Recommend simple, proven technologies and explain the rationale
+3. **Solution Options**: Provide 2-3 implementation approaches with pros/cons analysis
+4. **Recommended Approach**: Select and justify the simplest, most maintainable solution
+5. **Implementation Plan**: Break down into small, iterative steps with clear milestones
+6. **Testing Strategy**: Outline comprehensive test plan including unit, integration, and user acceptance tests
+7. **Development Guidelines**: Include code quality standards and best practices
+8. **Risk Mitigation**: Identify potential issues and provide mitigation strategies
+
+ORIGINAL CODE REQUEST: {prompt}
+
+Create a comprehensive, actionable development prompt optimized for Cursor AI that a developer can use to implement this feature successfully with AI assistance. Focus on clarity, practicality, maintainability, and optimal Cursor AI interaction patterns.""",
+
+    "default": """You are a Prompt Optimizer AI specializing in {context} content.
+
+Your task:
+1. Apply the given prompting strategy: {strategy}
+2. {instruction}
+3. Remove filler words and unnecessary phrases
+4. Ensure the final prompt maximizes reasoning and output quality
+5. Correct any spelling and grammatical mistakes
+
+Original User Prompt: {prompt}
+
+Return ONLY the optimized and reformulated prompt.""",
+}
+
+
+def validate_template(name: str, template: str):
+    if not isinstance(template, str):
+        raise ValueError(f"Template for {name} must be a string")
+    if len(re.findall(r"\{prompt\}", template)) != 1:
+        raise ValueError(f"Template for {name} must contain {{prompt}} exactly once")
+
+
+def load_templates(path: str, known_contexts=()) -> dict:
+    """Read context definitions from a JSON file
+
+    The file holds {"contexts": {name: {"template": ..., "strategy": ...,
+    "instruction": ...}}}. Fields are optional for the known contexts a file
+    restyles; a new context must at least name its strategy.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    contexts = data.get("contexts") if isinstance(data, dict) else None
+    if not isinstance(contexts, dict):
+        raise ValueError(f"{path} must contain a \"contexts\" object")
+    for name, entry in contexts.items():
+        if not isinstance(entry, dict):
+            raise ValueError(f"Context {name} in {path} must be an object")
+        if "template" in entry:
+            validate_template(name, entry["template"])
+        if name not in known_contexts and not isinstance(entry.get("strategy"), str):
+            raise ValueError(f"New context {name} in {path} must have a \"strategy\" string")
+    return contexts
+
+
+class TemplateRegistry:
+    """Templates split around the user prompt, with static parts rendered once
+
+    Everything before {prompt} is rendered per (context, strategy) and
+    reused, so the prefix sent to the model is byte-identical across
+    requests and eligible for provider-side prompt caching; a request only
+    concatenates prefix + prompt + suffix.
+    """
+
+    def __init__(self, templates: dict, instructions: dict, max_entries: int = 4096):
+        for name, template in templates.items():
+            validate_template(name, template)
+        self.templates = {name: template.split("{prompt}") for name, template in templates.items()}
+        self.instructions = instructions
+        self.max_entries = max_entries
+        self._segments = {}
+        self._lock = threading.Lock()
+
+    def _fill(self, text: str, context: str, strategy: str, instruction: str) -> str:
+        values = {"strategy": strategy, "instruction": instruction, "context": context}
+        return PLACEHOLDER.sub(lambda m: values.get(m.group(1), m.group()), text)
+
+    def segments(self, context: str, strategy: str) -> tuple:
+        """Return the (prefix, suffix) surrounding the user prompt"""
+        key = (context, strategy)
+        segments = self._segments.get(key)
+        if segments is not None:
+            return segments
+        head, tail = self.templates.get(context) or self.templates["default"]
+        instruction = self.instructions.get(context, self.instructions["general"])
+        segments = (self._fill(head, context, strategy, instruction), self._fill(tail, context, strategy, instruction))
+        with self._lock:
+            # Strategies come from a fixed corpus, so this only trips on unusual retrievers
+            if len(self._segments) >= self.max_entries:
+                self._segments.clear()
+            self._segments[key] = segments
+        return segments
+
+    def render(self, context: str, strategy: str, prompt: str) -> str:
+        segments = self._segments.get((context, strategy)) or self.segments(context, strategy)
+        return f"{segments[0]}{prompt}{segments[1]}"
+
+    def precompile(self, contexts, strategies):
+        """Render the static segments of every (context, strategy) pair up front"""
+        for context in contexts:
+            for strategy in strategies:
+                self.segments(context, strategy)
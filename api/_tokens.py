@@ -0,0 +1,142 @@
+import logging
+import re
+import threading
+
+logger = logging.getLogger("prompt_optimizer")
+
+# Used when no tokenizer is available; English text and code average about 4 characters per token
+APPROX_CHARS_PER_TOKEN = 4
+
+_CODE_BLOCK = re.compile(r"```.*?(?:```|$)", re.DOTALL)
+
+
+class ApproximateEncoder:
+    """Character-based token estimate used when tiktoken cannot be loaded"""
+
+    name = "approximate"
+
+    def count(self, text: str) -> int:
+        return -(-len(text) // APPROX_CHARS_PER_TOKEN)
+
+
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+# Set once loading fails; requests then use estimates instead of waiting on another download
+_unavailable = None
+
+
+def get_encoder(model: str, retry: bool = False):
+    """Return the cached tiktoken encoding for model, or an ApproximateEncoder while none can be loaded
+
+    After a failed load only retry=True (the background warm-up) tries again.
+    """
+    global _unavailable
+    encoder = _encoders.get(model)
+    if encoder is not None:
+        return encoder
+    if _unavailable is not None and not retry:
+        return _unavailable
+    with _encoders_lock:
+        encoder = _encoders.get(model)
+        if encoder is not None:
+            return encoder
+        if _unavailable is not None and not retry:
+            return _unavailable
+        try:
+            # tiktoken downloads the BPE ranks on first use, so a failure is often transient
+            import tiktoken
+            try:
+                encoder = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoder = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.error(f"Tokenizer unavailable for {model}, estimating token counts: {e}")
+            _unavailable = _unavailable or ApproximateEncoder()
+            return _unavailable
+        _encoders[model] = encoder
+        _unavailable = None
+        return encoder
+
+
+def count_tokens(text: str, model: str) -> int:
+    encoder = get_encoder(model)
+    if isinstance(encoder, ApproximateEncoder):
+        return encoder.count(text)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+class TokenWindow:
+    """Token view of one text that can cut head/tail windows without re-encoding"""
+
+    def __init__(self, text: str, model: str):
+        self.text = text
+        self.encoder = get_encoder(model)
+        self.approximate = isinstance(self.encoder, ApproximateEncoder)
+        if self.approximate:
+            self.tokens = None
+            self.count = self.encoder.count(text)
+        else:
+            self.tokens = self.encoder.encode(text, disallowed_special=())
+            self.count = len(self.tokens)
+
+    def head(self, n: int) -> str:
+        if n <= 0:
+            return ""
+        if self.approximate:
+            return self.text[:n * APPROX_CHARS_PER_TOKEN]
+        return self.encoder.decode(self.tokens[:n])
+
+    def tail(self, n: int) -> str:
+        if n <= 0:
+            return ""
+        if self.approximate:
+            return self.text[-n * APPROX_CHARS_PER_TOKEN:]
+        return self.encoder.decode(self.tokens[-n:])
+
+    def window(self, budget: int, head_share: float = 0.7) -> str:
+        """Keep the first and last tokens of the text within budget, marking the cut"""
+        if self.count <= budget:
+            return self.text
+        budget = max(budget - 16, 2)  # room for the omission marker
+        head = int(budget * head_share)
+        tail = budget - head
+        omitted = self.count - head - tail
+        return f"{self.head(head)} [... {omitted} tokens omitted ...] {self.tail(tail)}"
+
+
+def fit_prompt(text: str, budget: int, model: str):
+    """Compress text to at most roughly budget tokens
+
+    Large fenced code blocks are cut down to head/tail windows first, since
+    pasted files dominate oversized prompts; any remaining excess is removed
+    with a head/tail window over the whole prompt. Returns (text, tokens
+    before, tokens after); text is compressed exactly when tokens before
+    exceeds budget.
+    """
+    window = TokenWindow(text, model)
+    original_tokens = window.count
+    if original_tokens <= budget:
+        return text, original_tokens, original_tokens
+
+    blocks = list(_CODE_BLOCK.finditer(text))
+    if blocks:
+        block_windows = [TokenWindow(match.group(), model) for match in blocks]
+        code_tokens = sum(w.count for w in block_windows)
+        prose_tokens = original_tokens - code_tokens
+        # Give code whatever the surrounding prose leaves, but never less than a quarter of the budget
+        code_budget = max(budget - prose_tokens, budget // 4)
+        if code_tokens > code_budget:
+            parts = []
+            last = 0
+            for match, block_window in zip(blocks, block_windows):
+                share = max(int(code_budget * block_window.count / code_tokens), 8)
+                parts.append(text[last:match.start()])
+                parts.append(block_window.window(share))
+                last = match.end()
+            parts.append(text[last:])
+            text = "".join(parts)
+            window = TokenWindow(text, model)
+
+    fitted = window.window(budget)
+    return fitted, original_tokens, count_tokens(fitted, model)
@@ -0,0 +1,126 @@
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger("prompt_optimizer")
+
+COLD = "cold"
+WARMING = "warming"
+READY = "ready"
+DEGRADED = "degraded"
+
+
+class WarmupTask:
+    """Runs a setup function on a background thread, retrying with exponential backoff
+
+    The setup function returns truthy once the component is usable. Until
+    then the task is "warming" (first attempt) or "degraded" (waiting to
+    retry), and callers are expected to serve their fallback path.
+    """
+
+    def __init__(self, name: str, setup, base_delay: float = 1.0, max_delay: float = 300.0):
+        self.name = name
+        self.setup = setup
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = COLD
+        self.attempts = 0
+        self.last_error = None
+        self.ready_at = None
+        self.next_attempt_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        """Start warming in the background; safe to call on every request"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            # A forked worker inherits the state but not the thread, so it starts its own
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self.state == READY:
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=f"warmup-{self.name}", daemon=True)
+            self._thread.start()
+
+    def run_once(self) -> bool:
+        """Make one attempt on the calling thread, e.g. in a server's master before it forks
+
+        On failure the task is left cold, so each worker starts its own retrying warm-up.
+        """
+        with self._lock:
+            if self.state == READY:
+                return True
+            error = self._attempt()
+            if error:
+                self.last_error = error
+                logger.error(f"Warm-up of {self.name} failed ({error}); workers will retry")
+            return error is None
+
+    def reset(self):
+        """Forget a finished warm-up so the next start() or run_once() sets up again"""
+        with self._lock:
+            self.state = COLD
+            self.attempts = 0
+            self.last_error = None
+            self.ready_at = None
+            self.next_attempt_at = None
+            self._thread = None
+            self._pid = None
+
+    def _attempt(self):
+        """Run setup once; returns None when the component became ready, else the error"""
+        self.attempts += 1
+        try:
+            ok = self.setup()
+            error = None if ok else "setup returned no result"
+        except Exception as e:
+            ok = False
+            error = str(e)
+        if ok:
+            self.state = READY
+            self.ready_at = time.time()
+            self.last_error = None
+            self.next_attempt_at = None
+            logger.info(f"Warm-up of {self.name} finished after {self.attempts} attempt(s)")
+        return error
+
+    def _run(self):
+        while True:
+            if self.state == COLD:
+                self.state = WARMING
+            error = self._attempt()
+            if error is None:
+                return
+            delay = min(self.max_delay, self.base_delay * (2 ** (self.attempts - 1)))
+            delay *= random.uniform(0.8, 1.2)
+            self.state = DEGRADED
+            self.last_error = error
+            self.next_attempt_at = time.time() + delay
+            logger.error(f"Warm-up of {self.name} failed ({error}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until ready or timeout; for scripts and tests, never the request path"""
+        deadline = None if timeout is None else time.time() + timeout
+        self.start()
+        while self.state != READY:
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def status(self) -> dict:
+        status = {"state": self.state, "attempts": self.attempts}
+        if self.last_error:
+            status["last_error"] = self.last_error
+        if self.next_attempt_at:
+            status["retry_in_s"] = round(max(0.0, self.next_attempt_at - time.time()), 1)
+        if self.ready_at:
+            status["ready_for_s"] = round(time.time() - self.ready_at, 1)
+        return status
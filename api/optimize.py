@@ -1,13 +1,40 @@
-from flask import Flask, request, jsonify, make_response
+from flask import Flask, Response, request, jsonify, stream_with_context
+import atexit
+import gc
+import json
 import logging
+import math
 from flask_cors import CORS
 import os
-import pinecone
+import sys
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from functools import lru_cache
 from dotenv import load_dotenv
 from http.server import BaseHTTPRequestHandler
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_pinecone import PineconeVectorStore
+from urllib.parse import unquote
+
+# Make the sibling helper modules importable both on Vercel and when run directly
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _cache import create_response_cache, make_cache_key
+from _semantic_cache import create_semantic_cache, semantic_namespace
+from _retrieval import LocalStrategyIndex, RetrieverStrategyIndex, load_strategy_index
+from _normalize import DEFAULT_FILLER_WORDS, PromptNormalizer
+from _corrections import TextCorrector
+from _classifier import MIN_CONFIDENCE, load_classifiers
+from _routing import LOCAL, create_tier_router
+from _warmup import READY, WarmupTask
+from _journal import create_request_journal
+from _metrics import create_tracer, set_path, stage
+from _tokens import ApproximateEncoder, count_tokens, fit_prompt, get_encoder
+from _templates import DEFAULT_TEMPLATES, TemplateRegistry, load_templates
+from _resilience import CircuitOpenError, create_resilient_caller
+from _coalesce import create_request_coalescer
+from _admission import Overloaded, client_key, create_concurrency_gate, create_rate_limiter
+from _jobs import JobQueueFull, create_job_queue
 
 # Load environment variables
 load_dotenv()
@@ -82,31 +109,279 @@ context_instructions = {
 
 }
 
+# Optional JSON file of extra or restyled contexts, so new contexts need no code change
+context_templates = dict(DEFAULT_TEMPLATES)
+templates_path = os.getenv("PROMPT_TEMPLATES_PATH")
+if templates_path:
+    for name, entry in load_templates(templates_path, context_strategies).items():
+        if "template" in entry:
+            context_templates[name] = entry["template"]
+        if "strategy" in entry:
+            context_strategies[name] = entry["strategy"]
+        if "instruction" in entry:
+            context_instructions[name] = entry["instruction"]
+
+# Corpus searched for the best strategy: fallback docs plus context strategies
+strategy_corpus = list(dict.fromkeys(docs + list(context_strategies.values())))
+
+# Static template segments are rendered once per (context, strategy) at startup
+template_registry = TemplateRegistry(context_templates, context_instructions)
+template_registry.precompile(context_strategies, strategy_corpus)
+
+# Embedding model for prompts and the strategy corpus
+embeddings_model = "text-embedding-ada-002"
+
+# Filler words removed by clean_prompt; contexts not listed use DEFAULT_FILLER_WORDS
+context_filler_words = {}
+
+# Normalizers are compiled once at import time
+default_normalizer = PromptNormalizer(DEFAULT_FILLER_WORDS)
+prompt_normalizers = {context: PromptNormalizer(words) for context, words in context_filler_words.items()}
+
+# Dictionary spelling fixes applied by clean_prompt, so the model (or the
+# fallback, when there is none) starts from corrected text. Shorthand ("u",
+# "i", "ur") is left to the model, since in pasted code it is usually a
+# variable; only the local tier applies text_corrector's shorthand fixes.
+text_corrector = TextCorrector()
+spelling_corrector = TextCorrector(informal={})
+context_correctors = {"rephrase": spelling_corrector}
+
+# Longest prompt, in words, each context may answer without the LLM; contexts
+# not listed always use it. ROUTER_MAX_WORDS_SCALE scales every limit. Only
+# rephrase has a local engine: the dictionary corrections clean_prompt applies.
+local_max_words = {"rephrase": 40}
+tier_router = create_tier_router(text_corrector, local_max_words)
+
+# Sub-style strategies picked by the prompt classifier; labels without an entry
+# (e.g. "general") leave the choice to retrieval
+style_strategies = {
+    "image_generation": {
+        "portrait": "Portrait prompting: Describe the subject's face, expression, age and wardrobe, specify lens (85mm), shallow depth of field, flattering studio or natural lighting, skin texture detail, and a clean background that keeps focus on the person.",
+        "landscape": "Landscape prompting: Establish the scene's scale and location, time of day and weather, foreground-to-background layering, wide-angle composition with leading lines, golden hour or atmospheric lighting, and rich natural color.",
+        "abstract": "Abstract art prompting: Name the artistic movement or medium, define shapes, textures, color palette and contrast, describe the mood or idea being expressed, and specify composition, rhythm and level of detail.",
+        "product": "Product photography prompting: Isolate the product with a deliberate surface and backdrop, specify studio lighting with highlights and reflections, material and texture detail, brand-appropriate color, and commercial-grade sharpness.",
+    },
+    "video_generation": {
+        "action": "Action video prompting: Describe the motion beat by beat, specify camera movement (tracking, handheld, gimbal), frame rate and slow motion, fast cuts and transitions, dramatic lighting, and a clear sense of speed and impact.",
+        "nature": "Nature video prompting: Specify the environment and wildlife, time-lapse or aerial drone movement, natural light changes, slow pans and reveals, ambient atmosphere, and documentary-grade color.",
+        "commercial": "Commercial video prompting: Lead with the product or brand, plan a hero reveal, specify polished studio lighting, smooth camera moves, brand colors, pacing for a 15-30 second spot, and a closing call to action.",
+    },
+    "cursor_code_optimizer": {label: context_strategies[label] for label in ("debug", "refactor", "feature")},
+}
+
+# Contexts that always use one of their style strategies, even when the classifier is unsure
+closed_style_contexts = {"cursor_code_optimizer"}
+
+for context, styles in style_strategies.items():
+    template_registry.precompile([context], styles.values())
+
+# Hashed n-gram classifiers by context, trained with train_classifier.py
+classifier_path = os.getenv(
+    "PROMPT_CLASSIFIER_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt_classifier.npz")
+)
+classifier_min_confidence = float(os.getenv("CLASSIFIER_MIN_CONFIDENCE", str(MIN_CONFIDENCE)))
+
+def load_prompt_classifiers() -> dict:
+    """Load the classifier model, or {} to fall back to keyword strategy selection"""
+    try:
+        return load_classifiers(classifier_path)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.error(f"Prompt classifier unavailable, using keyword strategy selection: {e}")
+        return {}
+
+prompt_classifiers = load_prompt_classifiers()
+
+# Chat model per context; contexts not listed use OPENAI_MODEL (default gpt-4o)
+default_model = os.getenv("OPENAI_MODEL", "gpt-4o")
+context_models = {}
+
+# Seconds to wait for the LLM per context before serving the fallback prompt
+default_llm_deadline = float(os.getenv("LLM_DEADLINE", "20"))
+context_llm_deadlines = {}
+
 # Lazy initialize components
 embeddings = None
 vectorstore = None
 retriever = None
 
+# Strategy retrieval backend: "local" (in-process index) or "pinecone"
+strategy_index_backend = os.getenv("STRATEGY_INDEX_BACKEND", "local")
+strategy_snapshot_path = os.getenv(
+    "STRATEGY_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "strategy_embeddings.npy")
+)
+strategy_index = None
+
+# Process-wide LLM client registry keyed by (model, temperature)
+http_client = None
+async_http_client = None
+llm_clients = {}
+llm_clients_lock = threading.RLock()
+
+# Largest rendered template sent to the model; oversized prompts are compressed to fit
+max_input_tokens = int(os.getenv("PROMPT_MAX_INPUT_TOKENS", "16000"))
+
+# Batch endpoint limits; the pool is shared so concurrent batches share one bound
+batch_max_items = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+batch_concurrency = int(os.getenv("BATCH_CONCURRENCY", "8"))
+batch_executor = None
+
+# Exact-match cache of LLM responses keyed on (model, rendered template)
+response_cache = create_response_cache()
+
+# Near-duplicate cache matching cleaned prompts by embedding similarity
+semantic_cache = create_semantic_cache()
+
+# Per-stage latency histograms served at /api/metrics
+tracer = create_tracer()
+
+# Deadlines, per-model circuit breakers and optional hedging around LLM calls
+llm_guard = create_resilient_caller()
+tracer.collectors.append(llm_guard.metrics_lines)
+
+# Per-client token buckets checked before any work is done for a request
+rate_limiter = create_rate_limiter()
+if rate_limiter:
+    tracer.collectors.append(rate_limiter.metrics_lines)
+# Only believe X-Forwarded-For when a proxy in front of the app overwrites it
+rate_limit_trust_proxy = os.getenv("RATE_LIMIT_TRUST_PROXY", "0") == "1"
+
+# Cap on concurrent LLM calls with a bounded, deadline-aware wait queue
+admission_gate = create_concurrency_gate()
+tracer.collectors.append(admission_gate.metrics_lines)
+# What a shed request gets: "fallback" (the fallback prompt) or "reject" (a 429)
+admission_shed_mode = os.getenv("ADMISSION_SHED_MODE", "fallback")
+
+# Optimizations submitted as jobs run on their own pool and are polled for; the
+# lambda defers the lookup of apply_strategy, which is defined further down
+job_queue = create_job_queue(lambda user_prompt, context: apply_strategy(user_prompt, context))
+if job_queue:
+    tracer.collectors.append(job_queue.metrics_lines)
+# Longest a job poll may block waiting for the job to finish
+jobs_max_wait = float(os.getenv("JOBS_MAX_WAIT", "25"))
+
+# Optional JSONL journal of every optimization, written off the request thread
+request_journal = create_request_journal()
+if request_journal:
+    tracer.sinks.append(request_journal.record)
+    atexit.register(request_journal.close)
+
+# Single-flight deduplication of identical in-flight LLM calls
+request_coalescer = create_request_coalescer(shared_cache=bool(response_cache) and response_cache.shared)
+if request_coalescer:
+    tracer.collectors.append(request_coalescer.metrics_lines)
+
 def get_embeddings():
     """Initialize and return OpenAI embeddings instance"""
     global embeddings
     if embeddings is not None:
         return embeddings
     try:
-        embeddings = OpenAIEmbeddings(model="text-embedding-ada-002")
+        # Imported here so cold starts that never embed skip loading LangChain
+        from langchain_openai import OpenAIEmbeddings
+        embeddings = OpenAIEmbeddings(
+            model=embeddings_model,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client()
+        )
         return embeddings
     except Exception as e:
         logger.error(f"Failed to initialize embeddings: {e}")
         return None
 
-def get_llm():
-    """Initialize and return ChatOpenAI instance"""
+def embed_prompt(cleaned_prompt: str):
+    """Embed a cleaned prompt for semantic cache lookups"""
+    embeddings_instance = get_embeddings()
+    if embeddings_instance is None:
+        return None
     try:
-        return ChatOpenAI(model="gpt-4o", temperature=0)
+        return embeddings_instance.embed_query(cleaned_prompt)
     except Exception as e:
-        logger.error(f"Failed to initialize ChatOpenAI: {e}")
+        logger.error(f"Prompt embedding failed: {e}")
         return None
 
+def embed_prompts(cleaned_prompts):
+    """Embed several cleaned prompts with a single embeddings request"""
+    embeddings_instance = get_embeddings()
+    if embeddings_instance is None or not cleaned_prompts:
+        return [None] * len(cleaned_prompts)
+    try:
+        return embeddings_instance.embed_documents(list(cleaned_prompts))
+    except Exception as e:
+        logger.error(f"Batch prompt embedding failed: {e}")
+        return [None] * len(cleaned_prompts)
+
+def get_http_client():
+    """Return the process-wide keep-alive HTTP client shared by all OpenAI clients"""
+    global http_client
+    if http_client is not None:
+        return http_client
+    with llm_clients_lock:
+        if http_client is None:
+            import httpx
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+                    max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "20")),
+                    keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60")),
+                ),
+                timeout=httpx.Timeout(float(os.getenv("OPENAI_TIMEOUT", "60")), connect=5.0),
+            )
+    return http_client
+
+def get_async_http_client():
+    """Return the process-wide keep-alive HTTP client used by async OpenAI calls"""
+    global async_http_client
+    if async_http_client is not None:
+        return async_http_client
+    with llm_clients_lock:
+        if async_http_client is None:
+            import httpx
+            async_http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+                    max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "20")),
+                    keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60")),
+                ),
+                timeout=httpx.Timeout(float(os.getenv("OPENAI_TIMEOUT", "60")), connect=5.0),
+            )
+    return async_http_client
+
+def get_model_for_context(context: str) -> str:
+    """Return the chat model configured for a context"""
+    return context_models.get(context) or os.getenv(f"OPENAI_MODEL_{context.upper()}") or default_model
+
+def get_llm_deadline(context: str) -> float:
+    """Return the LLM deadline in seconds configured for a context"""
+    return context_llm_deadlines.get(context) or float(os.getenv(f"LLM_DEADLINE_{context.upper()}", default_llm_deadline))
+
+def get_llm(model: str = None, temperature: float = 0):
+    """Return a cached ChatOpenAI instance for the given model and temperature"""
+    key = (model or default_model, temperature)
+    llm = llm_clients.get(key)
+    if llm is not None:
+        return llm
+    with llm_clients_lock:
+        llm = llm_clients.get(key)
+        if llm is not None:
+            return llm
+        try:
+            from langchain_openai import ChatOpenAI
+            llm = ChatOpenAI(
+                model=key[0],
+                temperature=temperature,
+                http_client=get_http_client(),
+                http_async_client=get_async_http_client()
+            )
+        except Exception as e:
+            logger.error(f"Failed to initialize ChatOpenAI: {e}")
+            return None
+        llm_clients[key] = llm
+        return llm
+
 def setup_pinecone_and_vectorstore():
     """Initialize Pinecone client, ensure index exists, and create vectorstore + retriever"""
     global pc, vectorstore, retriever
@@ -114,6 +389,13 @@ def setup_pinecone_and_vectorstore():
     if retriever:
         return
 
+    try:
+        import pinecone
+        from langchain_pinecone import PineconeVectorStore
+    except ImportError as e:
+        logger.error(f"Pinecone dependencies unavailable: {e}")
+        return
+
     # Initialize Pinecone client
     if not pc:
         try:
@@ -126,7 +408,12 @@ def setup_pinecone_and_vectorstore():
     # Ensure index exists
     try:
         index_list = pc.list_indexes()
-        if index_name not in [i.get("name") if isinstance(i, dict) else i for i in index_list]:
+        # Current clients return an IndexList of models; older ones a list of dicts or names
+        if hasattr(index_list, "names"):
+            index_names = index_list.names()
+        else:
+            index_names = [i.get("name") if isinstance(i, dict) else i for i in index_list]
+        if index_name not in index_names:
             pc.create_index(
                 name=index_name,
                 dimension=1536,
@@ -147,28 +434,106 @@ def setup_pinecone_and_vectorstore():
     except Exception as e:
         logger.error(f"Vectorstore initialization failed: {e}")
 
-def clean_prompt(prompt: str) -> str:
+def build_strategy_index():
+    """Build the strategy index for the configured backend; runs on the warm-up thread"""
+    global strategy_index
+    if strategy_index is not None:
+        return strategy_index
+
+    if strategy_index_backend == "pinecone":
+        setup_pinecone_and_vectorstore()
+        if not retriever:
+            raise RuntimeError("Pinecone retriever unavailable")
+        strategy_index = RetrieverStrategyIndex(retriever)
+        return strategy_index
+
+    embeddings_instance = get_embeddings()
+    if embeddings_instance is None:
+        raise RuntimeError("Embeddings client unavailable")
+    index, embedded = load_strategy_index(
+        strategy_snapshot_path, strategy_corpus, embeddings_instance, embeddings_model
+    )
+    if embedded:
+        logger.info(f"Embedded {embedded} strategies missing from the snapshot; run build_embeddings.py to refresh it")
+    strategy_index = index
+    return strategy_index
+
+# Index provisioning runs in the background; requests use the context fallback until it is ready
+strategy_warmup = WarmupTask(
+    "strategy_index",
+    build_strategy_index,
+    base_delay=float(os.getenv("WARMUP_RETRY_BASE", "1")),
+    max_delay=float(os.getenv("WARMUP_RETRY_MAX", "300"))
+)
+
+def load_tokenizer():
+    """Load the tokenizer for the default model so the first request does not pay for it"""
+    return not isinstance(get_encoder(default_model, retry=True), ApproximateEncoder)
+
+tokenizer_warmup = WarmupTask(
+    "tokenizer",
+    load_tokenizer,
+    base_delay=float(os.getenv("WARMUP_RETRY_BASE", "1")),
+    max_delay=float(os.getenv("WARMUP_RETRY_MAX", "300"))
+)
+
+def get_strategy_index():
+    """Return the strategy retrieval index, or None while it is still warming up"""
+    if strategy_index is None:
+        strategy_warmup.start()
+    return strategy_index
+
+def clean_prompt(prompt: str, context: str = "general") -> str:
     """Remove filler words and clean the prompt while preserving important context"""
-    useless_words = ["actually", "basically", "just", "like", "I mean", "you know", "um", "uh", "well"]
+    normalizer = prompt_normalizers.get(context, default_normalizer)
+    cleaned = normalizer.normalize(prompt)
+    corrector = context_correctors.get(context)
+    return corrector.correct(cleaned) if corrector else cleaned
+
+def get_strategy_for_context(context: str, cleaned_prompt: str, prompt_vector=None, classified=None):
+    """Get the best strategy based on context and prompt content
+
+    classified is classify_strategy's answer when the caller already has it.
+    """
+    style_strategy, confident = classified or classify_strategy(context, cleaned_prompt)
+    if confident:
+        return style_strategy
     
-    cleaned = prompt
-    for word in useless_words:
-        pattern = r'\b' + re.escape(word) + r'\b'
-        cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
+    context_strategy = style_strategy or context_strategies.get(context, context_strategies["general"])
     
-    # Clean up whitespace and punctuation
-    cleaned = re.sub(r'\s+', ' ', cleaned)
-    cleaned = re.sub(r'\s*,\s*', ', ', cleaned)
-    cleaned = re.sub(r'\s*\.\s*', '. ', cleaned)
-    cleaned = re.sub(r'^\s*[,.\s]+', '', cleaned)
-    cleaned = re.sub(r'[,.\s]+\s*$', '', cleaned)
+    index = get_strategy_index()
+    if index:
+        try:
+            results = index.search(cleaned_prompt, k=1, vector=prompt_vector, candidates=get_style_candidates(context))
+            if results:
+                return results[0]
+        except Exception as e:
+            logger.error(f"Strategy retrieval failed: {e}")
     
-    return cleaned.strip()
+    return context_strategy
+
+def classify_strategy(context: str, cleaned_prompt: str):
+    """Return (strategy, confident) from the prompt classifier
 
-def get_strategy_for_context(context: str, cleaned_prompt: str):
-    """Get the best strategy based on context and prompt content"""
+    strategy is the classifier's best style strategy, or None when it has no
+    style to offer; confident means retrieval need not be consulted.
+    """
+    classifier = prompt_classifiers.get(context)
+    if classifier is None:
+        return get_keyword_strategy(context, cleaned_prompt), context in closed_style_contexts
+    label, confidence = classifier.predict(cleaned_prompt)
+    strategy = style_strategies.get(context, {}).get(label)
+    return strategy, strategy is not None and confidence >= classifier_min_confidence
+
+def get_style_candidates(context: str):
+    """Strategies retrieval may choose from for context, or None for the whole corpus"""
+    if context in closed_style_contexts:
+        return list(style_strategies[context].values())
+    return None
+
+def get_keyword_strategy(context: str, cleaned_prompt: str):
+    """Keyword strategy selection, used when no classifier model is available"""
     if context == "cursor_code_optimizer":
-        # Intelligent strategy selection for cursor code optimization based on prompt content
         prompt_lower = cleaned_prompt.lower()
         
         if any(word in prompt_lower for word in ["bug", "error", "fix", "broken", "not working", "debug", "issue"]):
@@ -177,136 +542,169 @@ def get_strategy_for_context(context: str, cleaned_prompt: str):
             return context_strategies["refactor"]
         else:
             return context_strategies["feature"]
-    
-    context_strategy = context_strategies.get(context, context_strategies["general"])
-    
-    if retriever:
-        try:
-            results = retriever.get_relevant_documents(cleaned_prompt)
-            if results:
-                return results[0].page_content
-        except Exception as e:
-            logger.error(f"Strategy retrieval failed: {e}")
-    
-    return context_strategy
+    return None
 
 def create_template(context: str, strategy: str, cleaned_prompt: str) -> str:
     """Create the appropriate template based on context"""
-    context_instruction = context_instructions.get(context, context_instructions["general"])
-    
-    if context in ["image_generation", "video_generation"]:
-        return f"""You are a World-Class {'Image' if context == 'image_generation' else 'Video'} Generation Prompt Engineer.
+    return template_registry.render(context, strategy, cleaned_prompt)
 
-Your mission is to transform the user's basic idea into a masterpiece-level prompt.
+def needs_prompt_vector(context: str, confident: bool) -> bool:
+    """Whether strategy retrieval or the semantic cache will use the prompt embedding
 
-OPTIMIZATION STRATEGY: {strategy}
-CONTEXT INSTRUCTIONS: {context_instruction}
+    confident is the classifier's: retrieval only runs when it is not.
+    """
+    return uses_semantic_cache(context) or not confident
 
-PROMPT STRUCTURE REQUIREMENTS:
-- Start with a clear, powerful subject description
-- Add specific visual attributes and characteristics
-- Include professional composition details
-- Specify lighting with professional terminology
-- Define artistic style and medium with specific references
-- Add emotional and atmospheric elements
-- Include technical quality specifications
-- Add environmental context and background details
-- Specify color palette and visual harmony
-- Include negative prompts to avoid common issues
+def uses_semantic_cache(context: str) -> bool:
+    """Whether near-duplicate prompts in this context may share an answer"""
+    return bool(semantic_cache) and semantic_cache.covers(context)
 
-USER'S ORIGINAL REQUEST: {cleaned_prompt}
+def prepare_optimization(user_prompt: str, context: str) -> dict:
+    """Clean the prompt, select a strategy and render the template"""
+    with stage("clean"):
+        cleaned_prompt = clean_prompt(user_prompt, context)
 
-Return ONLY the optimized, professional-grade {'image' if context == 'image_generation' else 'video'} generation prompt."""
+    with stage("retrieve"):
+        classified = classify_strategy(context, cleaned_prompt)
 
-    elif context == "rephrase":
-        return f"""You are a Text Optimization AI specializing in grammar correction and text refinement.
+    # One embedding serves both strategy retrieval and the semantic cache
+    prompt_vector = None
+    if needs_prompt_vector(context, classified[1]):
+        with stage("embed"):
+            prompt_vector = embed_prompt(cleaned_prompt)
 
-Your task:
-1. Apply the given prompting strategy: {strategy}
-2. {context_instruction}
-3. Correct all spelling mistakes and grammatical errors
-4. Improve sentence structure and flow
-5. Make the text more professional and clear
+    with stage("retrieve"):
+        strategy = get_strategy_for_context(context, cleaned_prompt, prompt_vector, classified)
+    return build_prepared(context, cleaned_prompt, prompt_vector, strategy)
 
-Original User Text: {cleaned_prompt}
+def prepare_batch(items) -> list:
+    """Prepare a batch of (prompt, context) pairs with one embedding call and one retrieval product"""
+    contexts = [context for _, context in items]
+    cleaned_prompts = [clean_prompt(prompt, context) for prompt, context in items]
 
-Return ONLY the corrected and optimized text with proper grammar, spelling, and clarity."""
+    # Confident classifier picks skip retrieval; the rest are scored against the local strategy matrix at once
+    classified = [classify_strategy(context, cleaned_prompt) for context, cleaned_prompt in zip(contexts, cleaned_prompts)]
+    strategies = [strategy if confident else None for strategy, confident in classified]
 
-    elif context == "cursor_code_optimizer":
-        return f"""You are a Senior Software Developer and Prompt Engineering Expert specializing in Cursor AI optimization.
+    wanted = [i for i, context in enumerate(contexts) if needs_prompt_vector(context, classified[i][1])]
+    prompt_vectors = [None] * len(items)
+    for i, vector in zip(wanted, embed_prompts([cleaned_prompts[i] for i in wanted])):
+        prompt_vectors[i] = vector
+
+    retrieval = [i for i in wanted if strategies[i] is None and get_style_candidates(contexts[i]) is None
+                 and prompt_vectors[i] is not None]
+    index = get_strategy_index() if retrieval else None
+    if isinstance(index, LocalStrategyIndex):
+        try:
+            for i, texts in zip(retrieval, index.search_vectors([prompt_vectors[i] for i in retrieval])):
+                if texts:
+                    strategies[i] = texts[0]
+        except Exception as e:
+            logger.error(f"Batch strategy retrieval failed: {e}")
 
-Your task is to transform the user's coding idea into a comprehensive, structured development prompt optimized specifically for Cursor AI that follows best practices for AI-assisted development.
+    return [
+        build_prepared(
+            contexts[i],
+            cleaned_prompts[i],
+            prompt_vectors[i],
+            strategies[i] or get_strategy_for_context(contexts[i], cleaned_prompts[i], prompt_vectors[i], classified[i])
+        )
+        for i in range(len(items))
+    ]
 
-STRATEGY APPLIED: {strategy}
+def build_prepared(context: str, cleaned_prompt: str, prompt_vector, strategy: str) -> dict:
+    """Render the template and cache keys for a selected strategy"""
+    model = get_model_for_context(context)
+    with stage("budget"):
+        instruction_tokens = get_instruction_tokens(model, context, strategy)
+        prompt_budget = max(max_input_tokens - instruction_tokens, 256)
+        fitted_prompt, prompt_tokens, fitted_tokens = fit_prompt(cleaned_prompt, prompt_budget, model)
+    with stage("template"):
+        template = create_template(context, strategy, fitted_prompt)
+    return {
+        "context": context,
+        "cleaned_prompt": cleaned_prompt,
+        "prompt_vector": prompt_vector,
+        "strategy": strategy,
+        "template": template,
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "input_tokens": instruction_tokens + fitted_tokens,
+        "compressed": prompt_tokens > prompt_budget,
+        "cache_key": make_cache_key(model, template),
+        "semantic_namespace": semantic_namespace(context, model, strategy),
+    }
 
-CURSOR CODE OPTIMIZATION FRAMEWORK:
-1. **Product Specification**: Restate the feature as a clear product spec with user stories and acceptance criteria
-2. **Technology Stack**: Recommend simple, proven technologies and explain the rationale
-3. **Solution Options**: Provide 2-3 implementation approaches with pros/cons analysis
-4. **Recommended Approach**: Select and justify the simplest, most maintainable solution
-5. **Implementation Plan**: Break down into small, iterative steps with clear milestones
-6. **Testing Strategy**: Outline comprehensive test plan including unit, integration, and user acceptance tests
-7. **Development Guidelines**: Include code quality standards and best practices
-8. **Risk Mitigation**: Identify potential issues and provide mitigation strategies
+def get_instruction_tokens(model: str, context: str, strategy: str) -> int:
+    """Token count of the template without the user prompt"""
+    return _instruction_tokens(get_encoder(model).name, model, context, strategy)
 
-ORIGINAL CODE REQUEST: {cleaned_prompt}
+@lru_cache(maxsize=1024)
+def _instruction_tokens(encoder_name: str, model: str, context: str, strategy: str) -> int:
+    # The encoder name is part of the key so estimates are dropped once tiktoken loads
+    return count_tokens(create_template(context, strategy, ""), model)
 
-Create a comprehensive, actionable development prompt optimized for Cursor AI that a developer can use to implement this feature successfully with AI assistance. Focus on clarity, practicality, maintainability, and optimal Cursor AI interaction patterns."""
+def token_report(prepared: dict, output: str) -> dict:
+    """Tokens sent to and produced by the model for one optimization"""
+    return {
+        "in": prepared["input_tokens"],
+        "out": count_tokens(output, prepared["model"]) if output else 0,
+        "prompt": prepared["prompt_tokens"],
+        "compressed": prepared["compressed"],
+    }
 
-    else:
-        return f"""You are a Prompt Optimizer AI specializing in {context} content.
+def lookup_cached_response(prepared: dict):
+    """Return a cached LLM response for the prepared template, if any"""
+    with stage("cache"):
+        # Serve repeated templates from the response cache before calling the LLM
+        response = response_cache.get(prepared["cache_key"]) if response_cache else None
 
-Your task:
-1. Apply the given prompting strategy: {strategy}
-2. {context_instruction}
-3. Remove filler words and unnecessary phrases
-4. Ensure the final prompt maximizes reasoning and output quality
-5. Correct any spelling and grammatical mistakes
+        # Fall back to a near-duplicate of an earlier prompt in the same context
+        if response is None and uses_semantic_cache(prepared["context"]) and prepared["prompt_vector"] is not None:
+            response = semantic_cache.get(prepared["semantic_namespace"], prepared["prompt_vector"])
+            if response and response_cache:
+                response_cache.set(prepared["cache_key"], response)
+    return response
 
-Original User Prompt: {cleaned_prompt}
+def store_response(prepared: dict, response: str):
+    """Remember an LLM response in the exact and semantic caches"""
+    if response_cache:
+        response_cache.set(prepared["cache_key"], response)
+    if uses_semantic_cache(prepared["context"]) and prepared["prompt_vector"] is not None:
+        semantic_cache.add(prepared["semantic_namespace"], prepared["prompt_vector"], response)
 
-Return ONLY the optimized and reformulated prompt."""
+# Preambles the model sometimes puts before rephrased text
+rephrase_prefixes = [
+    "Corrected and optimized text:", "Corrected text:", "Optimized text:",
+    "Here's the corrected text:", "The corrected version is:"
+]
 
-def apply_strategy(user_prompt: str, context: str = "general"):
-    """Apply optimization strategy based on context and prompt"""
-    cleaned_prompt = clean_prompt(user_prompt)
-    strategy = get_strategy_for_context(context, cleaned_prompt)
-    
-    template = create_template(context, strategy, cleaned_prompt)
-    
-    # Try to call LLM if available
-    llm = get_llm()
-    if llm is not None:
-        try:
-            response = llm.predict(template)
-            if response:
-                if context == "rephrase":
-                    # Clean response for rephrase context
-                    prefixes_to_remove = [
-                        "Corrected and optimized text:", "Corrected text:", "Optimized text:",
-                        "Here's the corrected text:", "The corrected version is:"
-                    ]
-                    cleaned_response = response
-                    for prefix in prefixes_to_remove:
-                        if cleaned_response.startswith(prefix):
-                            cleaned_response = cleaned_response[len(prefix):].strip()
-                            break
-                    cleaned_response = cleaned_response.strip()
-                    if cleaned_response.startswith("."):
-                        cleaned_response = cleaned_response[1:].strip()
-                    return {"original": user_prompt, "strategy": strategy, "optimized": cleaned_response}
-                
-                return {"original": user_prompt, "strategy": strategy, "optimized": response}
-        except Exception as e:
-            logger.error(f"LLM call failed: {e}")
+def strip_rephrase_prefix(response: str) -> str:
+    """Remove a leading preamble and stray period from a rephrase response"""
+    for prefix in rephrase_prefixes:
+        if response.startswith(prefix):
+            response = response[len(prefix):]
+            break
+    response = response.lstrip()
+    if response.startswith("."):
+        response = response[1:].lstrip()
+    return response
+
+def clean_rephrase_response(response: str) -> str:
+    """Clean response for rephrase context"""
+    return strip_rephrase_prefix(response).strip()
 
-    # Fallback optimization if LLM not available or failed
+def get_fallback_prompt(context: str, cleaned_prompt: str) -> str:
+    """Fallback optimization if LLM not available or failed"""
     if context == "image_generation":
-        fallback_prompt = f"Create a detailed image of {cleaned_prompt} with vivid colors, clear composition, artistic style, and professional lighting. Include specific visual elements and mood."
+        return f"Create a detailed image of {cleaned_prompt} with vivid colors, clear composition, artistic style, and professional lighting. Include specific visual elements and mood."
     elif context == "video_generation":
-        fallback_prompt = f"Generate a video of {cleaned_prompt} with smooth motion, clear scene transitions, dynamic camera movements, and engaging visual storytelling elements."
+        return f"Generate a video of {cleaned_prompt} with smooth motion, clear scene transitions, dynamic camera movements, and engaging visual storytelling elements."
+    elif context == "rephrase":
+        # Already spell-checked by clean_prompt, which is the whole job without a model
+        return cleaned_prompt
     elif context == "cursor_code_optimizer":
-        fallback_prompt = f"""**Cursor-Optimized Code Request**: {cleaned_prompt}
+        return f"""**Cursor-Optimized Code Request**: {cleaned_prompt}
 
 **Implementation Plan for Cursor AI**:
 1. Set up development environment with Cursor AI integration
@@ -321,21 +719,333 @@ def apply_strategy(user_prompt: str, context: str = "general"):
 **Testing Strategy**: Include unit tests, integration tests, and user acceptance testing with AI assistance
 **Best Practices**: Follow coding standards, use version control, and implement proper error handling with Cursor AI guidance"""
     else:
-        fallback_prompt = f"Please provide a detailed, {context}-focused response about: {cleaned_prompt}"
+        return f"Please provide a detailed, {context}-focused response about: {cleaned_prompt}"
+
+def local_optimization(context: str, cleaned_prompt: str) -> str:
+    """Deterministic optimization used for prompts the router keeps away from the LLM
+
+    The router only sends rephrase prompts whose problems the dictionary
+    fully fixes. clean_prompt has already fixed the spelling; this adds the
+    shorthand fixes.
+    """
+    return text_corrector.correct(cleaned_prompt)
+
+def route_request(user_prompt: str, context: str) -> str:
+    """Return the tier that should answer: "local" for the rule-based engine, else "llm"."""
+    if tier_router is None:
+        return "llm"
+    with stage("route"):
+        return tier_router.route(user_prompt, context)
+
+def optimize_locally(user_prompt: str, context: str) -> dict:
+    """Answer a routed-local request without embeddings, retrieval or the LLM"""
+    with stage("local"):
+        cleaned_prompt = clean_prompt(user_prompt, context)
+        optimized = local_optimization(context, cleaned_prompt)
+        prompt_tokens = count_tokens(cleaned_prompt, context_models.get(context, default_model))
+    set_path("local")
+    return {
+        "original": user_prompt,
+        "strategy": context_strategies.get(context, context_strategies["general"]),
+        "optimized": optimized,
+        "source": "local",
+        "tokens": {"in": 0, "out": 0, "prompt": prompt_tokens, "compressed": False},
+    }
+
+def apply_strategy(user_prompt: str, context: str = "general", timings: bool = False):
+    """Apply optimization strategy based on context and prompt"""
+    trace = tracer.trace(context, debug=timings, prompt=user_prompt)
+    with trace:
+        if route_request(user_prompt, context) == LOCAL:
+            result = optimize_locally(user_prompt, context)
+        else:
+            result = complete_optimization(user_prompt, prepare_optimization(user_prompt, context))
+    trace.finish()
+    if timings:
+        result["timings"] = trace.timings()
+    return result
+
+def complete_optimization(user_prompt: str, prepared: dict):
+    """Answer a prepared optimization from the caches, the LLM or the fallback prompt"""
+    response = lookup_cached_response(prepared)
+    source = "cache"
+    if response is not None:
+        set_path("cache")
+
+    # Try to call LLM if available
+    if response is None:
+        source = "fallback"
+        with stage("llm"):
+            if request_coalescer:
+                # Identical templates already in flight share one LLM call
+                response = request_coalescer.run(
+                    prepared["cache_key"],
+                    lambda: call_llm(prepared),
+                    recheck=lambda: lookup_cached_response(prepared),
+                    timeout=get_llm_deadline(prepared["context"]) + 1
+                )
+            else:
+                response = call_llm(prepared)
+        if response:
+            source = "llm"
+            set_path("llm")
+
+    return dict(build_result(user_prompt, prepared, response), source=source)
+
+def call_llm(prepared: dict):
+    """Call the LLM behind admission, the deadline and circuit breaker, caching a successful response"""
+    llm = get_llm(prepared["model"])
+    if llm is None:
+        return None
+    deadline = get_llm_deadline(prepared["context"])
+    started = time.perf_counter()
+    if not admission_gate.acquire(deadline):
+        return shed_llm_call()
+    # Time spent queued for a slot comes out of the call's deadline
+    deadline -= time.perf_counter() - started
+    called = time.perf_counter()
+    response = None
+    try:
+        response = llm_guard.call(
+            prepared["model"],
+            lambda: llm.predict(prepared["template"], timeout=deadline),
+            deadline
+        )
+    except CircuitOpenError:
+        return None
+    except Exception as e:
+        logger.error(f"LLM call failed: {e}")
+        return None
+    finally:
+        # Only completed calls inform the expected queue wait
+        admission_gate.release(time.perf_counter() - called if response else None)
+    if response:
+        store_response(prepared, response)
+    return response
+
+def shed_llm_call():
+    """Answer for a call the admission gate turned away: None serves the fallback prompt"""
+    set_path("shed")
+    if admission_shed_mode == "reject":
+        raise Overloaded("LLM capacity exhausted", admission_gate.retry_after())
+    return None
+
+def build_result(user_prompt: str, prepared: dict, response):
+    """Format an LLM response, or the fallback prompt when there is none"""
+    context = prepared["context"]
+    strategy = prepared["strategy"]
+    if response:
+        if context == "rephrase":
+            response = clean_rephrase_response(response)
+        return {"original": user_prompt, "strategy": strategy, "optimized": response, "tokens": token_report(prepared, response)}
+
+    return {
+        "original": user_prompt,
+        "strategy": strategy,
+        "optimized": get_fallback_prompt(context, prepared["cleaned_prompt"]),
+        "tokens": token_report(prepared, "")
+    }
+
+def stream_strategy(user_prompt: str, context: str = "general", timings: bool = False):
+    """Apply optimization strategy, yielding ("token", text) events then a final ("done", metadata)"""
+    started = time.perf_counter()
+    first_token_at = None
+    # The trace is only made current around synchronous work, never across a yield
+    trace = tracer.trace(context, debug=timings, prompt=user_prompt)
+    with trace:
+        if route_request(user_prompt, context) == LOCAL:
+            local_result = optimize_locally(user_prompt, context)
+            prepared = response = None
+        else:
+            local_result = None
+            prepared = prepare_optimization(user_prompt, context)
+            response = lookup_cached_response(prepared)
+    source = "cache"
+
+    output = ""
+    llm_shed = False
+    if local_result is not None:
+        source = "local"
+        first_token_at = time.perf_counter()
+        yield "token", local_result["optimized"]
+    elif response is not None:
+        first_token_at = time.perf_counter()
+        output = clean_rephrase_response(response) if context == "rephrase" else response
+        yield "token", output
+    else:
+        llm = get_llm(prepared["model"])
+        chunks = []
+        # The model's own text, cached like a non-streamed answer; chunks is what the client was sent
+        raw = []
+        failed = False
+        # Streams go through admission and the breaker but not the deadline, which would cut off
+        # long answers; the response has already started, so a shed stream always gets the fallback
+        admitted = llm is not None and admission_gate.acquire(get_llm_deadline(context))
+        llm_shed = llm is not None and not admitted
+        if admitted and llm_guard.admit(prepared["model"]):
+            source = "llm"
+            llm_started = time.perf_counter()
+            try:
+                pieces = (raw.append(chunk.content) or chunk.content
+                          for chunk in llm.stream(prepared["template"]) if chunk.content)
+                for piece in (stream_rephrase_cleanup(pieces) if context == "rephrase" else pieces):
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    chunks.append(piece)
+                    yield "token", piece
+            except Exception as e:
+                failed = True
+                logger.error(f"LLM stream failed: {e}")
+                if chunks:
+                    yield "error", {"error": "LLM stream interrupted"}
+            finally:
+                # Also runs when the client disconnects, so a half-open probe and the slot are always released
+                llm_guard.record(prepared["model"], not failed)
+                admission_gate.release(time.perf_counter() - llm_started if chunks and not failed else None)
+            trace.add("llm", time.perf_counter() - llm_started)
+        elif admitted:
+            admission_gate.release()
+        if chunks and not failed:
+            output = "".join(chunks)
+            # Cache the raw text; rephrase cleanup is reapplied on every read
+            store_response(prepared, "".join(raw))
+        elif chunks:
+            # The client already has part of an answer, which is neither cached nor reported as one
+            source = "interrupted"
+            output = "".join(chunks)
+        else:
+            source = "fallback"
+            first_token_at = time.perf_counter()
+            yield "token", get_fallback_prompt(context, prepared["cleaned_prompt"])
+
+    finished = time.perf_counter()
+    trace.path = "shed" if llm_shed else source
+    trace.finish()
+    yield "done", {
+        "original": user_prompt,
+        "strategy": local_result["strategy"] if local_result else prepared["strategy"],
+        "source": source,
+        "tokens": local_result["tokens"] if local_result else token_report(prepared, output),
+        "timings": {
+            **(trace.timings() if timings else {}),
+            "first_token_ms": round((first_token_at - started) * 1000, 2),
+            "total_ms": round((finished - started) * 1000, 2),
+        },
+    }
+
+class RephraseStreamCleaner:
+    """Incrementally applies clean_rephrase_response to streamed text"""
+
+    longest_prefix = max(len(prefix) for prefix in rephrase_prefixes)
 
-    return {"original": user_prompt, "strategy": strategy, "optimized": fallback_prompt}
+    def __init__(self):
+        self.buffer = ""
+        self.pending_whitespace = ""
+        self.started = False
+
+    def feed(self, piece: str) -> str:
+        """Return the cleaned text that can be emitted after piece arrives"""
+        if not self.started:
+            # Hold the head back until a preamble can no longer match
+            self.buffer += piece
+            head = strip_rephrase_prefix(self.buffer)
+            if len(self.buffer) < self.longest_prefix or not head:
+                return ""
+            self.started = True
+            piece = head
+        # Trailing whitespace is only emitted once more text follows it
+        text = self.pending_whitespace + piece
+        stripped = text.rstrip()
+        self.pending_whitespace = text[len(stripped):]
+        return stripped
+
+    def finish(self) -> str:
+        """Return any held-back text once the stream has ended"""
+        if self.started:
+            return ""
+        return strip_rephrase_prefix(self.buffer).strip()
+
+def stream_rephrase_cleanup(pieces):
+    """Apply clean_rephrase_response to a stream of text pieces"""
+    cleaner = RephraseStreamCleaner()
+    for piece in pieces:
+        text = cleaner.feed(piece)
+        if text:
+            yield text
+    text = cleaner.finish()
+    if text:
+        yield text
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "message": "Prompt Optimizer API is running"})
+    return jsonify(get_health())
+
+def get_health() -> dict:
+    """Health payload shared by the Flask and ASGI apps"""
+    return {
+        "status": "healthy",
+        "message": "Prompt Optimizer API is running",
+        "cache": response_cache.stats() if response_cache else None,
+        "semantic_cache": semantic_cache.stats() if semantic_cache else None,
+        "llm": llm_guard.stats(),
+        "coalescing": request_coalescer.stats() if request_coalescer else None,
+        "routing": tier_router.stats() if tier_router else None,
+        "classifier": sorted(prompt_classifiers),
+        "journal": request_journal.stats() if request_journal else None,
+        "admission": admission_gate.stats(),
+        "jobs": job_queue.stats() if job_queue else None,
+        "rate_limit": rate_limiter.stats() if rate_limiter else None
+    }
+
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 200 once the strategy index is warm, 503 while warming or degraded"""
+    payload = get_readiness()
+    return jsonify(payload), 200 if payload["ready"] else 503
+
+def get_readiness() -> dict:
+    """Readiness payload shared by the Flask and ASGI apps"""
+    strategy_warmup.start()
+    status = strategy_warmup.status()
+    # Token counts fall back to estimates without the tokenizer, so it does not gate readiness
+    return {
+        "ready": status["state"] == READY,
+        "state": status["state"],
+        "components": {"strategy_index": status, "tokenizer": tokenizer_warmup.status()}
+    }
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Latency histograms in Prometheus text format"""
+    return Response(tracer.render(), mimetype="text/plain; version=0.0.4")
+
+def rate_limit_response(cost: int = 1):
+    """A 429 response when the calling client is over its rate limit, else None"""
+    if rate_limiter is None:
+        return None
+    if cost > rate_limiter.burst:
+        # More than a full bucket could never be admitted, however long the client waits
+        return jsonify({"error": f"At most {int(rate_limiter.burst)} items per request under the rate limit"}), 413
+    retry_after = rate_limiter.check(client_key(request.headers, request.remote_addr, rate_limit_trust_proxy), cost)
+    if not retry_after:
+        return None
+    return too_many_requests("Rate limit exceeded", retry_after)
+
+def too_many_requests(message: str, retry_after: float):
+    response = jsonify({"error": message, "retry_after": round(retry_after, 2)})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(math.ceil(retry_after))
+    return response
+
+def wants_timings() -> bool:
+    """Whether the caller asked for per-stage timings with the X-Debug-Timings header"""
+    return request.headers.get("X-Debug-Timings", "").lower() in ("1", "true", "yes")
 
 @app.route('/api/optimize', methods=['POST'])
 def optimize_prompt():
     """Main endpoint for prompt optimization"""
     try:
-        setup_pinecone_and_vectorstore()
-        
         data = request.get_json()
         user_prompt = data.get('prompt', '')
         context = data.get('context', 'general')
@@ -345,14 +1055,201 @@ def optimize_prompt():
         
         if context not in context_strategies:
             context = "general"
+
+        limited = rate_limit_response()
+        if limited:
+            return limited
         
-        result = apply_strategy(user_prompt, context)
+        if "text/event-stream" in request.headers.get("Accept", ""):
+            return event_stream_response(user_prompt, context)
+
+        result = apply_strategy(user_prompt, context, timings=wants_timings())
         return jsonify(result)
         
+    except Overloaded as e:
+        return too_many_requests("Server busy, retry shortly", e.retry_after)
     except Exception as e:
         logger.error(f"Error optimizing prompt: {e}")
         return jsonify({"error": "Failed to optimize prompt"}), 500
 
+@app.route('/api/optimize/stream', methods=['POST'])
+def optimize_prompt_stream():
+    """Stream the optimized prompt as Server-Sent Events"""
+    data = request.get_json(silent=True) or {}
+    user_prompt = data.get('prompt', '')
+    context = data.get('context', 'general')
+
+    if not user_prompt:
+        return jsonify({"error": "Prompt is required"}), 400
+
+    if context not in context_strategies:
+        context = "general"
+
+    return rate_limit_response() or event_stream_response(user_prompt, context)
+
+def event_stream_response(user_prompt: str, context: str):
+    """Wrap stream_strategy events in a text/event-stream response"""
+    timings = wants_timings()
+
+    def generate():
+        try:
+            for event, payload in stream_strategy(user_prompt, context, timings):
+                if event == "token":
+                    payload = {"text": payload}
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming prompt: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': 'Failed to optimize prompt'})}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def read_batch_items(data):
+    """Return (items, None) for a valid batch body, else (None, the error for a 400)"""
+    if not isinstance(data, dict):
+        return None, "Body must be a JSON object"
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return None, "items must be a non-empty list"
+    if len(items) > batch_max_items:
+        return None, f"At most {batch_max_items} items per batch"
+    return items, None
+
+def read_batch_item(item):
+    """Return ((prompt, context), None) for a valid batch item, else (None, the error that fails only it)"""
+    if not isinstance(item, dict):
+        return None, "Item must be an object"
+    user_prompt = item.get('prompt', '')
+    context = item.get('context', 'general')
+    if not isinstance(user_prompt, str) or not isinstance(context, str):
+        return None, "prompt and context must be strings"
+    if not user_prompt:
+        return None, "Prompt is required"
+    if context not in context_strategies:
+        context = "general"
+    return (user_prompt, context), None
+
+@app.route('/api/optimize/batch', methods=['POST'])
+def optimize_prompt_batch():
+    """Optimize a list of {prompt, context} items concurrently"""
+    data = request.get_json(silent=True)
+    items, error = read_batch_items(data)
+    if error:
+        return jsonify({"error": error}), 400
+    # Each item counts against the client's rate limit
+    limited = rate_limit_response(len(items))
+    if limited:
+        return limited
+
+    # Validate every item up front; invalid items fail alone
+    results = [None] * len(items)
+    valid = []
+    for i, item in enumerate(items):
+        parsed, error = read_batch_item(item)
+        if error:
+            results[i] = {"index": i, "error": error}
+            continue
+        user_prompt, context = parsed
+        if route_request(user_prompt, context) == LOCAL:
+            trace = tracer.trace(context, prompt=user_prompt)
+            with trace:
+                results[i] = dict(optimize_locally(user_prompt, context), index=i)
+            trace.finish()
+            continue
+        valid.append((i, user_prompt, context))
+
+    try:
+        prepared = prepare_batch([(user_prompt, context) for _, user_prompt, context in valid])
+    except Exception as e:
+        logger.error(f"Error preparing batch: {e}")
+        return jsonify({"error": "Failed to optimize prompts"}), 500
+
+    def run(i, user_prompt, item_prepared):
+        try:
+            trace = tracer.trace(item_prepared["context"], prompt=user_prompt)
+            with trace:
+                result = complete_optimization(user_prompt, item_prepared)
+            trace.finish()
+            return dict(result, index=i)
+        except Overloaded as e:
+            return {"index": i, "error": "Server busy, retry shortly", "retry_after": round(e.retry_after, 2)}
+        except Exception as e:
+            logger.error(f"Error optimizing batch item {i}: {e}")
+            return {"index": i, "error": "Failed to optimize prompt"}
+
+    executor = get_batch_executor()
+    futures = [executor.submit(run, i, user_prompt, item_prepared)
+               for (i, user_prompt, _), item_prepared in zip(valid, prepared)]
+
+    if data.get('stream') or "application/x-ndjson" in request.headers.get("Accept", ""):
+        def generate():
+            # Validation errors and locally answered items first, then results as they complete
+            for result in results:
+                if result is not None:
+                    yield json.dumps(result) + "\n"
+            for future in as_completed(futures):
+                yield json.dumps(future.result()) + "\n"
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    for future in futures:
+        result = future.result()
+        results[result["index"]] = result
+    return jsonify({"results": results})
+
+@app.route('/api/optimize/jobs', methods=['POST'])
+def submit_optimization_job():
+    """Queue an optimization and return its job id without waiting for the result"""
+    if job_queue is None:
+        return jsonify({"error": "Job mode is disabled"}), 404
+    data = request.get_json(silent=True) or {}
+    user_prompt = data.get('prompt', '')
+    context = data.get('context', 'general')
+
+    if not user_prompt:
+        return jsonify({"error": "Prompt is required"}), 400
+
+    if context not in context_strategies:
+        context = "general"
+
+    limited = rate_limit_response()
+    if limited:
+        return limited
+    try:
+        job = job_queue.submit(user_prompt, context)
+    except JobQueueFull:
+        return jsonify({"error": "Job queue is full, retry shortly"}), 503
+    url = f"/api/optimize/jobs/{job['id']}"
+    return jsonify(dict(job, url=url)), 202, {"Location": url}
+
+@app.route('/api/optimize/jobs/<job_id>', methods=['GET'])
+def get_optimization_job(job_id):
+    """Job status and, once finished, its result; ?wait=N long-polls up to N seconds"""
+    if job_queue is None:
+        return jsonify({"error": "Job mode is disabled"}), 404
+    job = job_queue.wait(job_id, job_wait_seconds(request.args.get('wait')))
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+    return jsonify(job)
+
+def job_wait_seconds(value) -> float:
+    """Long-poll duration requested by a job poll, capped at JOBS_MAX_WAIT"""
+    try:
+        return min(max(float(value or 0), 0.0), jobs_max_wait)
+    except ValueError:
+        return 0.0
+
+def get_batch_executor():
+    """Return the shared thread pool that bounds concurrent batch LLM calls"""
+    global batch_executor
+    if batch_executor is None:
+        with llm_clients_lock:
+            if batch_executor is None:
+                batch_executor = ThreadPoolExecutor(max_workers=batch_concurrency, thread_name_prefix="batch-llm")
+    return batch_executor
+
 @app.route('/api/strategies', methods=['GET'])
 def get_strategies():
     """Get available strategies and contexts"""
@@ -361,44 +1258,133 @@ def get_strategies():
         "strategies": docs
     })
 
+# Hop-by-hop headers are owned by the serving connection, not the app
+hop_by_hop_headers = frozenset((
+    "transfer-encoding", "connection", "keep-alive", "proxy-authenticate",
+    "proxy-authorization", "te", "trailers", "upgrade"
+))
+
 class handler(BaseHTTPRequestHandler):
-    """Vercel serverless function handler"""
-    
-    def do_GET(self):
-        """Handle GET requests"""
-        self.send_response(200)
-        self.send_header('Content-type', 'text/plain')
-        self.end_headers()
-        self.wfile.write(b'OK')
-
-    def do_POST(self):
-        """Handle POST requests by delegating to Flask app"""
-        content_length = int(self.headers.get('Content-Length', 0))
-        body = self.rfile.read(content_length) if content_length else b''
-        headers = {k: v for k, v in self.headers.items()}
+    """Vercel serverless function handler that dispatches every route through the Flask app"""
 
-        try:
-            with app.test_request_context(path=self.path, method='POST', headers=headers, data=body):
-                result = optimize_prompt()
-                flask_resp = make_response(result)
+    def handle_wsgi(self):
+        """Run the request through app.wsgi_app and stream its response"""
+        path, _, query = self.path.partition('?')
+        host, _, port = (self.headers.get('Host') or '').partition(':')
+        environ = {
+            'REQUEST_METHOD': self.command,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote(path, 'latin-1'),
+            'QUERY_STRING': query,
+            'SERVER_NAME': host or 'localhost',
+            'SERVER_PORT': port or '443',
+            'SERVER_PROTOCOL': self.request_version,
+            'REMOTE_ADDR': self.client_address[0] if self.client_address else '',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': self.headers.get('X-Forwarded-Proto', 'https'),
+            # The body is read straight from the socket, bounded by CONTENT_LENGTH
+            'wsgi.input': self.rfile,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': False,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for key, value in self.headers.items():
+            key = key.upper().replace('-', '_')
+            if key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                environ[key] = value
+            else:
+                key = 'HTTP_' + key
+                environ[key] = environ[key] + ',' + value if key in environ else value
+
+        response = []
 
-            self.send_response(flask_resp.status_code)
-            for k, v in flask_resp.headers.items():
-                if k.lower() not in ("transfer-encoding", "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailers", "upgrade"):
-                    self.send_header(k, v)
-            self.end_headers()
+        def start_response(status, response_headers, exc_info=None):
+            if exc_info and response:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response[:] = [status, response_headers]
+            return write
 
-            data = flask_resp.get_data()
+        def write(data):
+            if len(response) == 2:
+                status, response_headers = response
+                code, _, reason = status.partition(' ')
+                self.send_response(int(code), reason)
+                for k, v in response_headers:
+                    if k.lower() not in hop_by_hop_headers:
+                        self.send_header(k, v)
+                self.end_headers()
+                response.append(True)
             if data:
                 self.wfile.write(data)
-        except Exception as e:
+                # Flush each chunk so streamed (SSE / JSON Lines) responses reach the client immediately
+                self.wfile.flush()
+
+        try:
+            result = app.wsgi_app(environ, start_response)
             try:
-                self.send_response(500)
-                self.send_header('Content-type', 'text/plain')
-                self.end_headers()
-                self.wfile.write(str(e).encode('utf-8'))
-            except Exception:
-                pass
+                for data in result:
+                    write(data)
+                if len(response) == 2:
+                    write(b'')
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        except Exception as e:
+            logger.error(f"Error handling {self.command} {self.path}: {e}")
+            if len(response) < 3:
+                try:
+                    self.send_response(500)
+                    self.send_header('Content-type', 'text/plain')
+                    self.end_headers()
+                    self.wfile.write(b'Internal Server Error')
+                except Exception:
+                    pass
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = do_OPTIONS = handle_wsgi
+
+def preload():
+    """Build shared read-only state in a server's master process before it forks workers
+
+    The tokenizer tables and the strategy matrix are loaded once and the
+    import-time state (corpus, compiled patterns, templates, classifiers)
+    is moved out of the garbage collector's reach, so workers share all of
+    it copy-on-write instead of each building and dirtying its own copy.
+    """
+    tokenizer_warmup.run_once()
+    # The Pinecone client keeps sockets open, so each worker connects on its own
+    if strategy_index_backend == "local":
+        strategy_warmup.run_once()
+    gc.freeze()
+
+def reload_shared_state():
+    """Re-read the classifier and strategy snapshot in the master on a graceful reload"""
+    global prompt_classifiers, strategy_index
+    prompt_classifiers = load_prompt_classifiers()
+    if strategy_index_backend == "local":
+        strategy_index = None
+        strategy_warmup.reset()
+    preload()
+
+def reset_after_fork():
+    """Drop the network clients and thread pools a worker inherited from its parent
+
+    Connections and threads cannot be shared across processes; each worker
+    recreates them lazily on first use.
+    """
+    global http_client, async_http_client, embeddings, batch_executor
+    http_client = async_http_client = embeddings = batch_executor = None
+    llm_clients.clear()
+    llm_guard.reset_after_fork()
+    if isinstance(strategy_index, LocalStrategyIndex) and strategy_index.embeddings is not None:
+        strategy_index.embeddings = get_embeddings()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_after_fork)
+
+if os.getenv("WARMUP_ON_START", "1") != "0":
+    strategy_warmup.start()
+    tokenizer_warmup.start()
 
 if __name__ == "__main__":
     app.run()
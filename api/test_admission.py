@@ -0,0 +1,90 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+from _admission import (DEADLINE, QUEUE_FULL, TIMEOUT, ConcurrencyGate, RateLimiter, SQLiteBuckets, client_key,
+                        spend)
+
+
+def test_bucket_refills_at_rate_up_to_burst():
+    tokens, wait = spend(None, 0.0, 0.0, 1, rate=2, burst=3)
+    assert (tokens, wait) == (2, 0.0)
+    tokens, wait = spend(0.0, 0.0, 0.0, 1, rate=2, burst=3)
+    assert wait == 0.5
+    assert spend(0.0, 0.0, 100.0, 1, rate=2, burst=3)[0] == 2
+    # A cost above burst is never taken, even from a full bucket
+    assert spend(None, 0.0, 0.0, 10, rate=2, burst=3) == (3, 3.5)
+
+
+def test_shared_buckets_limit_across_workers(tmp_path):
+    path = str(tmp_path / "limits.db")
+    workers = [RateLimiter(rate=0.01, burst=2, buckets=SQLiteBuckets(path)) for _ in range(2)]
+    assert workers[0].check("ip:1.2.3.4") == 0
+    assert workers[1].check("ip:1.2.3.4") == 0
+    assert workers[0].check("ip:1.2.3.4") > 0
+    assert workers[1].check("ip:5.6.7.8") == 0
+    assert workers[0].stats()["limited"] == 1
+
+
+def test_locked_buckets_fail_open_without_stalling(tmp_path):
+    path = str(tmp_path / "limits.db")
+    limiter = RateLimiter(rate=0.01, burst=1, buckets=SQLiteBuckets(path))
+    assert asyncio.run(limiter.acheck("ip:1.2.3.4")) == 0
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.perf_counter()
+        assert asyncio.run(limiter.acheck("ip:1.2.3.4")) == 0
+        assert time.perf_counter() - started < 0.5
+    finally:
+        holder.execute("ROLLBACK")
+    assert limiter.check("ip:1.2.3.4") > 0
+
+
+def test_client_key_prefers_api_key_and_trusts_proxy_only_when_told():
+    assert client_key({"x-api-key": "secret"}, "10.0.0.1") == client_key({"authorization": "Bearer secret"})
+    assert "secret" not in client_key({"x-api-key": "secret"})
+    forwarded = {"x-forwarded-for": "203.0.113.7, 10.0.0.2"}
+    assert client_key(forwarded, "10.0.0.1") == "ip:10.0.0.1"
+    assert client_key(forwarded, "10.0.0.1", trust_proxy=True) == "ip:203.0.113.7"
+
+
+def test_gate_sheds_when_queue_is_full_or_too_slow():
+    gate = ConcurrencyGate(limit=1, max_queue=1, max_wait=0.05)
+    assert gate.acquire()
+    # Queued, then gives up when no slot frees within its wait
+    assert not gate.acquire()
+    assert gate.shed[TIMEOUT] == 1
+
+    gate.service_time = 10.0
+    assert not gate.acquire()
+    assert gate.shed[DEADLINE] == 1
+
+    gate.service_time = None
+    waiter = threading.Thread(target=gate.acquire, kwargs={"budget": 1.0})
+    waiter.start()
+    while not gate.stats()["queue_depth"]:
+        time.sleep(0.001)
+    assert not gate.acquire(budget=1.0)
+    assert gate.shed[QUEUE_FULL] == 1
+    gate.release()
+    waiter.join()
+    assert gate.stats()["in_flight"] == 1
+
+
+def test_released_slot_goes_to_waiting_coroutine():
+    gate = ConcurrencyGate(limit=1, max_queue=4, max_wait=1.0)
+
+    async def main():
+        assert await gate.aacquire()
+        waiting = asyncio.ensure_future(gate.aacquire())
+        await asyncio.sleep(0.01)
+        assert gate.stats()["queue_depth"] == 1
+        gate.release(0.2)
+        assert await waiting
+        gate.release()
+
+    asyncio.run(main())
+    assert gate.stats()["in_flight"] == 0
+    assert gate.admitted == 2 and gate.service_time == 0.2
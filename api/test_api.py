@@ -0,0 +1,188 @@
+import asyncio
+import http.client
+import json
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import httpx
+import pytest
+
+os.environ.setdefault("WARMUP_ON_START", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asgi
+import optimize
+from _admission import RateLimiter
+from _cache import MemoryCache, ResponseCache
+
+
+class Chunk:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeLLM:
+    """Answers with a fixed text; streams can be made to break off after a few chunks"""
+
+    def __init__(self, answer="Optimized prompt", fail_after=None):
+        self.answer = answer
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def predict(self, template, timeout=None):
+        self.calls += 1
+        return self.answer
+
+    def stream(self, template):
+        self.calls += 1
+        for i, word in enumerate(self.answer.split(" ")):
+            if i == self.fail_after:
+                raise RuntimeError("connection reset")
+            yield Chunk(word + " ")
+
+    async def ainvoke(self, template, timeout=None):
+        return Chunk(self.predict(template))
+
+    async def astream(self, template):
+        for chunk in self.stream(template):
+            yield chunk
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    fake = FakeLLM()
+    monkeypatch.setattr(optimize, "get_llm", lambda model=None, temperature=0: fake)
+    monkeypatch.setattr(optimize, "embed_prompt", lambda cleaned_prompt: None)
+    monkeypatch.setattr(optimize, "get_embeddings", lambda: None)
+    monkeypatch.setattr(optimize, "response_cache", ResponseCache([MemoryCache(max_entries=100, ttl=0)]))
+    monkeypatch.setattr(optimize, "semantic_cache", None)
+    monkeypatch.setattr(optimize, "request_coalescer", None)
+    return fake
+
+
+def read_events(response) -> list:
+    events = []
+    for block in response.get_data(as_text=True).strip().split("\n\n"):
+        event, data = block.split("\n", 1)
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_stream_that_fails_partway_is_reported_and_not_cached(llm):
+    llm.answer, llm.fail_after = "Partial answer that gets cut off", 2
+    client = optimize.app.test_client()
+    body = {"prompt": "explain how TCP slow start works", "context": "general"}
+
+    events = read_events(client.post("/api/optimize/stream", json=body))
+    assert [event for event, _ in events] == ["token", "token", "error", "done"]
+    assert events[-1][1]["source"] == "interrupted"
+
+    llm.fail_after = None
+    result = client.post("/api/optimize", json=body).get_json()
+    assert result["source"] == "llm" and result["optimized"] == "Partial answer that gets cut off"
+    assert llm.calls == 2
+
+
+def test_batch_larger_than_burst_is_throttled(llm, monkeypatch):
+    monkeypatch.setattr(optimize, "rate_limiter", RateLimiter(rate=0.01, burst=5))
+    client = optimize.app.test_client()
+    items = [{"prompt": f"summarize chapter {i}", "context": "general"} for i in range(200)]
+
+    response = client.post("/api/optimize/batch", json={"items": items})
+    assert response.status_code == 413 and llm.calls == 0
+
+    assert client.post("/api/optimize/batch", json={"items": items[:5]}).status_code == 200
+    assert client.post("/api/optimize/batch", json={"items": items[:1]}).status_code == 429
+
+
+def test_batch_isolates_invalid_items_and_rejects_invalid_bodies(llm):
+    client = optimize.app.test_client()
+    assert client.post("/api/optimize/batch", json=[{"prompt": "x"}]).status_code == 400
+    assert client.post("/api/optimize/batch", json={"items": {"prompt": "x"}}).status_code == 400
+
+    items = [
+        {"prompt": "write a haiku about autumn", "context": "general"},
+        {"prompt": "write a limerick", "context": ["general"]},
+        {"prompt": "write a sonnet", "context": {"name": "general"}},
+        "write an ode",
+        {"prompt": ""},
+    ]
+    response = client.post("/api/optimize/batch", json={"items": items})
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [result["index"] for result in results] == [0, 1, 2, 3, 4]
+    assert results[0]["optimized"] == "Optimized prompt" and results[0]["source"] == "llm"
+    assert [result["error"] for result in results[1:]] == [
+        "prompt and context must be strings", "prompt and context must be strings",
+        "Item must be an object", "Prompt is required",
+    ]
+
+
+def test_vercel_handler_bridges_requests_to_the_flask_app(llm):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), optimize.handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+        conn.request("GET", "/api/strategies")
+        response = conn.getresponse()
+        assert response.status == 200 and "general" in json.loads(response.read())["contexts"]
+
+        body = json.dumps({"prompt": "plan a product launch", "context": "general"})
+        conn.request("POST", "/api/optimize/stream", body, {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        assert response.status == 200 and response.getheader("Content-Type").startswith("text/event-stream")
+        events = response.read().decode().strip().split("\n\n")
+        assert events[0].startswith("event: token") and events[-1].startswith("event: done")
+        conn.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def asgi_post(path: str, body) -> httpx.Response:
+    async def post():
+        transport = httpx.ASGITransport(app=asgi.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, json=body)
+
+    return asyncio.run(post())
+
+
+def test_asgi_batch_and_interrupted_stream(llm):
+    items = [{"prompt": "draft a release note", "context": "general"}, {"prompt": "x", "context": 7}]
+    response = asgi_post("/api/optimize/batch", {"items": items})
+    assert response.status_code == 200
+    first, second = response.json()["results"]
+    assert first["optimized"] == "Optimized prompt" and first["index"] == 0
+    assert second == {"index": 1, "error": "prompt and context must be strings"}
+    assert asgi_post("/api/optimize/batch", [items[0]]).status_code == 400
+
+    llm.answer, llm.fail_after = "Partial answer that gets cut off", 2
+    body = {"prompt": "outline a migration plan", "context": "general"}
+    events = [block.split("\n")[0] for block in asgi_post("/api/optimize/stream", body).text.strip().split("\n\n")]
+    assert events == ["event: token", "event: token", "event: error", "event: done"]
+    llm.fail_after = None
+    assert asgi_post("/api/optimize", body).json()["source"] == "llm"
+
+
+def test_pre_llm_cleaning_leaves_shorthand_in_code_alone():
+    code = "set u = 5 and i = 0 in the loop"
+    assert optimize.clean_prompt(code, "rephrase") == code
+    assert optimize.clean_prompt("i recieve the messege", "rephrase") == "i receive the message"
+    # The local tier still fixes shorthand in the prompts the router sends it
+    assert optimize.optimize_locally("Can u send me the calender invite?", "rephrase")["optimized"] == \
+        "Can you send me the calendar invite?"
+
+
+def test_unconfident_code_prompts_share_the_batch_embedding(llm, monkeypatch):
+    embedded = []
+    monkeypatch.setattr(optimize, "classify_strategy", lambda context, cleaned_prompt: (None, False))
+    monkeypatch.setattr(optimize, "uses_semantic_cache", lambda context: False)
+    monkeypatch.setattr(optimize, "embed_prompts", lambda prompts: embedded.append(list(prompts)) or [None] * len(prompts))
+    monkeypatch.setattr(optimize, "strategy_index", None)
+    monkeypatch.setattr(optimize.strategy_warmup, "start", lambda: None)
+
+    prepared = optimize.prepare_batch([("refactor this loop", "cursor_code_optimizer"), ("plan a trip", "general")])
+    assert embedded == [["refactor this loop", "plan a trip"]] and len(prepared) == 2
@@ -0,0 +1,120 @@
+import time
+
+import numpy as np
+
+from _cache import MemoryCache, ResponseCache, SQLiteCache, make_cache_key
+from _semantic_cache import SemanticCache, create_semantic_cache, semantic_namespace
+
+
+def test_cache_key_depends_on_model_and_template():
+    assert make_cache_key("gpt-4o", "hello") == make_cache_key("gpt-4o", "hello")
+    assert make_cache_key("gpt-4o", "hello") != make_cache_key("gpt-4o-mini", "hello")
+    assert make_cache_key("gpt-4o", "hello") != make_cache_key("gpt-4o", "hello!")
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2, ttl=0)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def test_memory_cache_expires_entries():
+    cache = MemoryCache(max_entries=10, ttl=0.01)
+    cache.set("a", "1")
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+
+def test_tiered_cache_promotes_disk_hits(tmp_path):
+    memory = MemoryCache(max_entries=10, ttl=0)
+    disk = SQLiteCache(str(tmp_path / "cache.db"), max_entries=10, ttl=0)
+    disk.set("a", "1")
+    cache = ResponseCache([memory, disk])
+
+    assert cache.get("a") == "1"
+    assert memory.get("a") == "1"
+    assert cache.get("missing") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert [tier["hits"] for tier in stats["tiers"]] == [0, 1]
+
+
+def test_sqlite_cache_size_eviction(tmp_path):
+    disk = SQLiteCache(str(tmp_path / "cache.db"), max_entries=2, ttl=0)
+    for i in range(5):
+        disk.set(str(i), str(i))
+    disk.evict()
+    assert len(disk) == 2
+    assert disk.get("4") == "4"
+
+
+def test_semantic_cache_matches_near_duplicates_per_namespace():
+    cache = SemanticCache(threshold=0.95, capacity=4)
+    cache.add("general/gpt-4o", [1.0, 0.0, 0.0], "stored")
+
+    assert cache.get("general/gpt-4o", [0.99, 0.05, 0.0]) == "stored"
+    assert cache.get("general/gpt-4o", [0.0, 1.0, 0.0]) is None
+    assert cache.get("rephrase/gpt-4o", [1.0, 0.0, 0.0]) is None
+
+
+def test_near_duplicates_with_other_strategies_or_rephrase_do_not_collide(monkeypatch):
+    cache = SemanticCache(threshold=0.95, capacity=4)
+    # Two prompts a word apart ("the test passed" / "the test never passed") embed almost identically
+    passed, never_passed = [1.0, 0.02, 0.0], [0.99, 0.04, 0.01]
+    few_shot = semantic_namespace("general", "gpt-4o", "Few-shot prompting")
+    cot = semantic_namespace("general", "gpt-4o", "Chain-of-thought")
+    cache.add(few_shot, passed, "few-shot answer")
+
+    assert few_shot != cot and len(few_shot) < 40
+    assert cache.get(cot, never_passed) is None
+    assert cache.get(few_shot, never_passed) == "few-shot answer"
+    assert not cache.covers("rephrase") and cache.covers("general")
+    assert cache.stats()["entries"] == {few_shot: 1}
+
+    monkeypatch.delenv("SEMANTIC_CACHE_ENABLED", raising=False)
+    assert create_semantic_cache() is None
+    monkeypatch.setenv("SEMANTIC_CACHE_ENABLED", "1")
+    assert create_semantic_cache().skip_contexts == {"rephrase"}
+
+
+def test_semantic_cache_capacity_is_shared_by_every_namespace():
+    cache = SemanticCache(threshold=0.99, capacity=40)
+    rng = np.random.default_rng(0)
+    for i in range(100):
+        cache.add(f"general/gpt-4o/{i % 10}", rng.normal(size=8), str(i))
+    entries = cache.stats()["entries"]
+    assert sum(entries.values()) == 40 and len(entries) == 10
+
+    for i in range(10):
+        cache.add("technical/gpt-4o/new", rng.normal(size=8), str(i))
+    assert sum(cache.stats()["entries"].values()) == 40
+    # Buckets start small and grow as they fill, rather than reserving capacity rows each
+    assert all(len(bucket.vectors) <= 16 for bucket in cache._buckets.values())
+
+    vector = rng.normal(size=8)
+    cache.add("general/gpt-4o/0", vector, "kept")
+    assert cache.get("general/gpt-4o/0", vector) == "kept"
+    for i in range(39):
+        cache.add("image_generation/gpt-4o/x", rng.normal(size=8), str(i))
+    assert cache.get("general/gpt-4o/0", vector) == "kept"
+    assert set(cache.stats()["entries"]) == {"general/gpt-4o/0", "image_generation/gpt-4o/x"}
+    assert len(cache._buckets["image_generation/gpt-4o/x"].vectors) == 64
+
+
+def test_semantic_cache_evicts_least_recently_used():
+    cache = SemanticCache(threshold=0.99, capacity=2)
+    cache.add("general", [1.0, 0.0, 0.0], "a")
+    cache.add("general", [0.0, 1.0, 0.0], "b")
+    assert cache.get("general", [1.0, 0.0, 0.0]) == "a"
+    cache.add("general", [0.0, 0.0, 1.0], "c")
+
+    assert cache.get("general", [0.0, 1.0, 0.0]) is None
+    assert cache.get("general", [1.0, 0.0, 0.0]) == "a"
+    assert cache.get("general", [0.0, 0.0, 1.0]) == "c"
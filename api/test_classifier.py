@@ -0,0 +1,52 @@
+import numpy as np
+
+from _classifier import HashedNgramClassifier, hashed_features, load_classifiers, save_classifiers
+from _retrieval import LocalStrategyIndex
+
+TEXTS = [
+    "fix the error in my login function",
+    "debug why this test is broken",
+    "this crashes with a null pointer bug",
+    "refactor this class into smaller functions",
+    "clean up and restructure the module",
+    "rename variables and simplify the loop",
+    "add a dark mode toggle to settings",
+    "implement pagination for the user list",
+    "build an export to csv button",
+]
+LABELS = ["debug"] * 3 + ["refactor"] * 3 + ["feature"] * 3
+
+
+def test_features_share_prefixes_across_inflections():
+    debugging = set(hashed_features("debugging", 4096).tolist())
+    debugger = set(hashed_features("debugger", 4096).tolist())
+    assert debugging & debugger
+    assert len(hashed_features("", 4096)) == 0
+
+
+def test_train_and_predict():
+    model = HashedNgramClassifier.train(TEXTS, LABELS, n_features=1024)
+    assert model.labels == ["debug", "feature", "refactor"]
+    label, confidence = model.predict("please fix this broken error")
+    assert label == "debug"
+    assert 1 / 3 < confidence <= 1.0
+    assert model.predict("restructure and clean up the functions")[0] == "refactor"
+
+
+def test_save_and_load_round_trip(tmp_path):
+    model = HashedNgramClassifier.train(TEXTS, LABELS, n_features=1024)
+    path = str(tmp_path / "classifier.npz")
+    save_classifiers(path, {"cursor_code_optimizer": model})
+    loaded = load_classifiers(path)["cursor_code_optimizer"]
+    assert loaded.labels == model.labels
+    text = "add an export button"
+    assert loaded.predict(text)[0] == model.predict(text)[0]
+    assert abs(loaded.predict(text)[1] - model.predict(text)[1]) < 1e-2
+
+
+def test_retrieval_can_be_restricted_to_candidates():
+    index = LocalStrategyIndex(["a", "b", "c"], np.eye(3))
+    assert index.search("query", vector=[1, 0, 0]) == ["a"]
+    assert index.search("query", vector=[1, 0.5, 0], candidates=["b", "c"]) == ["b"]
+    assert index.search("query", vector=[1, 0, 0], candidates=[]) == []
+    assert index.search("query", vector=[0, 0.2, 1], candidates=["b", "c"]) == ["c"]
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from _coalesce import RequestCoalescer, create_request_coalescer
+
+fcntl = pytest.importorskip("fcntl")
+
+
+def test_concurrent_identical_calls_share_one_upstream_call():
+    coalescer = RequestCoalescer()
+    calls = []
+    results = []
+
+    def upstream():
+        calls.append(1)
+        time.sleep(0.1)
+        return "optimized"
+
+    threads = [threading.Thread(target=lambda: results.append(coalescer.run("key", upstream))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == ["optimized"] * 8
+    assert coalescer.stats()["coalesced"] == 7
+
+
+def test_waiter_on_another_process_reads_the_cached_result(tmp_path):
+    coalescer = RequestCoalescer(lock_dir=str(tmp_path))
+    cache = {}
+    # A separate open file description stands in for another worker holding the key
+    fd = os.open(coalescer.lock_path("key"), os.O_CREAT | os.O_RDWR)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    os.write(fd, b"key")
+
+    def other_worker():
+        time.sleep(0.1)
+        cache["key"] = "from other worker"
+        os.close(fd)
+
+    threading.Thread(target=other_worker).start()
+    result = coalescer.run("key", lambda: "called upstream", recheck=lambda: cache.get("key"), timeout=5)
+    assert result == "from other worker"
+    assert coalescer.stats()["cross_process"] == 1
+
+
+def test_keys_sharing_a_lock_slot_do_not_wait_for_each_other(tmp_path):
+    coalescer = RequestCoalescer(lock_dir=str(tmp_path), lock_slots=1)
+    assert coalescer.lock_path("first") == coalescer.lock_path("second")
+    # Another worker holds the only slot for "first"
+    fd = os.open(coalescer.lock_path("first"), os.O_CREAT | os.O_RDWR)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    os.write(fd, b"first")
+    try:
+        started = time.monotonic()
+        assert coalescer.run("second", lambda: "called upstream", recheck=lambda: None, timeout=5) == "called upstream"
+
+        async def upstream():
+            return "called upstream"
+
+        assert asyncio.run(coalescer.arun("second", upstream, timeout=5)) == "called upstream"
+        assert time.monotonic() - started < 1
+        assert coalescer.stats()["cross_process"] == 0
+    finally:
+        os.close(fd)
+
+
+def test_lock_files_are_bounded_and_need_a_shared_cache(tmp_path, monkeypatch):
+    coalescer = RequestCoalescer(lock_dir=str(tmp_path), lock_slots=4)
+    for i in range(50):
+        assert coalescer.run(f"key-{i}", lambda: "optimized") == "optimized"
+    assert len(os.listdir(str(tmp_path))) <= 4
+
+    monkeypatch.setenv("COALESCE_LOCK_DIR", str(tmp_path / "locks"))
+    assert create_request_coalescer().lock_dir is None
+    assert create_request_coalescer(shared_cache=True).lock_dir == str(tmp_path / "locks")
+
+
+def test_async_waiter_on_another_process_reads_the_cached_result(tmp_path):
+    coalescer = RequestCoalescer(lock_dir=str(tmp_path))
+    cache = {}
+    fd = os.open(coalescer.lock_path("key"), os.O_CREAT | os.O_RDWR)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    os.write(fd, b"key")
+
+    def other_worker():
+        time.sleep(0.1)
+        cache["key"] = "from other worker"
+        os.close(fd)
+
+    async def upstream():
+        return "called upstream"
+
+    threading.Thread(target=other_worker).start()
+    result = asyncio.run(coalescer.arun("key", upstream, recheck=lambda: cache.get("key"), timeout=5))
+    assert result == "from other worker"
+    assert coalescer.stats()["cross_process"] == 1
+
+
+def test_async_callers_share_one_coroutine():
+    coalescer = RequestCoalescer()
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "optimized"
+
+    async def run():
+        return await asyncio.gather(*(coalescer.arun("key", upstream) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["optimized"] * 5
+    assert len(calls) == 1
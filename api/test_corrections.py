@@ -0,0 +1,36 @@
+from _corrections import TextCorrector
+
+FILLER_WORDS = ["just", "basically", "actually", "like", "you know", "I mean"]
+
+
+def test_corrections_keep_case_and_count_changes():
+    corrector = TextCorrector()
+    text, changes = corrector.apply("i recieve ur messege. Definately a SUCESS, dont worry")
+    assert text == "I receive your message. Definitely a SUCCESS, don't worry"
+    assert changes == 7
+
+
+def test_only_whole_words_are_replaced():
+    corrector = TextCorrector()
+    text = "a sandwich, a u-turn, don't, its tail, wichita and requirements"
+    assert corrector.correct(text) == text
+    assert corrector.correct("the wich, u and I") == "the which, you and I"
+
+
+def test_filler_words_are_removed_without_leaving_gaps():
+    corrector = TextCorrector(filler_words=FILLER_WORDS)
+    assert corrector.correct("Basically i just want a calender you know.") == "I want a calendar."
+    assert corrector.correct("code:\n    x = 1\n") == "code:\n    x = 1\n"
+
+
+def test_empty_dictionaries_pass_text_through():
+    corrector = TextCorrector(spelling={}, informal={})
+    assert corrector.apply("recieve ur messege") == ("recieve ur messege", 0)
+
+
+def test_shorthand_leaves_abbreviations_and_capitals_alone():
+    corrector = TextCorrector()
+    for text in ["the U.S. market", "i.e. the rest", "slow i/o", "vitamin D and U", "UR code", "10 u/s", "e.g. u.s."]:
+        assert corrector.correct(text) == text
+    assert corrector.correct("can u check ur code? i think so.") == "can you check your code? I think so."
+    assert corrector.correct("Recieve the messege.") == "Receive the message."
@@ -0,0 +1,65 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from _jobs import FAILED, QUEUED, SUCCEEDED, JobQueue, JobQueueFull, MemoryJobStore, SQLiteJobStore
+
+
+def optimize(prompt, context):
+    if prompt == "boom":
+        raise RuntimeError("model unavailable")
+    return {"original": prompt, "optimized": prompt.upper(), "context": context}
+
+
+def test_job_runs_and_long_poll_returns_result():
+    release = threading.Event()
+    jobs = JobQueue(MemoryJobStore(), lambda prompt, context: release.wait(5) and optimize(prompt, context))
+    job = jobs.submit("explain recursion", "general")
+    assert job["status"] == QUEUED and len(job["id"]) >= 16
+    assert jobs.wait(job["id"], timeout=0.05)["status"] != SUCCEEDED
+
+    release.set()
+    finished = jobs.wait(job["id"], timeout=5)
+    assert finished["status"] == SUCCEEDED
+    assert finished["result"]["optimized"] == "EXPLAIN RECURSION"
+    assert "explain recursion" not in json.dumps(jobs.get(job["id"]))
+    assert jobs.wait("unknown", timeout=1) is None
+
+
+def test_failed_job_keeps_error():
+    jobs = JobQueue(MemoryJobStore(), optimize)
+    job = jobs.wait(jobs.submit("boom", "general")["id"], timeout=5)
+    assert job["status"] == FAILED and job["error"] == "model unavailable"
+    assert jobs.stats()[FAILED] == 1 and jobs.stats()["pending"] == 0
+
+
+def test_full_queue_rejects_and_results_expire():
+    release = threading.Event()
+    jobs = JobQueue(MemoryJobStore(ttl=0.3), lambda prompt, context: release.wait(5), workers=1, max_pending=1)
+    job = jobs.submit("first", "general")
+    with pytest.raises(JobQueueFull):
+        jobs.submit("second", "general")
+    release.set()
+    assert jobs.wait(job["id"], timeout=5)["status"] == SUCCEEDED
+    time.sleep(0.4)
+    assert jobs.get(job["id"]) is None
+
+
+def test_sqlite_store_lets_another_worker_poll(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    runner = JobQueue(SQLiteJobStore(path), optimize)
+    poller = JobQueue(SQLiteJobStore(path), optimize, poll_interval=0.01)
+    job_id = runner.submit("add tests", "general")["id"]
+
+    async def poll():
+        return await poller.await_job(job_id, timeout=5)
+
+    job = asyncio.run(poll())
+    assert job["status"] == SUCCEEDED and job["result"]["optimized"] == "ADD TESTS"
+    assert "original" not in job["result"]
+    (row,) = sqlite3.connect(path).execute("SELECT job FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    assert "add tests" not in row
@@ -0,0 +1,58 @@
+import os
+
+from _journal import RequestJournal, prompt_hash, read_journal
+from _metrics import NULL_TRACE, Tracer, set_path, stage
+
+
+def traced(tracer, context, prompt, path="llm"):
+    trace = tracer.trace(context, prompt=prompt)
+    with trace:
+        with stage("clean"):
+            pass
+        set_path(path)
+    trace.finish()
+
+
+def test_journal_writes_one_line_per_trace(tmp_path):
+    journal = RequestJournal(str(tmp_path), flush_interval=0.01)
+    tracer = Tracer(enabled=False)
+    assert tracer.trace("general") is NULL_TRACE
+    tracer.sinks.append(journal.record)
+    traced(tracer, "general", "explain recursion")
+    traced(tracer, "rephrase", "i dont know", path="local")
+    journal.close()
+
+    entries = read_journal(str(tmp_path))
+    assert [entry["context"] for entry in entries] == ["general", "rephrase"]
+    assert entries[0]["prompt_hash"] == prompt_hash("explain recursion")
+    assert entries[0]["prompt_len"] == len("explain recursion")
+    assert entries[1]["path"] == "local"
+    assert "clean" in entries[0]["stages"] and entries[0]["total_ms"] >= 0
+    assert "prompt" not in entries[0]
+    assert journal.stats()["written"] == 2
+
+
+def test_journal_rotates_and_reads_back_in_order(tmp_path):
+    journal = RequestJournal(str(tmp_path), max_bytes=200, backups=2, store_prompts=True, flush_interval=0.01,
+                             batch_size=1)
+    tracer = Tracer(enabled=False)
+    tracer.sinks.append(journal.record)
+    for i in range(6):
+        traced(tracer, "general", f"prompt number {i}")
+    journal.close()
+
+    files = sorted(os.listdir(tmp_path))
+    assert f"journal-{os.getpid()}.jsonl.1" in files
+    assert len(files) <= 3
+    prompts = [entry["prompt"] for entry in read_journal(str(tmp_path))]
+    assert prompts == sorted(prompts) and prompts[-1] == "prompt number 5"
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    journal = RequestJournal(str(tmp_path), max_pending=1)
+    journal._ensure_writer = lambda: None  # keep the queue from draining
+    tracer = Tracer(enabled=False)
+    tracer.sinks.append(journal.record)
+    traced(tracer, "general", "first")
+    traced(tracer, "general", "second")
+    assert journal.stats()["dropped"] == 1
@@ -0,0 +1,41 @@
+from _metrics import NULL_TRACE, Histogram, Tracer, set_path, stage
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency", ("context",), buckets=(0.1, 1.0))
+    histogram.observe(("general",), 0.05)
+    histogram.observe(("general",), 0.5)
+    histogram.observe(("general",), 5.0)
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{context="general",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{context="general",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{context="general",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{context="general"} 3' in lines
+
+
+def test_trace_records_stages_by_context_and_path():
+    tracer = Tracer(enabled=True)
+    trace = tracer.trace("rephrase")
+    with trace:
+        with stage("clean"):
+            pass
+        set_path("cache")
+    trace.finish()
+    timings = trace.timings()
+    assert timings["path"] == "cache"
+    assert "clean_ms" in timings and "total_ms" in timings
+    text = tracer.render()
+    assert 'prompt_optimizer_stage_duration_seconds_count{stage="clean",context="rephrase",path="cache"} 1' in text
+    assert 'prompt_optimizer_request_duration_seconds_count{context="rephrase",path="cache"} 1' in text
+
+
+def test_disabled_tracer_only_traces_debug_requests():
+    tracer = Tracer(enabled=False)
+    assert tracer.trace("general") is NULL_TRACE
+    trace = tracer.trace("general", debug=True)
+    with trace:
+        with stage("llm"):
+            pass
+    trace.finish()
+    assert "llm_ms" in trace.timings()
+    assert "prompt_optimizer_stage_duration_seconds_count" not in tracer.render()
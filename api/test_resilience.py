@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+from _resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, DeadlineExceeded, ResilientCaller
+
+
+def test_breaker_opens_then_half_opens_for_one_probe():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_deadline_fails_fast_and_trips_breaker():
+    caller = ResilientCaller(failure_threshold=2, reset_timeout=60)
+    for _ in range(2):
+        started = time.perf_counter()
+        with pytest.raises(DeadlineExceeded):
+            caller.call("gpt-4o", lambda: time.sleep(0.3), deadline=0.05)
+        assert time.perf_counter() - started < 0.5
+    with pytest.raises(CircuitOpenError):
+        caller.call("gpt-4o", lambda: "unused", deadline=1)
+    stats = caller.stats()["gpt-4o"]
+    assert stats["state"] == OPEN and stats["timeout"] == 2 and stats["rejected"] == 1
+
+
+def test_hedged_call_wins_when_primary_stalls():
+    caller = ResilientCaller(hedge=True, hedge_quantile=0.5)
+    for _ in range(20):
+        assert caller.call("gpt-4o", lambda: "fast", deadline=1) == "fast"
+    calls = []
+
+    def slow_then_fast():
+        calls.append(1)
+        time.sleep(0.5 if len(calls) == 1 else 0)
+        return f"call {len(calls)}"
+
+    assert caller.call("gpt-4o", slow_then_fast, deadline=1) == "call 2"
+    stats = caller.stats()["gpt-4o"]
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+
+
+def test_async_call_respects_deadline():
+    caller = ResilientCaller()
+
+    async def run():
+        assert await caller.acall("gpt-4o", lambda: asyncio.sleep(0, result="ok"), deadline=1) == "ok"
+        with pytest.raises(DeadlineExceeded):
+            await caller.acall("gpt-4o", lambda: asyncio.sleep(1), deadline=0.05)
+
+    asyncio.run(run())
@@ -0,0 +1,44 @@
+from _corrections import TextCorrector
+from _routing import DEFAULT_VOCABULARY_PATH, LLM, LOCAL, TierRouter, load_vocabulary
+
+MAX_WORDS = {"rephrase": 40}
+VOCABULARY = load_vocabulary(DEFAULT_VOCABULARY_PATH)
+
+
+def test_fully_corrected_prompts_go_local():
+    router = TierRouter(TextCorrector(), MAX_WORDS, VOCABULARY)
+    assert router.route("Can u send me the calender invite?", "rephrase") == LOCAL
+    assert router.route("Please seperate the requirments before the meeting.", "rephrase") == LOCAL
+    assert router.stats() == {"local": 2, "llm": 0, "local_share": 1.0}
+
+
+def test_long_noisy_or_garbled_prompts_go_to_the_llm():
+    router = TierRouter(TextCorrector(), MAX_WORDS, VOCABULARY)
+    assert router.route("word " * 41, "rephrase") == LLM
+    assert router.route("u r gr8 thx 4 ur hlp", "rephrase") == LLM
+    assert router.route("i recieve ur messege", "rephrase") == LLM
+    assert router.route("explain recursion", "general") == LLM
+
+
+def test_prompts_without_positive_evidence_go_to_the_llm():
+    router = TierRouter(TextCorrector(), MAX_WORDS, VOCABULARY)
+    # Nothing for the dictionary to fix
+    assert router.route("Please send me the report.", "rephrase") == LLM
+    # Grammar the dictionary cannot fix
+    assert router.route("me and him goes to the store", "rephrase") == LLM
+    assert router.route("she dont know the calender", "rephrase") == LLM
+    # Words outside the vocabulary, and context-dependent spellings
+    assert router.route("the calender for the zorblax launch", "rephrase") == LLM
+    assert router.route("their going too the park tomorow", "rephrase") == LLM
+    # Code, where shorthand is usually a variable
+    assert router.route("set u = 5 and i = 0 in the loop", "rephrase") == LLM
+    assert router.stats()["local"] == 0
+
+
+def test_features_skip_the_scan_for_long_prompts():
+    router = TierRouter(TextCorrector(), MAX_WORDS, VOCABULARY)
+    features = router.features("i dont know", "rephrase")
+    assert features == {"context": "rephrase", "words": 3, "typos": 2, "typo_density": 0.667, "noise": 0,
+                        "unknown": 0, "grammar": 0, "code": 0}
+    assert router.features("word " * 41, "rephrase")["typos"] is None
+    assert router.features("explain recursion", "general")["unknown"] is None
@@ -0,0 +1,38 @@
+import json
+import os
+import subprocess
+import sys
+
+# Generous enough for slow CI machines; a cold import that loads LangChain takes several times this
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import optimize
+status = optimize.app.test_client().get("/api/health").status_code
+elapsed = time.perf_counter() - started
+heavy = [m for m in ("langchain_openai", "langchain_pinecone", "openai", "pinecone") if m in sys.modules]
+print(json.dumps({"status": status, "elapsed_ms": elapsed * 1000, "heavy": heavy}))
+"""
+
+
+def run_probe():
+    env = dict(os.environ, WARMUP_ON_START="0")
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def test_health_does_not_load_provider_sdks():
+    result = run_probe()
+    assert result["status"] == 200
+    assert result["heavy"] == []
+
+
+def test_cold_start_within_budget():
+    result = run_probe()
+    assert result["elapsed_ms"] < STARTUP_BUDGET_MS, f"cold start took {result['elapsed_ms']:.0f} ms"
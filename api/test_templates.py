@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from _templates import DEFAULT_TEMPLATES, TemplateRegistry, load_templates
+
+INSTRUCTIONS = {"general": "Be clear.", "rephrase": "Fix grammar."}
+
+
+def test_prefix_is_stable_and_prompt_is_spliced_verbatim():
+    registry = TemplateRegistry(DEFAULT_TEMPLATES, INSTRUCTIONS)
+    prefix, suffix = registry.segments("rephrase", "Strategy A")
+    assert "Strategy A" in prefix and "Fix grammar." in prefix
+    assert registry.segments("rephrase", "Strategy A")[0] is prefix
+    prompt = "keep {strategy} and {prompt} literal"
+    assert registry.render("rephrase", "Strategy A", prompt) == prefix + prompt + suffix
+
+
+def test_unknown_context_uses_default_template():
+    registry = TemplateRegistry(DEFAULT_TEMPLATES, INSTRUCTIONS)
+    rendered = registry.render("legal", "Strategy B", "draft an NDA")
+    assert rendered.startswith("You are a Prompt Optimizer AI specializing in legal content.")
+    assert "2. Be clear." in rendered
+
+
+def test_load_templates_adds_contexts(tmp_path):
+    path = tmp_path / "templates.json"
+    path.write_text(json.dumps({"contexts": {"legal": {
+        "template": "Lawyer mode. {strategy}\n{prompt}\nDone.",
+        "strategy": "Legal prompting",
+    }}}))
+    contexts = load_templates(str(path))
+    registry = TemplateRegistry(dict(DEFAULT_TEMPLATES, legal=contexts["legal"]["template"]), INSTRUCTIONS)
+    assert registry.render("legal", contexts["legal"]["strategy"], "NDA") == "Lawyer mode. Legal prompting\nNDA\nDone."
+
+
+def test_new_contexts_need_a_strategy(tmp_path):
+    path = tmp_path / "templates.json"
+    path.write_text(json.dumps({"contexts": {"legal": {"template": "Lawyer mode. {prompt}"}}}))
+    with pytest.raises(ValueError):
+        load_templates(str(path), known_contexts={"general": "General prompting"})
+
+    path.write_text(json.dumps({"contexts": {"general": {"instruction": "Be brief."}}}))
+    assert load_templates(str(path), known_contexts={"general": "General prompting"}) == \
+        {"general": {"instruction": "Be brief."}}
+
+
+def test_templates_need_exactly_one_prompt_placeholder(tmp_path):
+    path = tmp_path / "templates.json"
+    path.write_text(json.dumps({"contexts": {"legal": {"template": "No placeholder"}}}))
+    with pytest.raises(ValueError):
+        load_templates(str(path))
@@ -0,0 +1,61 @@
+import tiktoken
+
+import _tokens
+from _tokens import ApproximateEncoder, count_tokens, fit_prompt
+
+# A byte-level encoding (one token per byte) exercises the tiktoken code path offline
+_tokens._encoders["bytes-model"] = tiktoken.Encoding(
+    name="bytes",
+    pat_str=r"[\s\S]",
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={},
+)
+_tokens._encoders["approx-model"] = ApproximateEncoder()
+
+
+def test_prompt_within_budget_is_unchanged():
+    text = "Explain how TCP congestion control works"
+    assert fit_prompt(text, 1000, "bytes-model") == (text, len(text), len(text))
+
+
+def test_oversized_prompt_keeps_head_and_tail():
+    text = "HEAD " + "x" * 5000 + " TAIL"
+    fitted, before, after = fit_prompt(text, 200, "bytes-model")
+    assert before == len(text)
+    assert after <= 220
+    assert fitted.startswith("HEAD ") and fitted.endswith(" TAIL")
+    assert "tokens omitted" in fitted
+
+
+def test_code_blocks_are_compressed_before_prose():
+    prose = "Refactor this module to use dependency injection and keep the public API."
+    code = "```python\n" + "def handler():\n    pass\n" * 500 + "```"
+    fitted, before, after = fit_prompt(f"{prose}\n{code}\nThanks!", 400, "bytes-model")
+    assert after < before
+    assert fitted.startswith(prose) and fitted.endswith("```\nThanks!")
+
+
+def test_approximate_encoder_counts_characters():
+    assert count_tokens("a" * 10, "approx-model") == 3
+    fitted, before, after = fit_prompt("word " * 2000, 100, "approx-model")
+    assert before == 2500 and after <= 110
+
+
+def test_failed_load_is_cached_until_the_warmup_retries(monkeypatch):
+    attempts = []
+
+    def unavailable(name):
+        attempts.append(name)
+        raise OSError("network unreachable")
+
+    monkeypatch.setattr(_tokens, "_unavailable", None)
+    monkeypatch.setattr(tiktoken, "encoding_for_model", unavailable)
+    assert isinstance(_tokens.get_encoder("offline-a"), ApproximateEncoder)
+    assert isinstance(_tokens.get_encoder("offline-b"), ApproximateEncoder)
+    assert count_tokens("a" * 8, "offline-a") == 2 and len(attempts) == 1
+
+    monkeypatch.setattr(tiktoken, "encoding_for_model", lambda name: _tokens._encoders["bytes-model"])
+    assert _tokens.get_encoder("offline-a", retry=True).name == "bytes"
+    assert _tokens.get_encoder("offline-b").name == "bytes"
+    _tokens._encoders.pop("offline-a")
+    _tokens._encoders.pop("offline-b")
@@ -0,0 +1,42 @@
+from _warmup import COLD, DEGRADED, READY, WarmupTask
+
+
+def test_warmup_retries_until_ready():
+    calls = []
+
+    def setup():
+        calls.append(1)
+        if len(calls) < 3:
+            raise RuntimeError("index unavailable")
+        return True
+
+    task = WarmupTask("test", setup, base_delay=0.01, max_delay=0.02)
+    assert task.wait(timeout=5)
+    assert task.state == READY
+    assert len(calls) == 3
+    assert "last_error" not in task.status()
+
+
+def test_warmup_reports_degraded_while_retrying():
+    task = WarmupTask("test", lambda: None, base_delay=60, max_delay=60)
+    task.start()
+    assert not task.wait(timeout=0.2)
+    status = task.status()
+    assert status["state"] == DEGRADED
+    assert status["last_error"] == "setup returned no result"
+    assert status["retry_in_s"] > 0
+
+
+def test_run_once_leaves_failed_warmup_cold_for_workers():
+    task = WarmupTask("test", lambda: None)
+    assert not task.run_once()
+    assert task.state == COLD
+    assert task.status()["last_error"] == "setup returned no result"
+
+    task.setup = lambda: True
+    assert task.run_once()
+    assert task.state == READY
+    assert task.run_once() and task.attempts == 2
+
+    task.reset()
+    assert task.state == COLD and task.attempts == 0
@@ -1,7 +1,14 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+import os
 import re
 import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+
+from _classifier import MIN_CONFIDENCE, load_classifiers
+from _corrections import TextCorrector
 
 app = Flask(__name__)
 CORS(app)
@@ -32,26 +39,70 @@ context_strategies = {
     "general": "General prompting: Use clear, direct language with specific instructions and expected outcomes, include step-by-step guidance and comprehensive information."
 }
 
+# Filler words and cleanup patterns are compiled once at import time
+useless_words = ["actually", "basically", "just", "like", "I mean", "you know", "um", "uh", "well"]
+filler_pattern = re.compile(
+    r'\b(?:' + '|'.join(re.escape(w) for w in sorted(useless_words, key=len, reverse=True)) + r')\b',
+    re.IGNORECASE
+)
+separator_run_pattern = re.compile(r'[\s,.]+')
+whitespace_pattern = re.compile(r'\s+')
+comma_pattern = re.compile(r'\s*,\s*')
+period_pattern = re.compile(r'\s*\.\s*')
+
+def normalize_separators(match):
+    """Normalize one run of whitespace, commas and periods"""
+    run = whitespace_pattern.sub(' ', match.group(0))  # Multiple spaces to single space
+    run = comma_pattern.sub(', ', run)  # Clean up comma spacing
+    return period_pattern.sub('. ', run)  # Clean up period spacing
+
+# Local rephrase engine: dictionary corrections plus the filler words rephrase drops
+rephrase_corrector = TextCorrector(filler_words=["just", "basically", "actually", "like", "you know", "I mean"])
+
+# Image and video sub-styles come from the trained prompt classifier (see train_classifier.py)
+try:
+    style_classifiers = load_classifiers(os.path.join(os.path.dirname(os.path.abspath(__file__)), "api", "prompt_classifier.npz"))
+except (OSError, ValueError):
+    style_classifiers = {}
+
+# Keyword rules used when the classifier is missing or unsure, checked in order
+style_keywords = {
+    "image_generation": [
+        ("portrait", ["portrait", "person", "face", "headshot"]),
+        ("landscape", ["landscape", "nature", "outdoor", "sunset", "mountains"]),
+        ("abstract", ["abstract", "art", "creative", "painting"]),
+        ("product", ["product", "luxury", "watch", "jewelry"]),
+    ],
+    "video_generation": [
+        ("action", ["action", "movement", "dynamic"]),
+        ("nature", ["nature", "landscape", "outdoor"]),
+        ("commercial", ["product", "commercial", "advertising"]),
+    ],
+}
+
+def classify_style(context: str, prompt: str) -> str:
+    """Sub-style label for an image or video prompt, "general" when none applies"""
+    classifier = style_classifiers.get(context)
+    if classifier is not None:
+        label, confidence = classifier.predict(prompt)
+        if confidence >= MIN_CONFIDENCE:
+            return label
+    prompt_lower = prompt.lower()
+    for label, words in style_keywords.get(context, []):
+        if any(word in prompt_lower for word in words):
+            return label
+    return "general"
+
 def clean_prompt(prompt: str) -> str:
     """Remove filler words and clean the prompt while preserving important context"""
     # Only remove truly unnecessary filler words, preserve context-relevant words
-    useless_words = ["actually", "basically", "just", "like", "I mean", "you know", "um", "uh", "well"]
-    
-    # Create a more targeted regex that doesn't remove words that might be part of the actual request
-    cleaned = prompt
-    for word in useless_words:
-        # Use word boundaries and be more careful about removal
-        pattern = r'\b' + re.escape(word) + r'\b'
-        cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
+    cleaned = filler_pattern.sub('', prompt)
     
-    # Clean up extra whitespace and punctuation
-    cleaned = re.sub(r'\s+', ' ', cleaned)  # Multiple spaces to single space
-    cleaned = re.sub(r'\s*,\s*', ', ', cleaned)  # Clean up comma spacing
-    cleaned = re.sub(r'\s*\.\s*', '. ', cleaned)  # Clean up period spacing
-    cleaned = re.sub(r'^\s*[,.\s]+', '', cleaned)  # Remove leading separators
-    cleaned = re.sub(r'[,.\s]+\s*$', '', cleaned)  # Remove trailing separators
+    # Clean up extra whitespace and punctuation in a single pass
+    cleaned = separator_run_pattern.sub(normalize_separators, cleaned)
     
-    return cleaned.strip()
+    # Remove leading and trailing separators
+    return cleaned.strip(' ,.')
 
 def apply_strategy_simulated(user_prompt: str, context: str = "general"):
     """Simulated strategy application with context awareness"""
@@ -63,131 +114,8 @@ def apply_strategy_simulated(user_prompt: str, context: str = "general"):
     # Enhanced optimization logic based on context with world-class image and video generation
     if context == "rephrase":
         # Simulate grammar correction and text optimization
-        corrected_text = user_prompt
-        # Fix common spelling mistakes
-        corrections = {
-            "recieve": "receive",
-            "messege": "message",
-            "definately": "definitely",
-            "occured": "occurred",
-            "begining": "beginning",
-            "accomodate": "accommodate",
-            "requirments": "requirements",
-            "maintanence": "maintenance",
-            "cruicial": "crucial",
-            "sucess": "success",
-            "importent": "important",
-            "reqyouirements": "requirements",
-            "ensyoyoure": "ensure",
-            "cryoucial": "crucial",
-            "syouccess": "success",
-            "calender": "calendar",
-            "cemetary": "cemetery",
-            "collegue": "colleague",
-            "concious": "conscious",
-            "embarass": "embarrass",
-            "enviroment": "environment",
-            "existance": "existence",
-            "foriegn": "foreign",
-            "fourty": "forty",
-            "freind": "friend",
-            "garentee": "guarantee",
-            "goverment": "government",
-            "harrass": "harass",
-            "idiosyncracy": "idiosyncrasy",
-            "immediatly": "immediately",
-            "independant": "independent",
-            "knowlege": "knowledge",
-            "liase": "liaise",
-            "liason": "liaison",
-            "neccessary": "necessary",
-            "occassion": "occasion",
-            "occassionally": "occasionally",
-            "occurence": "occurrence",
-            "pavillion": "pavilion",
-            "persistant": "persistent",
-            "posession": "possession",
-            "prefered": "preferred",
-            "priviledge": "privilege",
-            "probaly": "probably",
-            "proffesional": "professional",
-            "promiss": "promise",
-            "pronounciation": "pronunciation",
-            "prufe": "proof",
-            "pursuade": "persuade",
-            "quater": "quarter",
-            "questionaire": "questionnaire",
-            "reccomend": "recommend",
-            "rediculous": "ridiculous",
-            "refered": "referred",
-            "refering": "referring",
-            "religous": "religious",
-            "rember": "remember",
-            "resistence": "resistance",
-            "responce": "response",
-            "responcibility": "responsibility",
-            "rythm": "rhythm",
-            "sence": "sense",
-            "seperate": "separate",
-            "sieze": "seize",
-            "similiar": "similar",
-            "sincerly": "sincerely",
-            "speach": "speech",
-            "sucessful": "successful",
-            "suprise": "surprise",
-            "tatoo": "tattoo",
-            "tendancy": "tendency",
-            "therefor": "therefore",
-            "threshhold": "threshold",
-            "tommorow": "tomorrow",
-            "tounge": "tongue",
-            "truely": "truly",
-            "unfortunatly": "unfortunately",
-            "untill": "until",
-            "wierd": "weird",
-            "whereever": "wherever",
-            "wich": "which",
-            "womens": "women's",
-            "wonderfull": "wonderful",
-            "writeing": "writing"
-        }
-        
-        for wrong, right in corrections.items():
-            corrected_text = corrected_text.replace(wrong, right)
-            corrected_text = corrected_text.replace(wrong.capitalize(), right.capitalize())
-        
-        # Improve grammar and structure
-        if "i " in corrected_text.lower():
-            corrected_text = corrected_text.replace("i ", "I ")
-        
-        # Fix common abbreviations and informal language
-        informal_corrections = {
-            " ur ": " your ",
-            " u ": " you ",
-            " its ": " it's ",
-            " cant ": " can't ",
-            " dont ": " don't ",
-            " wont ": " won't ",
-            " wouldnt ": " wouldn't ",
-            " couldnt ": " couldn't ",
-            " shouldnt ": " shouldn't ",
-            " havent ": " haven't ",
-            " hasnt ": " hasn't ",
-            " hadnt ": " hadn't ",
-            " isnt ": " isn't ",
-            " arent ": " aren't ",
-            " wasnt ": " wasn't ",
-            " werent ": " weren't "
-        }
-        
-        for informal, formal in informal_corrections.items():
-            corrected_text = corrected_text.replace(informal, formal)
-            corrected_text = corrected_text.replace(informal.capitalize(), formal.capitalize())
-        
-        # Remove filler words
-        filler_words = ["just", "basically", "actually", "like", "you know", "I mean"]
-        for word in filler_words:
-            corrected_text = corrected_text.replace(word, "").replace(word.capitalize(), "")
+        # Spelling, informal language and filler words are fixed in one pass over the text
+        corrected_text = rephrase_corrector.correct(user_prompt)
         
         # Clean up extra spaces and punctuation
         corrected_text = re.sub(r'\s+', ' ', corrected_text)
@@ -253,13 +181,14 @@ def apply_strategy_simulated(user_prompt: str, context: str = "general"):
         
         # Structured Prompting: Subject + Details + Style + Technical Specifications + Negative Prompts
         # Analyze user intent and create comprehensive, professional-grade prompt
-        if "portrait" in corrected_prompt.lower() or "person" in corrected_prompt.lower() or "face" in corrected_prompt.lower() or "headshot" in corrected_prompt.lower():
+        style = classify_style(context, corrected_prompt)
+        if style == "portrait":
             final_prompt = f"Professional portrait photography masterpiece: {corrected_prompt}, shot with a Canon EOS R5, 85mm f/1.4 GM lens, shallow depth of field (f/1.4), studio lighting with soft key light, rim lighting, and hair light, high-resolution 8K quality, cinematic composition with rule of thirds, professional color grading with skin tone optimization, sharp focus on eyes with natural catch lights, natural skin texture preservation, professional headshot style, neutral background with subtle depth, corporate photography aesthetic, 4:5 aspect ratio, professional retouching, commercial photography quality, professional photography standards -- Negative prompt: blurry, low quality, distorted, extra fingers, bad anatomy, watermark, text, logo, oversaturated, underexposed, noise, grain, artifacts, compression"
-        elif "landscape" in corrected_prompt.lower() or "nature" in corrected_prompt.lower() or "outdoor" in corrected_prompt.lower() or "sunset" in corrected_prompt.lower() or "mountains" in corrected_prompt.lower():
+        elif style == "landscape":
             final_prompt = f"Stunning landscape photography masterpiece: {corrected_prompt}, captured with a Sony A7R IV, 16-35mm f/2.8 GM lens, golden hour lighting with dramatic sky, foreground interest with leading lines composition, HDR processing for maximum dynamic range, vibrant natural colors with professional color grading, ultra-wide perspective for environmental storytelling, weather atmosphere enhancement, seasonal color optimization, natural texture preservation, 16:9 cinematic aspect ratio, National Geographic quality, professional nature photography standards -- Negative prompt: blurry, low quality, distorted, oversaturated, underexposed, noise, grain, artifacts, compression, unrealistic colors, artificial lighting, poor composition"
-        elif "abstract" in corrected_prompt.lower() or "art" in corrected_prompt.lower() or "creative" in corrected_prompt.lower() or "painting" in corrected_prompt.lower():
+        elif style == "abstract":
             final_prompt = f"Abstract artistic masterpiece: {corrected_prompt}, digital art with high-resolution 8K quality, vibrant color palette with professional color theory, dynamic composition with visual hierarchy, artistic lighting with creative effects, creative textures and materials, modern art style with contemporary aesthetics, gallery quality with professional finish, professional digital painting techniques, artistic expression with visual impact, professional art direction, museum-quality finish, creative lighting effects, artistic color harmony, professional digital art standards -- Negative prompt: blurry, low quality, distorted, oversaturated, underexposed, noise, grain, artifacts, compression, amateur, childish, unprofessional"
-        elif "product" in corrected_prompt.lower() or "luxury" in corrected_prompt.lower() or "watch" in corrected_prompt.lower() or "jewelry" in corrected_prompt.lower():
+        elif style == "product":
             final_prompt = f"Professional product photography masterpiece: {corrected_prompt}, shot with professional camera equipment (Canon EOS R5), studio-quality lighting with three-point lighting system, cinematic composition with professional framing, high-resolution 8K quality, professional color grading with product optimization, sharp focus with depth of field control, artistic style with commercial appeal, professional photography standards, commercial quality with market appeal, visual storytelling with product narrative, professional image composition, artistic direction with brand alignment, technical excellence, professional finish, gallery-worthy quality, commercial photography standards -- Negative prompt: blurry, low quality, distorted, oversaturated, underexposed, noise, grain, artifacts, compression, amateur, unprofessional, poor lighting, bad composition"
         else:
             final_prompt = f"Professional high-quality image masterpiece: {corrected_prompt}, shot with professional camera equipment (Canon EOS R5), studio-quality lighting with professional three-point system, cinematic composition with professional framing, high-resolution 8K quality, professional color grading with visual optimization, sharp focus with depth of field control, artistic style with professional appeal, professional photography standards, commercial quality with market appeal, visual storytelling with narrative elements, professional image composition, artistic direction with creative vision, technical excellence with professional standards, professional finish with quality assurance, gallery-worthy quality with artistic merit, professional photography standards -- Negative prompt: blurry, low quality, distorted, oversaturated, underexposed, noise, grain, artifacts, compression, amateur, unprofessional, poor lighting, bad composition"
@@ -313,11 +242,12 @@ def apply_strategy_simulated(user_prompt: str, context: str = "general"):
         
         # Structured Prompting: Subject + Motion + Style + Technical Specifications + Negative Prompts
         # Analyze user intent and create comprehensive, professional-grade video prompt
-        if "action" in corrected_prompt.lower() or "movement" in corrected_prompt.lower() or "dynamic" in corrected_prompt.lower():
+        style = classify_style(context, corrected_prompt)
+        if style == "action":
             final_prompt = f"Dynamic action video masterpiece: {corrected_prompt}, captured with professional cinema cameras (RED Komodo 6K), smooth motion tracking, dynamic camera movements with gimbal stabilization, cinematic composition with rule of thirds, professional lighting with dramatic shadows, high frame rate (60fps) for smooth motion, professional color grading with cinematic LUTs, dynamic scene transitions, engaging visual storytelling, professional cinematography standards, commercial quality with market appeal, visual effects integration, professional video composition, artistic direction with creative vision, technical excellence with professional standards, professional finish with quality assurance, cinema-worthy quality with artistic merit, professional video production standards -- Negative prompt: choppy motion, low quality, distorted, oversaturated, underexposed, noise, grain, artifacts, compression, amateur, unprofessional, poor lighting, bad composition, shaky camera, blurry frames"
-        elif "nature" in corrected_prompt.lower() or "landscape" in corrected_prompt.lower() or "outdoor" in corrected_prompt.lower():
+        elif style == "nature":
             final_prompt = f"Stunning nature video masterpiece: {corrected_prompt}, captured with professional cinema cameras (Sony FX6), smooth panning and tilting movements, cinematic composition with leading lines, natural lighting with golden hour enhancement, time-lapse techniques for environmental storytelling, high dynamic range processing, professional color grading with natural color palette, smooth scene transitions, engaging visual narrative, professional cinematography standards, documentary quality with educational appeal, visual effects enhancement, professional video composition, artistic direction with environmental focus, technical excellence with professional standards, professional finish with quality assurance, documentary-worthy quality with artistic merit, professional nature video production standards -- Negative prompt: choppy motion, low quality, distorted, oversaturated, underexposed, noise, grain, artifacts, compression, amateur, unprofessional, poor lighting, bad composition, shaky camera, blurry frames, artificial movement"
-        elif "product" in corrected_prompt.lower() or "commercial" in corrected_prompt.lower() or "advertising" in corrected_prompt.lower():
+        elif style == "commercial":
             final_prompt = f"Professional commercial video masterpiece: {corrected_prompt}, shot with professional cinema cameras (Canon C300 Mark III), smooth product reveal movements, cinematic composition with professional framing, studio-quality lighting with three-point system, high frame rate (30fps) for smooth playback, professional color grading with brand color optimization, smooth scene transitions, engaging product narrative, professional cinematography standards, commercial quality with market appeal, visual effects integration, professional video composition, artistic direction with brand alignment, technical excellence with professional standards, professional finish with quality assurance, commercial-worthy quality with artistic merit, professional commercial video production standards -- Negative prompt: choppy motion, low quality, distorted, oversaturated, underexposed, noise, grain, artifacts, compression, amateur, unprofessional, poor lighting, bad composition, shaky camera, blurry frames, unprofessional movement"
         else:
             final_prompt = f"Professional high-quality video masterpiece: {corrected_prompt}, shot with professional cinema cameras (RED Komodo 6K), smooth motion with professional stabilization, cinematic composition with professional framing, studio-quality lighting with professional three-point system, high frame rate (30fps) for smooth playback, professional color grading with visual optimization, smooth scene transitions, engaging visual narrative, professional cinematography standards, commercial quality with market appeal, visual effects integration, professional video composition, artistic direction with creative vision, technical excellence with professional standards, professional finish with quality assurance, cinema-worthy quality with artistic merit, professional video production standards -- Negative prompt: choppy motion, low quality, distorted, oversaturated, underexposed, noise, grain, artifacts, compression, amateur, unprofessional, poor lighting, bad composition, shaky camera, blurry frames, unprofessional movement"
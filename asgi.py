@@ -0,0 +1,591 @@
+"""
+ASGI entry point for the prompt optimizer.
+
+Serves the same /api routes as the Flask app in api/optimize.py, but awaits
+the OpenAI and retrieval calls instead of parking a worker thread on them,
+so one process can hold hundreds of in-flight optimizations.
+
+Run with: uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+
+import optimize
+from _admission import Overloaded, client_key
+from _jobs import JobQueueFull
+from _resilience import CircuitOpenError
+from _routing import LOCAL
+from optimize import (
+    RephraseStreamCleaner,
+    admission_gate,
+    build_prepared,
+    build_result,
+    classify_strategy,
+    clean_prompt,
+    clean_rephrase_response,
+    context_strategies,
+    docs,
+    get_fallback_prompt,
+    get_health,
+    get_readiness,
+    read_batch_item,
+    read_batch_items,
+    get_style_candidates,
+    get_llm_deadline,
+    job_queue,
+    job_wait_seconds,
+    logger,
+    llm_guard,
+    lookup_cached_response,
+    needs_prompt_vector,
+    optimize_locally,
+    rate_limiter,
+    route_request,
+    set_path,
+    shed_llm_call,
+    stage,
+    store_response,
+    token_report,
+    tracer,
+)
+
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-headers", b"*"),
+    (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+]
+
+
+async def aembed_prompt(cleaned_prompt: str):
+    """Embed a cleaned prompt without blocking the event loop"""
+    embeddings_instance = optimize.get_embeddings()
+    if embeddings_instance is None:
+        return None
+    try:
+        return await embeddings_instance.aembed_query(cleaned_prompt)
+    except Exception as e:
+        logger.error(f"Prompt embedding failed: {e}")
+        return None
+
+
+async def aget_strategy_for_context(context: str, cleaned_prompt: str, prompt_vector=None, classified=None):
+    """Async variant of get_strategy_for_context"""
+    style_strategy, confident = classified or classify_strategy(context, cleaned_prompt)
+    if confident:
+        return style_strategy
+
+    # Never blocks: returns None while the index is still warming up
+    index = optimize.get_strategy_index()
+    if index:
+        try:
+            results = await index.asearch(cleaned_prompt, k=1, vector=prompt_vector,
+                                          candidates=get_style_candidates(context))
+            if results:
+                return results[0]
+        except Exception as e:
+            logger.error(f"Strategy retrieval failed: {e}")
+
+    return style_strategy or context_strategies.get(context, context_strategies["general"])
+
+
+async def aprepare_optimization(user_prompt: str, context: str) -> dict:
+    """Async variant of prepare_optimization"""
+    with stage("clean"):
+        cleaned_prompt = clean_prompt(user_prompt, context)
+    with stage("retrieve"):
+        classified = classify_strategy(context, cleaned_prompt)
+    prompt_vector = None
+    if needs_prompt_vector(context, classified[1]):
+        with stage("embed"):
+            prompt_vector = await aembed_prompt(cleaned_prompt)
+    with stage("retrieve"):
+        strategy = await aget_strategy_for_context(context, cleaned_prompt, prompt_vector, classified)
+    return build_prepared(context, cleaned_prompt, prompt_vector, strategy)
+
+
+async def aapply_strategy(user_prompt: str, context: str = "general", timings: bool = False):
+    """Async variant of apply_strategy"""
+    trace = tracer.trace(context, debug=timings, prompt=user_prompt)
+    with trace:
+        if route_request(user_prompt, context) == LOCAL:
+            result = optimize_locally(user_prompt, context)
+        else:
+            result = await acomplete_optimization(user_prompt, context)
+    trace.finish()
+    if timings:
+        result["timings"] = trace.timings()
+    return result
+
+
+def cache_on_disk() -> bool:
+    """Whether the response cache has a SQLite tier, whose reads and writes must stay off the event loop"""
+    return bool(optimize.response_cache) and optimize.response_cache.shared
+
+
+async def alookup_cached_response(prepared: dict):
+    if cache_on_disk():
+        return await asyncio.to_thread(lookup_cached_response, prepared)
+    return lookup_cached_response(prepared)
+
+
+async def astore_response(prepared: dict, response: str):
+    if cache_on_disk():
+        await asyncio.to_thread(store_response, prepared, response)
+    else:
+        store_response(prepared, response)
+
+
+async def acomplete_optimization(user_prompt: str, context: str):
+    """Async variant of prepare_optimization followed by complete_optimization"""
+    prepared = await aprepare_optimization(user_prompt, context)
+    response = await alookup_cached_response(prepared)
+    source = "cache"
+    if response is not None:
+        set_path("cache")
+
+    if response is None:
+        source = "fallback"
+        with stage("llm"):
+            if optimize.request_coalescer:
+                response = await optimize.request_coalescer.arun(
+                    prepared["cache_key"],
+                    lambda: acall_llm(prepared),
+                    recheck=lambda: lookup_cached_response(prepared),
+                    timeout=get_llm_deadline(prepared["context"]) + 1
+                )
+            else:
+                response = await acall_llm(prepared)
+        if response:
+            source = "llm"
+            set_path("llm")
+
+    return dict(build_result(user_prompt, prepared, response), source=source)
+
+
+async def acall_llm(prepared: dict):
+    """Async variant of call_llm"""
+    llm = optimize.get_llm(prepared["model"])
+    if llm is None:
+        return None
+    deadline = get_llm_deadline(prepared["context"])
+    started = time.perf_counter()
+    if not await admission_gate.aacquire(deadline):
+        return shed_llm_call()
+    deadline -= time.perf_counter() - started
+    called = time.perf_counter()
+    message = None
+    try:
+        message = await llm_guard.acall(
+            prepared["model"],
+            lambda: llm.ainvoke(prepared["template"], timeout=deadline),
+            deadline
+        )
+    except CircuitOpenError:
+        return None
+    except Exception as e:
+        logger.error(f"LLM call failed: {e}")
+        return None
+    finally:
+        admission_gate.release(time.perf_counter() - called if message is not None else None)
+    response = message.content
+    if response:
+        await astore_response(prepared, response)
+    return response
+
+
+async def astream_strategy(user_prompt: str, context: str = "general", timings: bool = False):
+    """Async variant of stream_strategy"""
+    started = time.perf_counter()
+    first_token_at = None
+    trace = tracer.trace(context, debug=timings, prompt=user_prompt)
+    with trace:
+        if route_request(user_prompt, context) == LOCAL:
+            local_result = optimize_locally(user_prompt, context)
+            prepared = response = None
+        else:
+            local_result = None
+            prepared = await aprepare_optimization(user_prompt, context)
+            response = await alookup_cached_response(prepared)
+    source = "cache"
+
+    output = ""
+    llm_shed = False
+    if local_result is not None:
+        source = "local"
+        first_token_at = time.perf_counter()
+        yield "token", local_result["optimized"]
+    elif response is not None:
+        first_token_at = time.perf_counter()
+        output = clean_rephrase_response(response) if context == "rephrase" else response
+        yield "token", output
+    else:
+        llm = optimize.get_llm(prepared["model"])
+        chunks = []
+        raw = []
+        failed = False
+        admitted = llm is not None and await admission_gate.aacquire(get_llm_deadline(context))
+        llm_shed = llm is not None and not admitted
+        if admitted and llm_guard.admit(prepared["model"]):
+            source = "llm"
+            llm_started = time.perf_counter()
+            cleaner = RephraseStreamCleaner() if context == "rephrase" else None
+            try:
+                async for chunk in llm.astream(prepared["template"]):
+                    if chunk.content:
+                        raw.append(chunk.content)
+                    piece = cleaner.feed(chunk.content) if cleaner else chunk.content
+                    if piece:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        chunks.append(piece)
+                        yield "token", piece
+                piece = cleaner.finish() if cleaner else ""
+                if piece:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    chunks.append(piece)
+                    yield "token", piece
+            except Exception as e:
+                failed = True
+                logger.error(f"LLM stream failed: {e}")
+                if chunks:
+                    yield "error", {"error": "LLM stream interrupted"}
+            finally:
+                llm_guard.record(prepared["model"], not failed)
+                admission_gate.release(time.perf_counter() - llm_started if chunks and not failed else None)
+            trace.add("llm", time.perf_counter() - llm_started)
+        elif admitted:
+            admission_gate.release()
+        if chunks and not failed:
+            output = "".join(chunks)
+            await astore_response(prepared, "".join(raw))
+        elif chunks:
+            source = "interrupted"
+            output = "".join(chunks)
+        else:
+            source = "fallback"
+            first_token_at = time.perf_counter()
+            yield "token", get_fallback_prompt(context, prepared["cleaned_prompt"])
+
+    finished = time.perf_counter()
+    trace.path = "shed" if llm_shed else source
+    trace.finish()
+    yield "done", {
+        "original": user_prompt,
+        "strategy": local_result["strategy"] if local_result else prepared["strategy"],
+        "source": source,
+        "tokens": local_result["tokens"] if local_result else token_report(prepared, output),
+        "timings": {
+            **(trace.timings() if timings else {}),
+            "first_token_ms": round((first_token_at - started) * 1000, 2),
+            "total_ms": round((finished - started) * 1000, 2),
+        },
+    }
+
+
+async def read_body(receive) -> bytes:
+    body = bytearray()
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return bytes(body)
+
+
+async def send_json(send, payload, status: int = 200, headers=()):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+                   + CORS_HEADERS + list(headers),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_event_stream(send, events):
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ] + CORS_HEADERS,
+    })
+    try:
+        async for event, payload in events:
+            if event == "token":
+                payload = {"text": payload}
+            data = f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+            await send({"type": "http.response.body", "body": data.encode("utf-8"), "more_body": True})
+    except Exception as e:
+        logger.error(f"Error streaming prompt: {e}")
+        data = f"event: error\ndata: {json.dumps({'error': 'Failed to optimize prompt'})}\n\n"
+        await send({"type": "http.response.body", "body": data.encode("utf-8"), "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def send_too_many_requests(send, message: str, retry_after: float):
+    await send_json(send, {"error": message, "retry_after": round(retry_after, 2)}, 429,
+                    [(b"retry-after", str(math.ceil(retry_after)).encode())])
+
+
+async def check_rate_limit(scope, send, cost: int = 1) -> bool:
+    """Whether the request may proceed; sends a 429 when its client is over the rate limit"""
+    if rate_limiter is None:
+        return True
+    if cost > rate_limiter.burst:
+        await send_json(send, {"error": f"At most {int(rate_limiter.burst)} items per request under the rate limit"}, 413)
+        return False
+    headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+    client = scope.get("client")
+    key = client_key(headers, client[0] if client else None, optimize.rate_limit_trust_proxy)
+    retry_after = await rate_limiter.acheck(key, cost)
+    if not retry_after:
+        return True
+    await send_too_many_requests(send, "Rate limit exceeded", retry_after)
+    return False
+
+
+def wants_timings(scope) -> bool:
+    """Whether the caller asked for per-stage timings with the X-Debug-Timings header"""
+    return dict(scope["headers"]).get(b"x-debug-timings", b"").lower() in (b"1", b"true", b"yes")
+
+
+async def parse_optimize_request(receive, send):
+    """Return (prompt, context) from the request body, or None after sending an error"""
+    try:
+        data = json.loads(await read_body(receive) or b"{}")
+    except ValueError:
+        await send_json(send, {"error": "Invalid JSON body"}, 400)
+        return None
+    if not isinstance(data, dict):
+        data = {}
+    user_prompt = data.get("prompt", "")
+    context = data.get("context", "general")
+
+    if not user_prompt:
+        await send_json(send, {"error": "Prompt is required"}, 400)
+        return None
+
+    if context not in context_strategies:
+        context = "general"
+    return user_prompt, context
+
+
+async def health_check(scope, receive, send):
+    await send_json(send, get_health())
+
+
+async def readiness_check(scope, receive, send):
+    payload = get_readiness()
+    await send_json(send, payload, 200 if payload["ready"] else 503)
+
+
+async def metrics(scope, receive, send):
+    body = tracer.render().encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/plain; version=0.0.4"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def get_strategies(scope, receive, send):
+    await send_json(send, {"contexts": list(context_strategies.keys()), "strategies": docs})
+
+
+async def optimize_prompt(scope, receive, send):
+    parsed = await parse_optimize_request(receive, send)
+    if parsed is None or not await check_rate_limit(scope, send):
+        return
+    accept = dict(scope["headers"]).get(b"accept", b"")
+    if b"text/event-stream" in accept:
+        await send_event_stream(send, astream_strategy(*parsed, timings=wants_timings(scope)))
+        return
+    try:
+        result = await aapply_strategy(*parsed, timings=wants_timings(scope))
+    except Overloaded as e:
+        await send_too_many_requests(send, "Server busy, retry shortly", e.retry_after)
+        return
+    except Exception as e:
+        logger.error(f"Error optimizing prompt: {e}")
+        await send_json(send, {"error": "Failed to optimize prompt"}, 500)
+        return
+    await send_json(send, result)
+
+
+async def optimize_prompt_stream(scope, receive, send):
+    parsed = await parse_optimize_request(receive, send)
+    if parsed is not None and await check_rate_limit(scope, send):
+        await send_event_stream(send, astream_strategy(*parsed, timings=wants_timings(scope)))
+
+
+async def aoptimize_batch_item(index: int, item, semaphore):
+    """One batch result: the usual result with its index, or an error for this item alone"""
+    parsed, error = read_batch_item(item)
+    if error:
+        return {"index": index, "error": error}
+    try:
+        async with semaphore:
+            return dict(await aapply_strategy(*parsed), index=index)
+    except Overloaded as e:
+        return {"index": index, "error": "Server busy, retry shortly", "retry_after": round(e.retry_after, 2)}
+    except Exception as e:
+        logger.error(f"Error optimizing batch item {index}: {e}")
+        return {"index": index, "error": "Failed to optimize prompt"}
+
+
+async def optimize_prompt_batch(scope, receive, send):
+    """Optimize a list of {prompt, context} items concurrently, BATCH_CONCURRENCY at a time"""
+    try:
+        data = json.loads(await read_body(receive) or b"{}")
+    except ValueError:
+        await send_json(send, {"error": "Invalid JSON body"}, 400)
+        return
+    items, error = read_batch_items(data)
+    if error:
+        await send_json(send, {"error": error}, 400)
+        return
+    if not await check_rate_limit(scope, send, len(items)):
+        return
+
+    semaphore = asyncio.Semaphore(optimize.batch_concurrency)
+    tasks = [asyncio.ensure_future(aoptimize_batch_item(i, item, semaphore)) for i, item in enumerate(items)]
+    if not (data.get("stream") or b"application/x-ndjson" in dict(scope["headers"]).get(b"accept", b"")):
+        await send_json(send, {"results": await asyncio.gather(*tasks)})
+        return
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/x-ndjson")] + CORS_HEADERS,
+    })
+    try:
+        for task in asyncio.as_completed(tasks):
+            line = json.dumps(await task) + "\n"
+            await send({"type": "http.response.body", "body": line.encode("utf-8"), "more_body": True})
+    finally:
+        for task in tasks:
+            task.cancel()
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def submit_optimization_job(scope, receive, send):
+    if job_queue is None:
+        await send_json(send, {"error": "Job mode is disabled"}, 404)
+        return
+    parsed = await parse_optimize_request(receive, send)
+    if parsed is None or not await check_rate_limit(scope, send):
+        return
+    try:
+        # The job store may be a SQLite file
+        job = await asyncio.to_thread(job_queue.submit, *parsed)
+    except JobQueueFull:
+        await send_json(send, {"error": "Job queue is full, retry shortly"}, 503)
+        return
+    url = f"/api/optimize/jobs/{job['id']}"
+    await send_json(send, dict(job, url=url), 202, [(b"location", url.encode())])
+
+
+async def get_optimization_job(scope, receive, send):
+    if job_queue is None:
+        await send_json(send, {"error": "Job mode is disabled"}, 404)
+        return
+    job_id = scope["path"].rstrip("/").rsplit("/", 1)[1]
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    job = await job_queue.await_job(job_id, job_wait_seconds(query.get("wait", [None])[0]))
+    if job is None:
+        await send_json(send, {"error": "Job not found or expired"}, 404)
+        return
+    await send_json(send, job)
+
+
+routes = {
+    ("GET", "/api/health"): health_check,
+    ("GET", "/api/ready"): readiness_check,
+    ("GET", "/api/metrics"): metrics,
+    ("GET", "/api/strategies"): get_strategies,
+    ("POST", "/api/optimize"): optimize_prompt,
+    ("POST", "/api/optimize/stream"): optimize_prompt_stream,
+    ("POST", "/api/optimize/batch"): optimize_prompt_batch,
+    ("POST", "/api/optimize/jobs"): submit_optimization_job,
+    ("GET", "/api/optimize/jobs/"): get_optimization_job,
+}
+
+
+def find_route(method: str, path: str):
+    # Job ids are the only path parameter
+    if path.startswith("/api/optimize/jobs/"):
+        path = "/api/optimize/jobs/"
+    return routes.get((method, path))
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Start warming the strategy index; requests fall back until it is ready
+            optimize.strategy_warmup.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI application"""
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    method = scope["method"]
+    path = scope["path"].rstrip("/") or "/"
+    if method == "OPTIONS":
+        await send({"type": "http.response.start", "status": 204, "headers": CORS_HEADERS})
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    handler = find_route(method, path)
+    if handler is None:
+        status = 405 if any(find_route(route_method, path) for route_method, _ in routes) else 404
+        await send_json(send, {"error": "Not found" if status == 404 else "Method not allowed"}, status)
+        return
+    await handler(scope, receive, send)
+
+
+# Probes and metrics stay answerable while a worker is saturated
+UNLIMITED_PATHS = frozenset(("/api/health", "/api/ready", "/api/metrics"))
+
+
+def limit_in_flight(inner, limit: int):
+    """Wrap an ASGI app to answer 503 while limit requests are already in flight in this process"""
+    in_flight = 0
+
+    async def limited(scope, receive, send):
+        nonlocal in_flight
+        if scope["type"] != "http" or scope["path"].rstrip("/") in UNLIMITED_PATHS:
+            await inner(scope, receive, send)
+            return
+        if in_flight >= limit:
+            await send_json(send, {"error": "Server busy, retry shortly"}, 503)
+            return
+        in_flight += 1
+        try:
+            await inner(scope, receive, send)
+        finally:
+            in_flight -= 1
+
+    return limited
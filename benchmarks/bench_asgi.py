@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Load test comparing the Flask (WSGI) and ASGI optimizer apps.
+
+Starts the mock OpenAI server, the Flask app under gunicorn (one worker,
+a fixed thread pool) and the ASGI app under uvicorn (one worker), then
+drives POST /api/optimize at 50, 200 and 1000 concurrent clients and
+prints requests/sec and latency percentiles for each.
+
+Usage: python benchmarks/bench_asgi.py [--duration 10] [--threads 8] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, "benchmarks")
+
+MOCK_PORT = 8901
+WSGI_PORT = 8902
+ASGI_PORT = 8903
+CONCURRENCY_LEVELS = [50, 200, 1000]
+
+PROMPTS = [
+    ("general", "Explain machine learning models"),
+    ("rephrase", "i recieve ur messege and will definately respond"),
+    ("image_generation", "A futuristic city with flying cars and neon lights"),
+    ("cursor_code_optimizer", "Add pagination to the orders API and fix the broken sort"),
+    ("technical", "How does TCP congestion control work"),
+]
+
+
+def server_env(**extra):
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "sk-mock",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{MOCK_PORT}/v1",
+        "OPENAI_MAX_CONNECTIONS": "2000",
+        "OPENAI_MAX_KEEPALIVE": "2000",
+        # Every request should reach the (mock) LLM
+        "PROMPT_CACHE_ENABLED": "0",
+        "SEMANTIC_CACHE_ENABLED": "0",
+        "STRATEGY_SNAPSHOT_PATH": "",
+    })
+    env.update(extra)
+    return env
+
+
+def start(cmd, cwd, env):
+    return subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_up(url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def drive(url: str, concurrency: int, duration: float, prompts=PROMPTS, weights=None,
+                duplicate_rate: float = 0.0) -> dict:
+    """Run closed-loop clients against url for duration seconds
+
+    prompts are (context, prompt) pairs drawn with the given weights. A random
+    suffix makes every request unique unless it falls in duplicate_rate, so
+    caches only see the repeats a real mix would have.
+    """
+    latencies = []
+    by_context = {}
+    errors = {}
+    stop_at = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        async def worker(seed: int):
+            rng = random.Random(seed)
+            while time.perf_counter() < stop_at:
+                context, prompt = rng.choices(prompts, weights)[0]
+                if rng.random() >= duplicate_rate:
+                    prompt = f"{prompt} #{rng.random()}"
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, json={"prompt": prompt, "context": context})
+                    error = None if response.status_code == 200 else str(response.status_code)
+                except httpx.HTTPError as e:
+                    error = type(e).__name__
+                if error:
+                    errors[error] = errors.get(error, 0) + 1
+                    continue
+                latency = time.perf_counter() - started
+                latencies.append(latency)
+                by_context.setdefault(context, []).append(latency)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    failed = sum(errors.values())
+    return dict(
+        latency_summary(latencies),
+        concurrency=concurrency,
+        errors=failed,
+        error_rate=round(failed / (len(latencies) + failed), 4) if latencies or failed else 0.0,
+        errors_by_type=errors,
+        rps=round(len(latencies) / elapsed, 2),
+        by_context={context: latency_summary(values) for context, values in sorted(by_context.items())},
+    )
+
+
+def latency_summary(latencies: list) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per concurrency level")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads for the Flask app")
+    parser.add_argument("--contexts", help="comma-separated contexts to send (default: all)")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+    prompts = [p for p in PROMPTS if not args.contexts or p[0] in args.contexts.split(",")]
+
+    processes = [
+        start([sys.executable, "-m", "uvicorn", "mock_openai:app", "--port", str(MOCK_PORT), "--log-level", "warning"],
+              BENCH_DIR, dict(os.environ)),
+        start([sys.executable, "-m", "gunicorn", "optimize:app", "--chdir", os.path.join(ROOT, "api"),
+               "-w", "1", "--threads", str(args.threads), "-b", f"127.0.0.1:{WSGI_PORT}"],
+              ROOT, server_env()),
+        start([sys.executable, "-m", "uvicorn", "asgi:app", "--port", str(ASGI_PORT), "--log-level", "warning"],
+              ROOT, server_env()),
+    ]
+    results = {"wsgi": [], "asgi": []}
+    try:
+        for port in (WSGI_PORT, ASGI_PORT):
+            wait_until_up(f"http://127.0.0.1:{port}/api/health")
+        for name, port in (("wsgi", WSGI_PORT), ("asgi", ASGI_PORT)):
+            url = f"http://127.0.0.1:{port}/api/optimize"
+            # Warm the strategy index and connection pools before measuring
+            asyncio.run(drive(url, 5, 1, prompts))
+            for concurrency in CONCURRENCY_LEVELS:
+                results[name].append(asyncio.run(drive(url, concurrency, args.duration, prompts)))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"⚡ /api/optimize with mock LLM, {args.duration:g}s per level")
+    print(f"{'server':>6} {'clients':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, rows in results.items():
+        for r in rows:
+            print(f"{name:>6} {r['concurrency']:>8} {r['rps']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for clean_prompt on 1 KB - 100 KB prompts.
+
+Compares the per-word re.sub loop clean_prompt used to run with the
+precompiled PromptNormalizer and prints throughput in MB/s.
+Usage: python benchmarks/bench_clean_prompt.py [--json]
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from _normalize import DEFAULT_FILLER_WORDS, PromptNormalizer
+
+SIZES = [1_000, 10_000, 100_000]
+
+PROSE = "So I basically just want to, like, build a dashboard . you know , um, with charts and well filters"
+CODE = "def handler(event, context):\n    items = [x for x in event.get('items', []) if x]\n    return {'count': len(items)}\n"
+
+
+def legacy_clean_prompt(prompt: str) -> str:
+    """clean_prompt as it was before the single-pass normalizer"""
+    cleaned = prompt
+    for word in DEFAULT_FILLER_WORDS:
+        pattern = r'\b' + re.escape(word) + r'\b'
+        cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
+    cleaned = re.sub(r'\s+', ' ', cleaned)
+    cleaned = re.sub(r'\s*,\s*', ', ', cleaned)
+    cleaned = re.sub(r'\s*\.\s*', '. ', cleaned)
+    cleaned = re.sub(r'^\s*[,.\s]+', '', cleaned)
+    cleaned = re.sub(r'[,.\s]+\s*$', '', cleaned)
+    return cleaned.strip()
+
+
+def make_prompt(size: int, seed: int = 0) -> str:
+    """Mix of filler-heavy prose and pasted code, like cursor_code_optimizer input"""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        part = rng.choice([PROSE, CODE])
+        parts.append(part)
+        length += len(part) + 1
+    return "\n".join(parts)[:size]
+
+
+def measure(fn, text: str, min_time: float = 0.2):
+    """Return seconds per call, repeating until min_time has elapsed"""
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        fn(text)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / runs
+
+
+def run():
+    normalizer = PromptNormalizer()
+    results = []
+    for size in SIZES:
+        text = make_prompt(size)
+        assert legacy_clean_prompt(text) == normalizer.normalize(text)
+        legacy = measure(legacy_clean_prompt, text)
+        current = measure(normalizer.normalize, text)
+        results.append({
+            "size_bytes": size,
+            "legacy_ms": round(legacy * 1000, 4),
+            "normalizer_ms": round(current * 1000, 4),
+            "legacy_mb_s": round(size / legacy / 1e6, 2),
+            "normalizer_mb_s": round(size / current / 1e6, 2),
+            "speedup": round(legacy / current, 2),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    results = run()
+    if "--json" in sys.argv:
+        print(json.dumps(results, indent=2))
+    else:
+        print("🧹 clean_prompt throughput")
+        print(f"{'size':>10} {'legacy ms':>12} {'new ms':>10} {'legacy MB/s':>12} {'new MB/s':>10} {'speedup':>8}")
+        for r in results:
+            print(f"{r['size_bytes']:>10} {r['legacy_ms']:>12} {r['normalizer_ms']:>10} "
+                  f"{r['legacy_mb_s']:>12} {r['normalizer_mb_s']:>10} {r['speedup']:>7}x")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the rephrase correction engine on 10 KB - 1 MB documents.
+
+Compares the str.replace loops api_test.py used to run for every
+dictionary entry with the single-pass TextCorrector on typo-dense and
+mostly-clean documents, and prints throughput in MB/s plus how many of the
+legacy edits landed inside other words.
+Usage: python benchmarks/bench_corrections.py [--json]
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from _corrections import DEFAULT_SPELLING, TextCorrector
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+FILLER_WORDS = ["just", "basically", "actually", "like", "you know", "I mean"]
+
+LEGACY_INFORMAL = {
+    " ur ": " your ", " u ": " you ", " its ": " it's ", " cant ": " can't ", " dont ": " don't ",
+    " wont ": " won't ", " wouldnt ": " wouldn't ", " couldnt ": " couldn't ", " shouldnt ": " shouldn't ",
+    " havent ": " haven't ", " hasnt ": " hasn't ", " hadnt ": " hadn't ", " isnt ": " isn't ",
+    " arent ": " aren't ", " wasnt ": " wasn't ", " werent ": " weren't ",
+}
+
+SENTENCES = [
+    "i just wanted to say i recieve ur messege about the goverment calender",
+    "Basically we dont have the neccessary enviroment for the new sandwich shop",
+    "It is definately importent to seperate the requirments before the begining of the quater",
+    "you know the knowlege base wasnt updated untill tommorow, which is wierd",
+    "The independant collegue will reccomend a proffesional questionaire for success",
+    "Our team cant accomodate the maintanence window; I mean it occured twice",
+]
+
+# Already-correct prose; real documents are mostly this
+CLEAN_SENTENCES = [
+    "The quarterly report summarizes revenue, churn and hiring across every region",
+    "Please review the attached design document and leave comments by Friday",
+    "We migrated the billing service to the new cluster without downtime",
+    "Customer interviews point to onboarding as the largest source of friction",
+    "The release checklist covers database migrations, feature flags and rollback steps",
+]
+
+# Share of sentences drawn from SENTENCES in each document
+DENSITIES = {"dense": 1.0, "sparse": 0.1}
+
+
+def legacy_correct(text: str) -> str:
+    """The rephrase corrections as api_test.py ran them before TextCorrector"""
+    for wrong, right in DEFAULT_SPELLING.items():
+        text = text.replace(wrong, right)
+        text = text.replace(wrong.capitalize(), right.capitalize())
+    if "i " in text.lower():
+        text = text.replace("i ", "I ")
+    for informal, formal in LEGACY_INFORMAL.items():
+        text = text.replace(informal, formal)
+        text = text.replace(informal.capitalize(), formal.capitalize())
+    for word in FILLER_WORDS:
+        text = text.replace(word, "").replace(word.capitalize(), "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def make_document(size: int, density: float = 1.0, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        sentences = SENTENCES if rng.random() < density else CLEAN_SENTENCES
+        part = rng.choice(sentences) + rng.choice([". ", ", ", ".\n"])
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)[:size]
+
+
+def measure(fn, text: str, min_time: float = 0.2):
+    """Return seconds per call, repeating until min_time has elapsed"""
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        fn(text)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / runs
+
+
+def count_broken_words(text: str) -> int:
+    """Words the legacy loops rewrote mid-word, e.g. sandwich -> sandwhich"""
+    return sum(text.count(broken) for broken in ("sandwhich", "I m", "requirementss"))
+
+
+def run():
+    corrector = TextCorrector(filler_words=FILLER_WORDS)
+    results = []
+    for (name, density), size in [(d, size) for d in DENSITIES.items() for size in SIZES]:
+        text = make_document(size, density)
+        legacy = measure(legacy_correct, text)
+        current = measure(lambda t: re.sub(r"\s+", " ", corrector.correct(t)).strip(), text)
+        results.append({
+            "document": name,
+            "size_bytes": size,
+            "legacy_ms": round(legacy * 1000, 3),
+            "engine_ms": round(current * 1000, 3),
+            "legacy_mb_s": round(size / legacy / 1e6, 2),
+            "engine_mb_s": round(size / current / 1e6, 2),
+            "speedup": round(legacy / current, 2),
+            "legacy_broken_words": count_broken_words(legacy_correct(text)),
+            "engine_broken_words": count_broken_words(corrector.correct(text)),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    results = run()
+    if "--json" in sys.argv:
+        print(json.dumps(results, indent=2))
+    else:
+        print("🔤 rephrase correction throughput")
+        print(f"{'document':>8} {'size':>10} {'legacy ms':>11} {'engine ms':>10} {'legacy MB/s':>12} {'engine MB/s':>12} "
+              f"{'speedup':>8} {'broken (legacy/engine)':>23}")
+        for r in results:
+            print(f"{r['document']:>8} {r['size_bytes']:>10} {r['legacy_ms']:>11} {r['engine_ms']:>10} {r['legacy_mb_s']:>12} "
+                  f"{r['engine_mb_s']:>12} {r['speedup']:>7}x {r['legacy_broken_words']:>11}/{r['engine_broken_words']}")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Profile cold-start import time of the Flask app.
+
+Runs `python -X importtime` on a fresh interpreter that imports api/optimize.py
+and serves one GET /api/health, then reports the total import time, the
+slowest top-level imports and whether any of the heavy provider SDKs were
+loaded. Warm-up is disabled so only the import itself is measured.
+Usage: python benchmarks/bench_import_time.py [--top 15] [--json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(ROOT, "api")
+
+HEAVY_MODULES = ["langchain_openai", "langchain_pinecone", "langchain_core", "openai", "pinecone", "tiktoken"]
+
+PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import optimize
+imported = time.perf_counter()
+response = optimize.app.test_client().get("/api/health")
+finished = time.perf_counter()
+print(json.dumps({{
+    "status": response.status_code,
+    "import_ms": round((imported - started) * 1000, 1),
+    "first_health_ms": round((finished - imported) * 1000, 1),
+    "heavy_loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+def parse_importtime(stderr: str):
+    """Return [(module, self_us, cumulative_us, depth)] from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def profile() -> dict:
+    env = dict(os.environ, WARMUP_ON_START="0")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=API_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    rows = parse_importtime(completed.stderr)
+    position = next((i for i, r in enumerate(rows) if r[0] == "optimize"), None)
+    optimize_row = rows[position] if position is not None else None
+    # Children are reported before their parent; walk back to optimize's direct imports
+    direct = []
+    for row in reversed(rows[:position] if optimize_row else []):
+        if row[3] <= optimize_row[3]:
+            break
+        if row[3] == optimize_row[3] + 1:
+            direct.append(row)
+    result["importtime_ms"] = round(optimize_row[2] / 1000, 1) if optimize_row else None
+    result["modules_loaded"] = len(rows)
+    result["slowest_imports"] = [
+        {"module": name, "cumulative_ms": round(cumulative / 1000, 1)}
+        for name, _, cumulative, _ in sorted(direct, key=lambda r: r[2], reverse=True)
+    ]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="number of slow imports to list")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    result = profile()
+    result["slowest_imports"] = result["slowest_imports"][:args.top]
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print("🧊 Cold start: import optimize + first GET /api/health")
+    print(f"   import (wall):        {result['import_ms']} ms")
+    print(f"   import (importtime):  {result['importtime_ms']} ms across {result['modules_loaded']} modules")
+    print(f"   first /api/health:    {result['first_health_ms']} ms")
+    print(f"   heavy SDKs loaded:    {', '.join(result['heavy_loaded']) or 'none'}")
+    print("   slowest direct imports:")
+    for row in result["slowest_imports"]:
+        print(f"     {row['cumulative_ms']:>8} ms  {row['module']}")
+
+
+if __name__ == "__main__":
+    main()
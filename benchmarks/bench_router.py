@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Agreement and latency harness for the local/LLM tier router.
+
+Routes every sample in router_samples.jsonl and answers the ones sent to
+the local tier with the rule-based engine. A local answer agrees when its
+word-level similarity to the sample's reference, an output recorded from
+the real LLM, reaches --threshold. Samples without an LLM-recorded
+reference are routed and timed but not scored. --record sends every
+sample through the LLM tier (needs OPENAI_API_KEY) and writes its output
+back as the reference; with --live the same samples are also sent through
+the LLM tier to compare latency.
+Usage: python benchmarks/bench_router.py [--samples PATH] [--record] [--live] [--threshold 0.9] [--json]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from difflib import SequenceMatcher
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "api"))
+os.environ.setdefault("WARMUP_ON_START", "0")
+os.environ.setdefault("ROUTER_ENABLED", "1")
+
+import optimize
+
+WORD = re.compile(r"[\w']+")
+
+
+def load_samples(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def similarity(output: str, reference: str) -> float:
+    """Word-level similarity, ignoring case and punctuation"""
+    return SequenceMatcher(None, WORD.findall(output.lower()), WORD.findall(reference.lower())).ratio()
+
+
+def llm_reference(sample: dict):
+    """The sample's reference when it was recorded from the LLM, else None"""
+    return sample.get("reference") if sample.get("reference_source") == "llm" else None
+
+
+def record(samples: list, path: str) -> int:
+    """Replace each sample's reference with the LLM's output; returns how many were recorded"""
+    recorded = 0
+    for sample in samples:
+        prepared = optimize.prepare_optimization(sample["prompt"], sample["context"])
+        result = optimize.complete_optimization(sample["prompt"], prepared)
+        if result["source"] in ("llm", "cache"):
+            sample.update(reference=result["optimized"], reference_source="llm", model=prepared["model"])
+            recorded += 1
+        else:
+            print(f"⚠️  no LLM output for {sample['prompt'][:40]!r} (source: {result['source']})", file=sys.stderr)
+    with open(path, "w", encoding="utf-8") as f:
+        for sample in samples:
+            f.write(json.dumps(sample, ensure_ascii=False) + "\n")
+    return recorded
+
+
+def timed(fn, *args, repeat: int = 1):
+    """Return (result, milliseconds per call)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000 / repeat
+
+
+def percentile(values: list, q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+
+def summarize(rows: list, tier: str) -> dict:
+    latencies = [row[f"{tier}_ms"] for row in rows if row.get(f"{tier}_ms") is not None]
+    agreed = [row[f"{tier}_agrees"] for row in rows if row.get(f"{tier}_agrees") is not None]
+    return {
+        "samples": len(agreed),
+        "agreement": round(sum(agreed) / len(agreed), 3) if agreed else None,
+        "p50_ms": percentile(latencies, 0.5),
+        "p95_ms": percentile(latencies, 0.95),
+    }
+
+
+def run(samples: list, live: bool, threshold: float) -> dict:
+    router = optimize.tier_router or optimize.create_tier_router(optimize.text_corrector, optimize.local_max_words)
+    optimize.optimize_locally("warm up", "rephrase")  # loads the tokenizer outside the timings
+    rows = []
+    for sample in samples:
+        context, prompt, reference = sample["context"], sample["prompt"], llm_reference(sample)
+        row = dict(router.features(prompt, context), tier=router.route(prompt, context))
+        if row["tier"] == "local":
+            result, row["local_ms"] = timed(optimize.optimize_locally, prompt, context, repeat=200)
+            if reference is not None:
+                row["local_similarity"] = round(similarity(result["optimized"], reference), 3)
+                row["local_agrees"] = row["local_similarity"] >= threshold
+        if live:
+            prepared = optimize.prepare_optimization(prompt, context)
+            _, row["llm_ms"] = timed(optimize.complete_optimization, prompt, prepared)
+        rows.append(row)
+
+    routed = [row for row in rows if row["tier"] == "local"]
+    return {
+        "samples": len(rows),
+        "local_share": round(len(routed) / len(rows), 3) if rows else None,
+        "scored": sum(llm_reference(sample) is not None for sample in samples),
+        "threshold": threshold,
+        "local": summarize(routed, "local"),
+        # The LLM's answers on the same routed-local samples, for a like-for-like comparison
+        "llm_on_local_samples": summarize(routed, "llm") if live else None,
+        "rows": rows,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--samples", default=os.path.join(HERE, "router_samples.jsonl"))
+    parser.add_argument("--record", action="store_true", help="record LLM outputs as the references and exit")
+    parser.add_argument("--live", action="store_true", help="also time the LLM tier")
+    parser.add_argument("--threshold", type=float, default=0.9, help="similarity a local answer needs to agree")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    if args.record:
+        print(f"recorded {record(samples, args.samples)}/{len(samples)} references from the LLM")
+        sys.exit(0)
+    report = run(samples, args.live, args.threshold)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print("🔀 tier router")
+        print(f"{'context':>16} {'words':>6} {'typos':>6} {'tier':>6} {'agrees':>7} {'local ms':>9}")
+        for row in report["rows"]:
+            print(f"{row['context']:>16} {row['words']:>6} {str(row['typos']):>6} {row['tier']:>6} "
+                  f"{str(row.get('local_agrees', '-')):>7} {str(round(row['local_ms'], 3)) if 'local_ms' in row else '-':>9}")
+        print(f"\nlocal share: {report['local_share']}  local tier: {report['local']}")
+        if not report["scored"]:
+            print("no LLM-recorded references; run with --record to score agreement")
+        if report["llm_on_local_samples"]:
+            print(f"LLM tier on the same samples: {report['llm_on_local_samples']}")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark the token-budget stage on 10 KB - 1 MB cursor_code_optimizer prompts.
+
+For each size, cleans a prose + fenced-code prompt and runs build_prepared,
+reporting prompt tokens before and after compression, the rendered template
+size and the time spent counting and compressing. Uses the tiktoken
+encoding for the configured model, or the character estimate when it cannot
+be loaded (the encoder in use is printed).
+Usage: python benchmarks/bench_token_budget.py [--json]
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("WARMUP_ON_START", "0")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+import optimize
+from _tokens import count_tokens, get_encoder
+
+SIZES = [10_000, 100_000, 1_000_000]
+CONTEXT = "cursor_code_optimizer"
+
+PROSE = "Refactor the order service so retries are idempotent and add tests for the failure paths."
+CODE = "def handle(event, context):\n    items = [x for x in event.get('items', []) if x]\n    return {'count': len(items)}\n"
+
+
+def make_prompt(size: int, seed: int = 0) -> str:
+    """Instructions followed by a pasted file in a fenced code block"""
+    rng = random.Random(seed)
+    lines = []
+    length = len(PROSE) * 2
+    while length < size:
+        line = CODE.replace("items", rng.choice(["items", "orders", "rows", "events"]))
+        lines.append(line)
+        length += len(line)
+    return f"{PROSE}\n```python\n{''.join(lines)}```\n{PROSE}"[:size]
+
+
+def measure(fn, min_time: float = 0.5):
+    """Return (seconds per call, last result), repeating until min_time has elapsed"""
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        result = fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / runs, result
+
+
+def run():
+    model = optimize.get_model_for_context(CONTEXT)
+    strategy = optimize.context_strategies[CONTEXT]
+    results = []
+    for size in SIZES:
+        cleaned = optimize.clean_prompt(make_prompt(size), CONTEXT)
+        seconds, prepared = measure(lambda: optimize.build_prepared(CONTEXT, cleaned, None, strategy))
+        results.append({
+            "size_bytes": size,
+            "prompt_tokens": prepared["prompt_tokens"],
+            "input_tokens": prepared["input_tokens"],
+            "uncompressed_input_tokens": count_tokens(optimize.create_template(CONTEXT, strategy, cleaned), model),
+            "template_bytes": len(prepared["template"]),
+            "compressed": prepared["compressed"],
+            "build_ms": round(seconds * 1000, 2),
+        })
+    return {"encoder": get_encoder(model).name, "max_input_tokens": optimize.max_input_tokens, "results": results}
+
+
+if __name__ == "__main__":
+    report = run()
+    if "--json" in sys.argv:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"✂️  Token budget ({report['encoder']} encoder, {report['max_input_tokens']} max input tokens)")
+        print(f"{'size':>10} {'prompt tok':>11} {'input tok':>10} {'unbudgeted':>11} {'template B':>11} {'build ms':>9}")
+        for r in report["results"]:
+            print(f"{r['size_bytes']:>10} {r['prompt_tokens']:>11} {r['input_tokens']:>10} "
+                  f"{r['uncompressed_input_tokens']:>11} {r['template_bytes']:>11} {r['build_ms']:>9}")
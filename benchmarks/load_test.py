@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Offline load test for POST /api/optimize.
+
+`run` starts the mock OpenAI/Pinecone server and the optimizer (ASGI under
+uvicorn or Flask under gunicorn), drives it with a weighted mix of realistic
+prompts per context at each concurrency level and prints the results as
+JSON: p50/p95/p99 latency, requests/sec and error rate, overall and per
+context. `replay` sends the requests recorded in a request journal
+(REQUEST_JOURNAL_DIR) at their original spacing, or --speed times faster,
+to reproduce a production load shape. `compare` reads two reports and
+flags regressions, exiting with status 1 when there are any, so it can
+gate CI.
+
+Usage:
+    python benchmarks/load_test.py run [--server asgi] [--backend local] [--output base.json]
+    python benchmarks/load_test.py replay JOURNAL_DIR [--speed 10] [--output replay.json]
+    python benchmarks/load_test.py compare base.json new.json [--threshold 0.1]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, "benchmarks")
+sys.path.insert(0, BENCH_DIR)
+
+import httpx
+
+from bench_asgi import ASGI_PORT, MOCK_PORT, WSGI_PORT, drive, latency_summary, server_env, start, wait_until_up
+
+sys.path.insert(0, os.path.join(ROOT, "api"))
+os.environ.setdefault("WARMUP_ON_START", "0")
+
+# Share of traffic per context, roughly what the web UI sends
+DEFAULT_MIX = {
+    "general": 0.30,
+    "rephrase": 0.25,
+    "cursor_code_optimizer": 0.15,
+    "image_generation": 0.15,
+    "technical": 0.10,
+    "video_generation": 0.05,
+}
+
+TECHNICAL_PROMPTS = [
+    "How does TCP congestion control work",
+    "Explain how a B-tree index speeds up database lookups",
+    "What happens during a TLS handshake",
+    "How does garbage collection work in the JVM",
+    "Compare optimistic and pessimistic locking",
+]
+
+# Latency higher or throughput lower than the baseline by more than the threshold is a regression
+HIGHER_IS_WORSE = ("p50_ms", "p95_ms", "p99_ms")
+LOWER_IS_WORSE = ("rps",)
+
+
+def load_prompts() -> dict:
+    """{context: [prompt]} from the router samples, the classifier labels and TECHNICAL_PROMPTS"""
+    prompts = {"technical": list(TECHNICAL_PROMPTS)}
+    for path, key in ((os.path.join(BENCH_DIR, "router_samples.jsonl"), "prompt"),
+                      (os.path.join(ROOT, "prompt_labels.jsonl"), "text")):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    prompts.setdefault(item["context"], []).append(item[key])
+    return prompts
+
+
+def parse_mix(value: str) -> dict:
+    """Parse "general=0.5,rephrase=0.5" into a context -> weight mapping"""
+    mix = {}
+    for part in value.split(","):
+        context, _, weight = part.partition("=")
+        mix[context.strip()] = float(weight or 1)
+    return mix
+
+
+def weighted_prompts(mix: dict, prompts: dict):
+    """(context, prompt) pairs and weights giving each context its share of traffic"""
+    pairs, weights = [], []
+    for context, share in mix.items():
+        pool = prompts.get(context)
+        if not pool:
+            raise ValueError(f"No prompts for context {context!r}")
+        pairs.extend((context, prompt) for prompt in pool)
+        weights.extend([share / len(pool)] * len(pool))
+    return pairs, weights
+
+
+def mock_env(args) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "MOCK_CHAT_LATENCY_MS": str(args.chat_latency_ms),
+        "MOCK_EMBED_LATENCY_MS": str(args.embed_latency_ms),
+        "MOCK_PINECONE_LATENCY_MS": str(args.pinecone_latency_ms),
+        "MOCK_LATENCY_DISTRIBUTION": args.latency_distribution,
+        "MOCK_ERROR_RATE": str(args.error_rate),
+    })
+    return env
+
+
+def app_env(args) -> dict:
+    extra = {"STRATEGY_INDEX_BACKEND": args.backend}
+    if args.backend == "pinecone":
+        extra.update({"PINECONE_API_KEY": "pc-mock", "PINECONE_CONTROLLER_HOST": f"http://127.0.0.1:{MOCK_PORT}"})
+    if args.cache:
+        extra.update({"PROMPT_CACHE_ENABLED": "1", "SEMANTIC_CACHE_ENABLED": "1"})
+    env = server_env(**extra)
+    if args.command == "replay":
+        # Never append the replay to the journal being replayed
+        env.pop("REQUEST_JOURNAL_DIR", None)
+    return env
+
+
+def seed_pinecone():
+    """Upsert the strategy corpus into the mock index, as build-time provisioning would"""
+    import optimize
+    from mock_openai import seed_records
+
+    corpus = list(optimize.strategy_corpus)
+    for styles in optimize.style_strategies.values():
+        corpus.extend(text for text in styles.values() if text not in corpus)
+    response = httpx.post(f"http://127.0.0.1:{MOCK_PORT}/vectors/upsert", json={"vectors": seed_records(corpus)}, timeout=60)
+    response.raise_for_status()
+
+
+def wait_until_ready(url: str, timeout: float) -> bool:
+    """Wait for /api/ready so the strategy index is warm before measuring"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    # Without network access tiktoken cannot download its encodings, so the index never
+    # warms and every embedding call retries the download; requests still succeed on the
+    # fallback strategies, so measure anyway. Point TIKTOKEN_CACHE_DIR at a populated
+    # cache for representative offline numbers.
+    print(f"⚠️  {url} not ready after {timeout:g}s, measuring the degraded path "
+          f"(is TIKTOKEN_CACHE_DIR populated?)", file=sys.stderr)
+    return False
+
+
+@contextmanager
+def serving(args):
+    """Start the mock backends and the optimizer unless --url is given; yields (url, ready)"""
+    if args.url:
+        yield args.url, None
+        return
+    processes = [start([sys.executable, "-m", "uvicorn", "mock_openai:app", "--port", str(MOCK_PORT),
+                        "--log-level", "warning"], BENCH_DIR, mock_env(args))]
+    try:
+        if args.backend == "pinecone":
+            wait_until_up(f"http://127.0.0.1:{MOCK_PORT}/indexes")
+            seed_pinecone()
+        if args.server == "wsgi":
+            port = WSGI_PORT
+            cmd = [sys.executable, "-m", "gunicorn", "optimize:app", "--chdir", os.path.join(ROOT, "api"),
+                   "-w", "1", "--threads", str(args.threads), "-b", f"127.0.0.1:{port}"]
+        else:
+            port = ASGI_PORT
+            cmd = [sys.executable, "-m", "uvicorn", "asgi:app", "--port", str(port), "--log-level", "warning"]
+        processes.append(start(cmd, ROOT, app_env(args)))
+        wait_until_up(f"http://127.0.0.1:{port}/api/health")
+        ready = wait_until_ready(f"http://127.0.0.1:{port}/api/ready", args.ready_timeout)
+        yield f"http://127.0.0.1:{port}/api/optimize", ready
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def server_config(args, ready) -> dict:
+    return {
+        "server": "external" if args.url else args.server,
+        "backend": args.backend,
+        "ready": ready,
+        "cache": args.cache,
+        "mock": {
+            "chat_latency_ms": args.chat_latency_ms,
+            "embed_latency_ms": args.embed_latency_ms,
+            "pinecone_latency_ms": args.pinecone_latency_ms,
+            "latency_distribution": args.latency_distribution,
+            "error_rate": args.error_rate,
+        },
+    }
+
+
+def run(args) -> dict:
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    pairs, weights = weighted_prompts(mix, load_prompts())
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    with serving(args) as (url, ready):
+        # Warm connection pools and lazy imports before measuring
+        asyncio.run(drive(url, 5, 1, pairs, weights))
+        results = [asyncio.run(drive(url, level, args.duration, pairs, weights, args.duplicate_rate))
+                   for level in levels]
+
+    return {
+        "config": dict(server_config(args, ready), duration=args.duration, mix=mix, duplicate_rate=args.duplicate_rate),
+        "results": results,
+    }
+
+
+def replay_prompt(entry: dict, prompts: dict) -> str:
+    """The recorded prompt, or a stand-in of the same length and context
+
+    Stand-ins are seeded by the prompt hash, so a prompt repeated in the
+    journal is repeated in the replay and the caches see the same hits.
+    """
+    if "prompt" in entry:
+        return entry["prompt"]
+    pool = prompts.get(entry["context"]) or [prompt for pool in prompts.values() for prompt in pool]
+    rng = random.Random(entry["prompt_hash"])
+    text = rng.choice(pool)
+    while len(text) < entry["prompt_len"]:
+        text += " " + rng.choice(pool)
+    return text[:max(1, entry["prompt_len"])]
+
+
+async def replay_entries(url: str, entries: list, speed: float, max_in_flight: int) -> dict:
+    """Send entries open-loop at their recorded offsets divided by speed"""
+    prompts = load_prompts()
+    latencies, by_context, sources, errors, lags = [], {}, {}, {}, []
+    in_flight = asyncio.Semaphore(max_in_flight)
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        async def send(entry: dict, prompt: str, due: float):
+            async with in_flight:
+                started = time.perf_counter()
+                # How far behind schedule the replay is; large values mean the client, not the app, is the bottleneck
+                lags.append(max(0.0, started - due))
+                try:
+                    response = await client.post(url, json={"prompt": prompt, "context": entry["context"]})
+                    error = None if response.status_code == 200 else str(response.status_code)
+                except httpx.HTTPError as e:
+                    error = type(e).__name__
+                if error:
+                    errors[error] = errors.get(error, 0) + 1
+                    return
+                latency = time.perf_counter() - started
+                latencies.append(latency)
+                by_context.setdefault(entry["context"], []).append(latency)
+                source = response.json().get("source", "unknown")
+                sources[source] = sources.get(source, 0) + 1
+
+        first = entries[0]["ts"] if entries else 0.0
+        started = time.perf_counter()
+        tasks = []
+        for entry in entries:
+            due = started + (entry["ts"] - first) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(entry, replay_prompt(entry, prompts), due)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    failed = sum(errors.values())
+    lags.sort()
+    return dict(
+        latency_summary(latencies),
+        concurrency=f"replay x{speed:g}",
+        errors=failed,
+        error_rate=round(failed / (len(latencies) + failed), 4) if latencies or failed else 0.0,
+        errors_by_type=errors,
+        rps=round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        schedule_lag_p99_ms=round(lags[min(len(lags) - 1, int(0.99 * len(lags)))] * 1000, 1) if lags else 0.0,
+        paths=sources,
+        by_context={context: latency_summary(values) for context, values in sorted(by_context.items())},
+    )
+
+
+def replay(args) -> dict:
+    from _journal import read_journal
+
+    entries = read_journal(args.journal)
+    if args.limit:
+        entries = entries[:args.limit]
+    if not entries:
+        raise SystemExit(f"No journal entries under {args.journal}")
+    recorded_paths = {}
+    for entry in entries:
+        recorded_paths[entry["path"]] = recorded_paths.get(entry["path"], 0) + 1
+
+    with serving(args) as (url, ready):
+        result = asyncio.run(replay_entries(url, entries, args.speed, args.max_in_flight))
+
+    return {
+        "config": dict(server_config(args, ready), journal=args.journal, speed=args.speed,
+                       recorded_span_s=round(entries[-1]["ts"] - entries[0]["ts"], 3),
+                       recorded_paths=recorded_paths),
+        "results": [result],
+    }
+
+
+def compare(baseline: dict, candidate: dict, threshold: float = 0.10, error_threshold: float = 0.01) -> dict:
+    """Relative change of every metric per concurrency level, and the ones past the thresholds"""
+    levels = {row["concurrency"]: row for row in baseline["results"]}
+    rows, regressions = [], []
+    for row in candidate["results"]:
+        base = levels.get(row["concurrency"])
+        if base is None:
+            continue
+        changes = {}
+        for metric in HIGHER_IS_WORSE + LOWER_IS_WORSE:
+            if base[metric]:
+                change = (row[metric] - base[metric]) / base[metric]
+                changes[metric] = round(change, 3)
+                worse = change > threshold if metric in HIGHER_IS_WORSE else change < -threshold
+                if worse:
+                    regressions.append({"concurrency": row["concurrency"], "metric": metric,
+                                        "baseline": base[metric], "candidate": row[metric], "change": round(change, 3)})
+        # Error rates are compared in absolute terms since the baseline is usually zero
+        error_change = row["error_rate"] - base["error_rate"]
+        changes["error_rate"] = round(error_change, 4)
+        if error_change > error_threshold:
+            regressions.append({"concurrency": row["concurrency"], "metric": "error_rate",
+                                "baseline": base["error_rate"], "candidate": row["error_rate"],
+                                "change": round(error_change, 4)})
+        rows.append({"concurrency": row["concurrency"], "changes": changes})
+    return {"threshold": threshold, "error_threshold": error_threshold, "levels": rows, "regressions": regressions}
+
+
+def add_server_arguments(parser):
+    parser.add_argument("--server", choices=["asgi", "wsgi"], default="asgi")
+    parser.add_argument("--backend", choices=["local", "pinecone"], default="local", help="strategy index backend")
+    parser.add_argument("--url", help="drive an already running /api/optimize instead of starting servers")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads for the Flask app")
+    parser.add_argument("--cache", action="store_true", help="keep the response and semantic caches enabled")
+    parser.add_argument("--chat-latency-ms", type=float, default=800)
+    parser.add_argument("--embed-latency-ms", type=float, default=60)
+    parser.add_argument("--pinecone-latency-ms", type=float, default=20)
+    parser.add_argument("--latency-distribution", choices=["uniform", "lognormal", "exponential", "fixed"],
+                        default="lognormal")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of mock OpenAI calls that fail")
+    parser.add_argument("--ready-timeout", type=float, default=30, help="seconds to wait for /api/ready")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="drive the optimizer and report latency and throughput")
+    run_parser.add_argument("--concurrency", default="50,200", help="comma-separated client counts")
+    run_parser.add_argument("--duration", type=float, default=10, help="seconds per concurrency level")
+    run_parser.add_argument("--mix", help='context weights, e.g. "general=0.5,rephrase=0.5" (default: DEFAULT_MIX)')
+    run_parser.add_argument("--duplicate-rate", type=float, default=0.0, help="share of requests that repeat a prompt verbatim")
+    add_server_arguments(run_parser)
+
+    replay_parser = commands.add_parser("replay", help="replay a request journal at its recorded rate")
+    replay_parser.add_argument("journal", help="REQUEST_JOURNAL_DIR of the recording")
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="replay this many times faster than recorded")
+    replay_parser.add_argument("--limit", type=int, help="replay only the first N entries")
+    replay_parser.add_argument("--max-in-flight", type=int, default=1000, help="cap on concurrent replayed requests")
+    add_server_arguments(replay_parser)
+
+    compare_parser = commands.add_parser("compare", help="flag regressions between two run reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative latency/throughput change")
+    compare_parser.add_argument("--error-threshold", type=float, default=0.01, help="allowed absolute error rate increase")
+    args = parser.parse_args()
+
+    if args.command in ("run", "replay"):
+        report = run(args) if args.command == "run" else replay(args)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        print(json.dumps(report, indent=2))
+        return
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, "r", encoding="utf-8") as f:
+        candidate = json.load(f)
+    report = compare(baseline, candidate, args.threshold, args.error_threshold)
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["regressions"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Local stand-in for the OpenAI chat and embeddings endpoints and the Pinecone
+index endpoints.
+
+Point the optimizer at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 and
+any OPENAI_API_KEY. For the Pinecone backend also set
+STRATEGY_INDEX_BACKEND=pinecone, PINECONE_CONTROLLER_HOST=http://127.0.0.1:<port>
+and any PINECONE_API_KEY; the index starts empty, so upsert the strategy
+corpus first (see seed_records). Latency is configurable so benchmarks can
+model a slow provider without spending tokens:
+
+    MOCK_CHAT_LATENCY_MS       mean time to the first chat token (default 800)
+    MOCK_TOKEN_INTERVAL_MS     delay between streamed chunks (default 5)
+    MOCK_EMBED_LATENCY_MS      mean embeddings latency (default 60)
+    MOCK_PINECONE_LATENCY_MS   mean Pinecone query latency (default 20)
+    MOCK_LATENCY_DISTRIBUTION  uniform, lognormal, exponential or fixed (default uniform)
+    MOCK_LATENCY_JITTER        relative jitter of the uniform distribution (default 0.25)
+    MOCK_LATENCY_SIGMA         shape of the lognormal distribution; 1.0 gives a p99
+                               about 4x the mean (default 0.5)
+    MOCK_ERROR_RATE            fraction of OpenAI calls answered with a 500 (default 0)
+
+Run with: uvicorn mock_openai:app --app-dir benchmarks --port 8901
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import time
+
+import numpy as np
+
+EMBEDDING_DIMENSION = 1536
+
+CHAT_LATENCY_MS = float(os.getenv("MOCK_CHAT_LATENCY_MS", "800"))
+TOKEN_INTERVAL_MS = float(os.getenv("MOCK_TOKEN_INTERVAL_MS", "5"))
+EMBED_LATENCY_MS = float(os.getenv("MOCK_EMBED_LATENCY_MS", "60"))
+PINECONE_LATENCY_MS = float(os.getenv("MOCK_PINECONE_LATENCY_MS", "20"))
+LATENCY_DISTRIBUTION = os.getenv("MOCK_LATENCY_DISTRIBUTION", "uniform")
+LATENCY_JITTER = float(os.getenv("MOCK_LATENCY_JITTER", "0.25"))
+LATENCY_SIGMA = float(os.getenv("MOCK_LATENCY_SIGMA", "0.5"))
+ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))
+
+INDEX_NAME = "prompt-technique2"
+
+
+def sample_latency(mean_ms: float, distribution: str = LATENCY_DISTRIBUTION) -> float:
+    """One delay in milliseconds drawn from a distribution with the given mean"""
+    if mean_ms <= 0 or distribution == "fixed":
+        return max(0.0, mean_ms)
+    if distribution == "lognormal":
+        # mu is chosen so the distribution's mean, not its median, is mean_ms
+        return random.lognormvariate(math.log(mean_ms) - LATENCY_SIGMA ** 2 / 2, LATENCY_SIGMA)
+    if distribution == "exponential":
+        return random.expovariate(1 / mean_ms)
+    if distribution == "uniform":
+        return max(0.0, mean_ms * (1 + random.uniform(-LATENCY_JITTER, LATENCY_JITTER)))
+    raise ValueError(f"Unknown latency distribution: {distribution}")
+
+
+async def delay(mean_ms: float):
+    if mean_ms <= 0:
+        return
+    await asyncio.sleep(sample_latency(mean_ms) / 1000)
+
+
+def injected_error() -> bool:
+    return ERROR_RATE > 0 and random.random() < ERROR_RATE
+
+
+def fake_embedding(text) -> list:
+    """Deterministic unit vector derived from the input text"""
+    if not isinstance(text, str):
+        text = json.dumps(text)
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIMENSION).astype(np.float32)
+    vector /= np.linalg.norm(vector)
+    return vector.tolist()
+
+
+def fake_completion(messages) -> str:
+    """Echo a shortened, rewritten form of the last user message"""
+    content = messages[-1].get("content", "") if messages else ""
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    tail = content.strip().splitlines()[-3:] if content else []
+    return "Optimized prompt: " + " ".join(line.strip() for line in tail)[:400]
+
+
+async def chat_completions(body: dict, send, scope):
+    if injected_error():
+        await delay(CHAT_LATENCY_MS)
+        await send_json(send, {"error": {"message": "Injected failure", "type": "server_error"}}, 500)
+        return
+    model = body.get("model", "gpt-4o")
+    text = fake_completion(body.get("messages", []))
+    created = int(time.time())
+    completion_id = f"chatcmpl-mock-{random.getrandbits(48):x}"
+    await delay(CHAT_LATENCY_MS)
+
+    if not body.get("stream"):
+        await send_json(send, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 100, "completion_tokens": len(text.split()), "total_tokens": 100 + len(text.split())},
+        })
+        return
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/event-stream")],
+    })
+    words = text.split(" ")
+    for i, word in enumerate(words):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+        }
+        await send({"type": "http.response.body", "body": f"data: {json.dumps(chunk)}\n\n".encode(), "more_body": True})
+        await delay(TOKEN_INTERVAL_MS)
+    final = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+    }
+    await send({"type": "http.response.body", "body": f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode(), "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def embeddings(body: dict, send, scope):
+    inputs = body.get("input", [])
+    if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+        inputs = [inputs]
+    await delay(EMBED_LATENCY_MS)
+    if injected_error():
+        await send_json(send, {"error": {"message": "Injected failure", "type": "server_error"}}, 500)
+        return
+    await send_json(send, {
+        "object": "list",
+        "model": body.get("model", "text-embedding-ada-002"),
+        "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(item)} for i, item in enumerate(inputs)],
+        "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+    })
+
+
+class MockIndex:
+    """In-memory cosine index answering Pinecone upsert and query calls"""
+
+    def __init__(self):
+        self.ids = []
+        self.metadata = []
+        self.matrix = np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32)
+
+    def upsert(self, vectors: list) -> int:
+        for vector in vectors:
+            values = np.asarray(vector["values"], dtype=np.float32)
+            values /= np.linalg.norm(values) or 1.0
+            if vector["id"] in self.ids:
+                row = self.ids.index(vector["id"])
+                self.matrix[row] = values
+                self.metadata[row] = vector.get("metadata", {})
+            else:
+                self.ids.append(vector["id"])
+                self.metadata.append(vector.get("metadata", {}))
+                self.matrix = np.vstack([self.matrix, values])
+        return len(vectors)
+
+    def query(self, vector, top_k: int) -> list:
+        if not self.ids:
+            return []
+        scores = self.matrix @ np.asarray(vector, dtype=np.float32)
+        top = np.argsort(-scores)[:top_k]
+        return [{"id": self.ids[i], "score": float(scores[i]), "values": [], "metadata": self.metadata[i]} for i in top]
+
+
+mock_index = MockIndex()
+
+
+def seed_records(texts) -> list:
+    """Pinecone upsert records for texts, embedded the way the mock embeds queries"""
+    return [
+        {"id": hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], "values": fake_embedding(text), "metadata": {"text": text}}
+        for text in texts
+    ]
+
+
+def index_description(scope, name: str = INDEX_NAME) -> dict:
+    host, port = scope.get("server") or ("127.0.0.1", 80)
+    return {
+        "name": name,
+        "dimension": EMBEDDING_DIMENSION,
+        "metric": "cosine",
+        "host": f"http://{host}:{port}",
+        "spec": {"serverless": {"cloud": "aws", "region": "us-east-1"}},
+        "status": {"ready": True, "state": "Ready"},
+        "deletion_protection": "disabled",
+        "vector_type": "dense",
+    }
+
+
+async def list_indexes(body: dict, send, scope):
+    await send_json(send, {"indexes": [index_description(scope)]})
+
+
+async def describe_index(body: dict, send, scope):
+    if scope["path"].rstrip("/").rsplit("/", 1)[-1] != INDEX_NAME:
+        await send_json(send, {"error": {"code": "NOT_FOUND", "message": "Index not found"}, "status": 404}, 404)
+        return
+    await send_json(send, index_description(scope))
+
+
+async def create_index(body: dict, send, scope):
+    if body.get("name") == INDEX_NAME:
+        await send_json(send, {"error": {"code": "ALREADY_EXISTS", "message": "Resource already exists"}, "status": 409}, 409)
+        return
+    await send_json(send, index_description(scope, body.get("name", INDEX_NAME)), 201)
+
+
+async def upsert_vectors(body: dict, send, scope):
+    await send_json(send, {"upsertedCount": mock_index.upsert(body.get("vectors", []))})
+
+
+async def query_index(body: dict, send, scope):
+    await delay(PINECONE_LATENCY_MS)
+    matches = mock_index.query(body.get("vector", []), int(body.get("topK", 10)))
+    await send_json(send, {"matches": matches, "namespace": body.get("namespace", ""), "usage": {"readUnits": 1}})
+
+
+async def send_json(send, payload, status: int = 200):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+routes = {
+    ("POST", "/v1/chat/completions"): chat_completions,
+    ("POST", "/v1/embeddings"): embeddings,
+    # Pinecone control plane (/indexes) and data plane (/query, /vectors/upsert)
+    ("GET", "/indexes"): list_indexes,
+    ("POST", "/indexes"): create_index,
+    ("GET", "/indexes/"): describe_index,
+    ("POST", "/query"): query_index,
+    ("POST", "/vectors/upsert"): upsert_vectors,
+}
+
+
+def find_route(method: str, path: str):
+    path = path.rstrip("/")
+    if path.startswith("/indexes/"):
+        path = "/indexes/"
+    return routes.get((method, path))
+
+
+async def app(scope, receive, send):
+    """ASGI application"""
+    if scope["type"] != "http":
+        return
+    handler = find_route(scope["method"], scope["path"])
+    if handler is None:
+        await send_json(send, {"error": {"message": "Not found"}}, 404)
+        return
+    body = bytearray()
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    await handler(json.loads(body or b"{}"), send, scope)
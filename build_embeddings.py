@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Build the strategy embedding snapshot loaded by api/optimize.py at startup.
+
+Writes api/strategy_embeddings.npy (unit-length float32 matrix) and
+api/strategy_embeddings.json (model, dimension and per-text hashes).
+Only strategies whose text changed since the last snapshot are re-embedded.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+# The snapshot is built below; a startup warm-up would embed the corpus a second time
+os.environ.setdefault("WARMUP_ON_START", "0")
+
+from optimize import embeddings_model, get_embeddings, strategy_corpus, strategy_snapshot_path
+from _retrieval import load_strategy_index, save_snapshot
+
+
+def build_snapshot(path: str = strategy_snapshot_path):
+    """Refresh the snapshot at path and return its manifest"""
+    embeddings_instance = get_embeddings()
+    if embeddings_instance is None:
+        raise RuntimeError("OpenAI embeddings are unavailable; check OPENAI_API_KEY")
+    index, embedded = load_strategy_index(path, strategy_corpus, embeddings_instance, embeddings_model)
+    manifest = save_snapshot(path, index.texts, index.matrix, embeddings_model)
+    print(f"📦 Wrote {manifest['count']} strategy embeddings to {path} ({embedded} re-embedded)")
+    print(f"🔑 Corpus hash: {manifest['corpus_hash']}")
+    return manifest
+
+
+if __name__ == "__main__":
+    build_snapshot(sys.argv[1] if len(sys.argv) > 1 else strategy_snapshot_path)
@@ -1,10 +1,15 @@
+import json
 import os
 import pinecone
 import re
+import sys
 from dotenv import load_dotenv
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_pinecone import PineconeVectorStore
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+from _retrieval import text_hash
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -35,12 +40,27 @@ docs = [
     "Self-consistency prompting: Sample multiple reasoning paths and pick the most consistent answer."
 ]
 
-# Create vectorstore
-vectorstore = PineconeVectorStore.from_texts(
-    texts=docs,
-    embedding=embeddings,
-    index_name=index_name
-)
+# Create vectorstore; vectors are keyed by text hash and a manifest of the hashes
+# already upserted (as in the strategy snapshot) means only edited docs are re-embedded
+index = pc.Index(index_name)
+vectorstore = PineconeVectorStore(index=index, embedding=embeddings)
+manifest_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{index_name}.manifest.json")
+try:
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        upserted = json.load(f)["text_hashes"]
+except (OSError, ValueError, KeyError):
+    upserted = []
+hashes = [text_hash(doc) for doc in docs]
+if hashes != upserted:
+    missing = [(doc, h) for doc, h in zip(docs, hashes) if h not in upserted]
+    if missing:
+        vectorstore.add_texts([doc for doc, _ in missing], ids=[h for _, h in missing])
+    stale = [h for h in upserted if h not in hashes]
+    if stale:
+        index.delete(ids=stale)
+    with open(manifest_file, "w", encoding="utf-8") as f:
+        json.dump({"index": index_name, "text_hashes": hashes}, f, indent=2)
+        f.write("\n")
 
 retriever = vectorstore.as_retriever()
 
@@ -51,11 +71,13 @@ print(results)
 # for r in results:
 #     print(r.page_content)
 
+useless_words = ["actually", "basically", "just", "like", "I mean", "you know"]
+filler_pattern = re.compile(r"\b(" + "|".join(useless_words) + r")\b", re.IGNORECASE)
+whitespace_pattern = re.compile(r"\s+")
+
 def clean_prompt(prompt: str) -> str:
-    useless_words = ["actually", "basically", "just", "like", "I mean", "you know"]
-    regex = r"\b(" + "|".join(useless_words) + r")\b"
-    cleaned = re.sub(regex, "", prompt, flags=re.IGNORECASE)
-    return re.sub(r"\s+", " ", cleaned).strip()
+    cleaned = filler_pattern.sub("", prompt)
+    return whitespace_pattern.sub(" ", cleaned).strip()
 
 def apply_strategy(user_prompt: str, context: str = "general"):
     # Step 1: Clean
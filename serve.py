@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Production server: loads the optimizer once and forks worker processes.
+
+The app is imported and its read-only state (strategy corpus and matrix,
+tokenizer, compiled patterns, templates, classifiers) is built in the
+master before forking, so every worker shares it copy-on-write. Workers
+run the ASGI app under uvicorn (default) or the Flask app on threads.
+
+    SERVER_APP          asgi or wsgi (default asgi)
+    WEB_CONCURRENCY     worker processes (default: CPU count)
+    WORKER_CONCURRENCY  requests one worker handles at once; further
+                        requests get a 503 (asgi) or queue (wsgi),
+                        health and metrics are never limited
+                        (defaults 1000 for asgi, 32 for wsgi)
+    BIND                listen address (default 0.0.0.0:$PORT, PORT default 5000)
+    GRACEFUL_TIMEOUT    seconds workers get to finish requests on reload or stop (default 30)
+
+Signals (to the master): HUP re-reads the classifier and strategy snapshot
+and gracefully replaces the workers; TERM drains and stops; USR2 starts a
+new master running new code, after which the old one can be sent TERM.
+
+Usage: python serve.py [--app asgi|wsgi] [--workers N] [--bind HOST:PORT] [--concurrency N]
+The Vercel handler in api/optimize.py is unaffected and still serves
+single requests in serverless deployments.
+"""
+
+import argparse
+import os
+import sys
+
+# The standalone package replaces the worker bundled with (and deprecated in) uvicorn
+try:
+    import uvicorn_worker  # noqa: F401
+    UVICORN_WORKER = "uvicorn_worker.UvicornWorker"
+except ImportError:
+    UVICORN_WORKER = "uvicorn.workers.UvicornWorker"
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "api"))
+sys.path.insert(0, ROOT)
+
+from gunicorn.app.base import BaseApplication
+
+
+def on_reload(arbiter):
+    # Runs in the master before the replacement workers are forked from it
+    import optimize
+    optimize.reload_shared_state()
+
+
+class OptimizerServer(BaseApplication):
+    def __init__(self, app_name: str, options: dict, concurrency: int):
+        self.app_name = app_name
+        self.options = options
+        self.concurrency = concurrency
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # Warm-up threads would not survive the fork; preload() builds the state synchronously
+        os.environ["WARMUP_ON_START"] = "0"
+        import optimize
+        if self.app_name == "asgi":
+            import asgi
+            app = asgi.limit_in_flight(asgi.app, self.concurrency)
+        else:
+            app = optimize.app
+        optimize.preload()
+        return app
+
+
+def server_options(app_name: str, workers: int, bind: str, concurrency: int) -> dict:
+    options = {
+        "bind": bind,
+        "workers": workers,
+        "preload_app": True,
+        "graceful_timeout": int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+        "on_reload": on_reload,
+    }
+    if app_name == "asgi":
+        options["worker_class"] = UVICORN_WORKER
+    else:
+        # Each thread serves one request; connections beyond that wait in the worker's queue
+        options.update({"worker_class": "gthread", "threads": concurrency})
+    return options
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", choices=["asgi", "wsgi"], default=os.getenv("SERVER_APP", "asgi"))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--bind", default=os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}"))
+    parser.add_argument("--concurrency", type=int, default=os.getenv("WORKER_CONCURRENCY"),
+                        help="requests per worker (default 1000 for asgi, 32 for wsgi)")
+    args = parser.parse_args()
+    concurrency = int(args.concurrency or (1000 if args.app == "asgi" else 32))
+
+    OptimizerServer(args.app, server_options(args.app, args.workers, args.bind, concurrency), concurrency).run()
+
+
+if __name__ == "__main__":
+    main()
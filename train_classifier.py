@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Train the prompt classifier loaded by api/optimize.py at startup.
+
+Reads labeled {"context", "text", "label"} JSON lines (default
+prompt_labels.jsonl), fits one hashed n-gram classifier per context and
+writes them to api/prompt_classifier.npz. Prints 5-fold cross-validated
+accuracy and calibration error so a data change that hurts quality shows
+up before the model ships.
+Usage: python train_classifier.py [labels.jsonl] [output.npz]
+"""
+
+import os
+import sys
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "api"))
+
+from _classifier import MIN_CONFIDENCE, HashedNgramClassifier, load_examples, save_classifiers
+
+LABELS_PATH = os.path.join(HERE, "prompt_labels.jsonl")
+MODEL_PATH = os.path.join(HERE, "api", "prompt_classifier.npz")
+FOLDS = 5
+
+
+def cross_validate(texts, labels, folds: int = FOLDS) -> dict:
+    """Accuracy, expected calibration error and confident-prediction coverage over held-out folds"""
+    confidences, correct = [], []
+    for fold in range(folds):
+        train = [i for i in range(len(texts)) if i % folds != fold]
+        model = HashedNgramClassifier.train([texts[i] for i in train], [labels[i] for i in train])
+        for i in range(fold, len(texts), folds):
+            label, confidence = model.predict(texts[i])
+            confidences.append(confidence)
+            correct.append(label == labels[i])
+    confidences, correct = np.array(confidences), np.array(correct, dtype=float)
+    # Expected calibration error over 10 equal-width confidence bins
+    bins = np.minimum((confidences * 10).astype(int), 9)
+    ece = sum(abs(correct[bins == b].mean() - confidences[bins == b].mean()) * (bins == b).mean()
+              for b in range(10) if (bins == b).any())
+    confident = confidences >= MIN_CONFIDENCE
+    return {
+        "accuracy": round(float(correct.mean()), 3),
+        "ece": round(float(ece), 3),
+        # Predictions below MIN_CONFIDENCE fall back to retrieval at serving time
+        "coverage": round(float(confident.mean()), 3),
+        "confident_accuracy": round(float(correct[confident].mean()), 3) if confident.any() else None,
+    }
+
+
+def train(labels_path: str = LABELS_PATH, model_path: str = MODEL_PATH):
+    classifiers = {}
+    for context, examples in sorted(load_examples(labels_path).items()):
+        texts = [text for text, _ in examples]
+        labels = [label for _, label in examples]
+        scores = cross_validate(texts, labels)
+        classifiers[context] = HashedNgramClassifier.train(texts, labels)
+        print(f"🏷️  {context}: {len(texts)} examples, labels {classifiers[context].labels}, "
+              f"temperature {classifiers[context].temperature:.2f}, cross-validated {scores}")
+    save_classifiers(model_path, classifiers)
+    print(f"📦 Wrote {len(classifiers)} classifiers to {model_path} ({os.path.getsize(model_path)} bytes)")
+    return classifiers
+
+
+if __name__ == "__main__":
+    train(*sys.argv[1:3])